@@ -0,0 +1,116 @@
+# ====================================================================================================#
+#
+# Title: Hollstein Mask Benchmark (iterate vs. flat vs. local)
+#
+# ====================================================================================================#
+
+'''
+Compares the Hollstein et al. (2016) cloud/shadow/snow/water/cirrus decision tree on full Sentinel-2 L1C tiles:
+
+    iterate – the previous server side version (prepro.masking.binary: ee.Dictionary + ee.List.iterate +
+              ee.Algorithms.If over the class paths)
+    flat    – prepro.hollsteinMask (one And/Or expression per class, no iterate)
+    local   – local.hollstein_mask (bitwise on a per-pixel condition code), on the tile downloaded to LOCAL_DIR
+              (one GeoTIFF per band, named <band>.tif, on a common 20 m grid) or, without it, on random digital
+              numbers of the size of a 20 m tile.
+
+For the server versions the wall time of the clear fraction of the tile (reduceRegion at 20 m, evaluates every pixel)
+and the size of the serialized request graph are reported, for the local version the wall time and peak size of the
+band arrays per chunk of CHUNK_ROWS rows.
+
+Run from the repository root: python benchmarks/hollstein.py (needs Earth Engine credentials).
+'''
+
+import ee
+
+from learthengine import generals
+from learthengine import local
+from learthengine.prepro import masking
+
+import os
+import time
+import numpy as np
+
+
+# ====================================================================================================#
+# INPUT
+# ====================================================================================================#
+COLLECTION = 'COPERNICUS/S2'
+TILES = ['33UUU', '32TNT']   # Berlin, Alps (snow)
+DATE = ['2019-06-01', '2019-09-30']
+MAX_CLOUD = 60
+SCALE = 20
+REPEAT = 2
+LOCAL_DIR = None             # e.g. 'S2_33UUU_20190715', None uses random digital numbers
+TILE_SIZE = 5490             # pixels of a 109.8 km tile at 20 m
+CHUNK_ROWS = 1024
+BANDS = ['B1', 'B2', 'B3', 'B5', 'B6', 'B7', 'B8A', 'B9', 'B10', 'B11']
+
+
+# ====================================================================================================#
+# EXECUTE
+# ====================================================================================================#
+def timed(fun):
+    t0 = time.time()
+    result = fun()
+    return result, time.time() - t0
+
+
+def iterate_mask(img):
+    final = {}
+    for option in ['cloud', 'snow', 'shadow', 'water', 'cirrus']:
+        final.update(masking.hollstein_classes[option])
+    return masking.binary(masking.hollstein_conditions(img), final, 'hollstein')
+
+
+def local_tile():
+    if LOCAL_DIR is None:
+        rng = np.random.default_rng(0)
+        return None, lambda r0, r1: {b: rng.integers(0, 10000, (r1 - r0, TILE_SIZE)).astype(np.uint16)
+                                     for b in BANDS}
+    from osgeo import gdal
+    files = {b: gdal.Open(os.path.join(LOCAL_DIR, b + '.tif')) for b in BANDS}
+    rows = files[BANDS[0]].RasterYSize
+    cols = files[BANDS[0]].RasterXSize
+    return (rows, cols), lambda r0, r1: {b: f.GetRasterBand(1).ReadAsArray(0, r0, cols, r1 - r0)
+                                         for b, f in files.items()}
+
+
+def main():
+    ee.Initialize()
+
+    print("--- server ---")
+    for tile in TILES:
+        img = ee.Image(ee.ImageCollection(COLLECTION).filter(ee.Filter.eq('MGRS_TILE', tile))
+                       .filterDate(DATE[0], DATE[1]).filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', MAX_CLOUD))
+                       .sort('CLOUDY_PIXEL_PERCENTAGE').first())
+        print(tile + ": " + img.get('PRODUCT_ID').getInfo())
+        masks = {'iterate': iterate_mask(img).select('hollstein'),
+                 'flat': masking.hollsteinMask(img).select('hollstein')}
+        for method, mask in masks.items():
+            for r in range(REPEAT):
+                clear, t = timed(lambda: mask.reduceRegion(ee.Reducer.mean(), img.geometry(), SCALE,
+                                                           maxPixels=1e10).getInfo())
+                print("  " + method + " (run " + str(r + 1) + "): clear " +
+                      str(round(list(clear.values())[0], 4)) + ", " + str(round(t, 1)) + " s, graph " +
+                      str(generals.graph_size(mask)) + " bytes")
+
+    print("--- local ---")
+    shape, read = local_tile()
+    rows, cols = shape if shape is not None else (TILE_SIZE, TILE_SIZE)
+    for r in range(REPEAT):
+        t_total, clear, peak = 0., 0, 0
+        for r0 in range(0, rows, CHUNK_ROWS):
+            r1 = min(r0 + CHUNK_ROWS, rows)
+            image = read(r0, r1)
+            out, t = timed(lambda: local.hollstein_mask(image))
+            t_total += t
+            clear += int(out['hollstein'].sum())
+            peak = max(peak, sum(a.nbytes for a in image.values()))
+        print("  local (run " + str(r + 1) + "): " + str(rows) + "x" + str(cols) + " px, clear " +
+              str(round(clear / float(rows * cols), 4)) + ", " + str(round(t_total, 1)) + " s, bands per chunk " +
+              str(round(peak / 1e6)) + " MB")
+
+
+if __name__ == '__main__':
+    main()
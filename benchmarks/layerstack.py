@@ -0,0 +1,79 @@
+# ====================================================================================================#
+#
+# Title: Layerstack Benchmark (iterate vs. join/toBands)
+#
+# ====================================================================================================#
+
+'''
+Compares the iterate-based daily mosaic and layerstack of img_layerstack (stack_method="iterate") with the
+join-based mosaic and toBands() stack (stack_method="toBands", generals.mosaic_by_date/stack_bands) on a long
+Landsat NDVI time series (500+ acquisition dates).
+
+For each method the wall time of two server requests is reported:
+    bandNames   – number of bands of the stack (evaluates the mosaic and stack structure)
+    sample      – NDVI of all dates at one point (evaluates pixels)
+as well as the size of the serialized request graph.
+
+Run from the repository root: python benchmarks/layerstack.py (needs Earth Engine credentials).
+'''
+
+import ee
+
+from learthengine import generals
+from learthengine import prepro
+from learthengine.composite.img_layerstack import layerstack, mosaic, get_dates
+
+import time
+
+
+# ====================================================================================================#
+# INPUT
+# ====================================================================================================#
+SENSOR = 'LS'
+YEARS = [1990, 2020]
+ROI = [13.08, 52.32, 13.76, 52.67]   # Berlin, covered by two WRS-2 paths
+POINT = [13.40, 52.52]
+CLOUD_COVER = 70
+REPEAT = 2
+
+
+# ====================================================================================================#
+# EXECUTE
+# ====================================================================================================#
+def timed(fun):
+    t0 = time.time()
+    result = fun()
+    return result, time.time() - t0
+
+
+def main():
+    ee.Initialize()
+
+    roi = ee.Geometry.Rectangle(ROI)
+    point = ee.Geometry.Point(POINT)
+
+    time_filter = generals.time_filter(l_years=YEARS)
+    imgCol = prepro.merge_collections(prepro.sensor_collections(SENSOR, roi, time_filter, cloud_cover=CLOUD_COVER,
+                                                                bands=['R', 'NIR']), SENSOR)
+    imgCol = imgCol.map(prepro.spectral_indices(['NDVI'])).select('NDVI').sort('system:time_start')
+
+    n_dates = imgCol.aggregate_array('system:time_start') \
+        .map(lambda t: ee.Date(t).format("YYYY-MM-dd")).distinct().size().getInfo()
+    print("Acquisition dates: " + str(n_dates))
+
+    stacks = {
+        'iterate': layerstack(mosaic(imgCol, get_dates(imgCol).distinct())),
+        'toBands': generals.stack_bands(generals.mosaic_by_date(imgCol))
+    }
+
+    for method, stack in stacks.items():
+        for r in range(REPEAT):
+            n_bands, t_bands = timed(lambda: stack.bandNames().size().getInfo())
+            _, t_sample = timed(lambda: stack.reduceRegion(ee.Reducer.first(), point, 30).getInfo())
+            print(method + " (run " + str(r + 1) + "): " + str(n_bands) + " bands, bandNames " +
+                  str(round(t_bands, 1)) + " s, sample " + str(round(t_sample, 1)) + " s, graph " +
+                  str(generals.graph_size(stack)) + " bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -1 +1 @@
-from learthengine import prepro, composite, generals, lst
+from learthengine import coefficients, prepro, composite, generals, lst, local
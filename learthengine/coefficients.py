@@ -0,0 +1,54 @@
+"""
+Coefficient and decision tree tables shared by the server side (prepro) and the local (numpy) implementations.
+Plain Python, without ee, so that local can be used without Earth Engine.
+"""
+
+# Tasseled Cap coefficients for B, G, R, NIR, SWIR1, SWIR2 based on Crist (1985)
+tc_coef = {
+    'TCB': [0.2043, 0.4158, 0.5524, 0.5741, 0.3124, 0.2303],
+    'TCG': [-0.1603, -0.2819, -0.4934, 0.7940, -0.0002, -0.1446],
+    'TCW': [0.0315, 0.2021, 0.3102, 0.1594, -0.6806, -0.6109]
+}
+
+# Cunha et al. (2020): "Surface albedo as a proxy for land-cover clearing in seasonally dry forests: Evidence
+# from the Brazilian Caatinga", Remote Sensing of Environment. Coefficients for B, G, R, NIR, SWIR1, SWIR2 and offset.
+albedo_coef = {
+    'L5': [0.3206, 0, 0.1572, 0.3666, 0.1162, 0.0457, -0.0063],
+    'L7': [0.3141, 0, 0.1607, 0.3694, 0.1160, 0.0456, -0.0057],
+    'L8': [0.2453, 0.0508, 0.1804, 0.3081, 0.1332, 0.0521, 0.0011]
+}
+
+# input bands (columns) of tc_coef and albedo_coef
+linear_bands = ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']
+
+# Hollstein et al. (2016) decision tree for Sentinel-2 L1C digital numbers. Leaf conditions by node:
+# (operation, bands, threshold), true if band < threshold, a - b < threshold (difference) or a / b < threshold (ratio).
+# Bands are named by role, see prepro.hollstein_conditions and local.hollstein_code for the band keywords.
+hollstein_thresholds = {
+    '1': ('band', ['green'], 3190),
+    '21': ('band', ['red_edge4'], 1660),
+    '22': ('ratio', ['red_edge1', 'swir'], 4.33),
+    '31': ('difference', ['green', 'red_edge3'], 270),
+    '32': ('ratio', ['blue', 'cirrus'], 14.689),
+    '33': ('difference', ['swir', 'cirrus'], 2550),
+    '34': ('band', ['green'], 5250),
+    '41': ('difference', ['water_vapor', 'swir'], -970),
+    '42': ('difference', ['water_vapor', 'swir'], 210),
+    '43': ('ratio', ['blue', 'water_vapor'], 0.788),
+    '44': ('difference', ['red_edge2', 'red_edge3'], -160),
+    '45': ('band', ['aerosol'], 3000),
+    '46': ('ratio', ['aerosol', 'red_edge1'], 1.184)
+}
+
+# class paths through the tree as [node, outcome] pairs; classes with several paths are named class-1, class-2, ...
+hollstein_classes = {
+    'snow': {'snow': [['1', 0], ['22', 0], ['34', 0]]},
+    'cloud': {'cloud-1': [['1', 0], ['22', 1], ['33', 1], ['44', 1]],
+              'cloud-2': [['1', 0], ['22', 1], ['33', 0], ['45', 0]]},
+    'cirrus': {'cirrus-1': [['1', 0], ['22', 1], ['33', 1], ['44', 0]],
+               'cirrus-2': [['1', 1], ['21', 0], ['32', 1], ['43', 0]]},
+    'shadow': {'shadow-1': [['1', 1], ['21', 1], ['31', 1], ['41', 0]],
+               'shadow-2': [['1', 1], ['21', 1], ['31', 0], ['42', 0]],
+               'shadow-3': [['1', 0], ['22', 0], ['34', 1], ['46', 0]]},
+    'water': {'water': [['1', 1], ['21', 1], ['31', 0], ['42', 1]]}
+}
@@ -1,4 +1,6 @@
 from .scoring import doyscore, doyscore_offset, score, yearscore, cloudscore, \
-    fun_add_doy_band, fun_addyearband, fun_addcloudband, fun_doys
+    fun_add_doy_band, fun_addyearband, fun_addcloudband, fun_doys, trend_reducer, \
+    doy_std, combine_reducers
 from .img_composite import img_composite
 from .img_layerstack import img_layerstack
+from .batch import img_composite_batch, read_rois, group_rois
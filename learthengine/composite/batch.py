@@ -0,0 +1,161 @@
+import json
+import os
+import re
+import time
+
+from learthengine import generals
+from .img_composite import img_composite
+
+
+def _points(coords):
+    """ All [x, y] positions of nested GeoJSON coordinates. """
+    if coords and isinstance(coords[0], (int, float)):
+        return [coords]
+    return [p for c in coords for p in _points(c)]
+
+
+def _bounds(points):
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def _export_name(name):
+    """ name restricted to the characters allowed in task descriptions. """
+    return re.sub(r'[^A-Za-z0-9_\-]', '_', str(name))
+
+
+def read_rois(path, name_property=None):
+    """
+    ROIs of a vector file. GeoJSON is read directly, other formats (e.g. Shapefile, GeoPackage) with GDAL/OGR and
+    reprojected to EPSG:4326.
+
+    :param path:            (Str) vector file of polygons in EPSG:4326 (GeoJSON) or any CRS (OGR).
+    :param name_property:   (Str) property used as export name. Default to None ('ROI' + feature index). Names shared
+                            by several features get the feature index appended, e.g. 'Mitte_3'.
+    :return:                (List) of Dict with 'name' (unique), 'bounds' ([lon1, lat1, lon2, lat2]) and 'properties'.
+    """
+    features = []
+    if os.path.splitext(path)[1].lower() in ['.geojson', '.json']:
+        with open(path) as f:
+            features = json.load(f)['features']
+    else:
+        from osgeo import ogr, osr
+        wgs84 = osr.SpatialReference()
+        wgs84.ImportFromEPSG(4326)
+        wgs84.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        layer = ogr.Open(path).GetLayer()
+        srs = layer.GetSpatialRef()
+        transform = None
+        if srs is not None:
+            srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+            transform = osr.CoordinateTransformation(srs, wgs84)
+        for feature in layer:
+            geom = feature.GetGeometryRef().Clone()
+            if transform is not None:
+                geom.Transform(transform)
+            features.append({'geometry': json.loads(geom.ExportToJson()), 'properties': feature.items()})
+
+    rois = []
+    for i, feature in enumerate(features):
+        properties = feature.get('properties') or {}
+        name = properties.get(name_property) if name_property else None
+        rois.append({'name': _export_name(name if name is not None else 'ROI' + str(i)),
+                     'bounds': _bounds(_points(feature['geometry']['coordinates'])),
+                     'properties': properties})
+
+    # names shared by several features (after sanitizing) get the feature index, so out_files stay unique
+    names = [roi['name'] for roi in rois]
+    taken = set(names)
+    for i, roi in enumerate(rois):
+        if names.count(roi['name']) > 1:
+            name = roi['name'] + '_' + str(i)
+            while name in taken:
+                name += '_' + str(i)
+            taken.add(name)
+            roi['name'] = name
+    return rois
+
+
+def group_rois(rois, overrides=None, max_group_size=None):
+    """
+    Groups ROIs sharing UTM zone and the values of the override properties (e.g. sensor and time window), i.e. ROIs that
+    can be composited from the same collections.
+
+    :param rois:            (List) of ROIs, see read_rois.
+    :param overrides:       (List) of img_composite arguments read from the ROI properties, e.g. ['target_years'].
+    :param max_group_size:  (Int) maximum number of ROIs per group. Default to None (no limit).
+    :return:                (List) of Dict with 'name', 'epsg', 'bounds' (of all ROIs), 'rois' and 'kwargs' (overrides).
+    """
+    if overrides is None:
+        overrides = []
+    grouped = {}
+    for roi in rois:
+        epsg = generals.find_utm((roi['bounds'][0] + roi['bounds'][2]) / 2.)
+        kwargs = {k: roi['properties'][k] for k in overrides if roi['properties'].get(k) is not None}
+        key = (epsg, json.dumps(kwargs, sort_keys=True))
+        grouped.setdefault(key, {'epsg': epsg, 'kwargs': kwargs, 'rois': []})['rois'].append(roi)
+
+    groups = []
+    for (epsg, _), group in sorted(grouped.items()):
+        size = max_group_size or len(group['rois'])
+        for i in range(0, len(group['rois']), size):
+            members = group['rois'][i:i + size]
+            groups.append({'name': epsg.replace(':', '') + '_G' + str(len(groups)).zfill(3), 'epsg': epsg,
+                           'bounds': _bounds([p for roi in members for p in [roi['bounds'][:2], roi['bounds'][2:]]]),
+                           'rois': members, 'kwargs': group['kwargs']})
+    return groups
+
+
+def img_composite_batch(path, name_property=None, per="roi", overrides=None, max_group_size=None, **kwargs):
+    """
+    Runs img_composite for all features of a vector file. ROIs sharing UTM zone, sensor and time window (see
+    group_rois) are composited from one set of collections filtered by the bounds of the group, so the collections are
+    built once per group instead of once per ROI. The UTM zone is derived client side, without a request per ROI.
+    Note that collection wide statistics (the DOY standard deviation of score="PBC") are then computed over the group.
+
+    E.g. img_composite_batch('districts.geojson', name_property='NAME', sensor='LS', score='STM', bands=['NDVI'],
+                             target_years=[2019], scheduler=generals.ExportScheduler())
+
+    :param path:            (Str) vector file of ROIs, see read_rois.
+    :param name_property:   (Str) feature property used as export_name. Default to None ('ROI' + feature index).
+    :param per:             (Str) One of "roi" (one export per ROI and composite) or "group" (one export of the bounds
+                            of each group). Default to "roi".
+    :param overrides:       (List) of img_composite arguments taken from the feature properties if present, e.g.
+                            ['sensor', 'target_years', 'target_doys']. Default to None.
+    :param max_group_size:  (Int) maximum number of ROIs sharing collections. Default to None (no limit).
+    :param kwargs:          further img_composite arguments (except roi, epsg, export_name and collection_roi).
+    :return:                (Dict) report with 'rois', 'groups', 'tasks', 'seconds', 'tasks_per_minute',
+                            'graph_bytes_mean', 'graph_bytes_max' and 'composites' (see img_composite).
+    """
+    rois = read_rois(path, name_property)
+    groups = group_rois(rois, overrides, max_group_size)
+    print(str(len(rois)) + " ROIs in " + str(len(groups)) + " groups.")
+
+    report = {}
+    t0 = time.time()
+    for group in groups:
+        args = dict(kwargs, **group['kwargs'])
+        if per == "group":
+            img_composite(roi=group['bounds'], epsg=group['epsg'], export_name=group['name'], report=report, **args)
+        else:
+            for roi in group['rois']:
+                img_composite(roi=roi['bounds'], collection_roi=group['bounds'], epsg=group['epsg'],
+                              export_name=roi['name'], report=report, **args)
+        tasks = sum(c['tasks'] for c in report.get('composites', []))
+        minutes = max((time.time() - t0) / 60., 1e-9)
+        print(group['name'] + ": " + str(len(group['rois'])) + " ROIs, " + str(tasks) + " tasks so far, " +
+              str(round(tasks / minutes, 1)) + " tasks/min")
+
+    composites = report.get('composites', [])
+    graph_bytes = [c['graph_bytes'] for c in composites]
+    report.update({'rois': len(rois), 'groups': len(groups), 'tasks': sum(c['tasks'] for c in composites),
+                   'seconds': time.time() - t0,
+                   'graph_bytes_mean': sum(graph_bytes) / len(graph_bytes) if graph_bytes else 0,
+                   'graph_bytes_max': max(graph_bytes) if graph_bytes else 0})
+    report['tasks_per_minute'] = report['tasks'] / max(report['seconds'] / 60., 1e-9)
+    print("Submitted " + str(report['tasks']) + " tasks for " + str(len(composites)) + " composites in " +
+          str(round(report['seconds'], 1)) + " s (" + str(round(report['tasks_per_minute'], 1)) + " tasks/min), "
+          "graph size mean " + str(round(report['graph_bytes_mean'])) + " bytes, max " +
+          str(report['graph_bytes_max']) + " bytes.")
+    return report
@@ -22,7 +22,9 @@ def img_composite(sensor='LS', bands=None, pixel_resolution=30, cloud_cover=70,
                   target_doys=None, doy_range=182, doy_vs_year=20, min_clouddistance=10, max_clouddistance=50,
                   weight_doy=0.4, weight_year=0.4, weight_cloud=0.2, buffer_clouds=False, mask_percentiles=False,
                   exclude_slc_off=False, export_option="Drive", asset_path=None, export_name=None, lst_threshold=None,
-                  wv_method="NCEP"):
+                  wv_method="NCEP", ts_significance=False, fuse_maps=True, graph_report=False,
+                  doy_std_method="client", percentiles=None, scheduler=None, max_shard_bytes=None,
+                  manifest=None, workers=None, collection_roi=None, report=None):
     """
     Image compositing function capable of creating pixel-based composites (PBC) according to Griffiths et al. (2013):
     "A Pixel-Based Landsat Compositing Algorithm for Large Area Land Cover Mapping", maximum NDVI composites as well as
@@ -38,7 +40,9 @@ def img_composite(sensor='LS', bands=None, pixel_resolution=30, cloud_cover=70,
     :param roi_geom:                 (List) of rectangle corner coordinates in [lon1, lat1, lon2, lat2]. Default to "Berlin".
     :param score:               (Str) Which method to use for compositing. One of "PBC", "MAXNDVI", "STM" or "NOBS"
                                 (pixel wise number of observations). Default to "STM".
-    :param reducer:             (ee.Reducer object) if score = "STM". Default to ee.Reducer.median().
+    :param reducer:             (ee.Reducer object or List of) if score = "STM". A list is combined into one reducer
+                                (composite.combine_reducers) and computed in one reduce call. Default to
+                                ee.Reducer.median().
     :param epsg:                (Str) EPSG code. Default to None will automatically detect UTM Zone.
     :param target_years:        (List) of target years for compositing. Default to [2019].
     :param surr_years:          (Int) +- years to consider around target_years. Default to 0.
@@ -57,9 +61,45 @@ def img_composite(sensor='LS', bands=None, pixel_resolution=30, cloud_cover=70,
     :param asset_path:          (Str) If export_option = "Asset". Directory string to store Assets in.
     :param export_name:         (Str) Name that is appendend to the image files. E.g. if the study area is Berlin,
                                 the STM = ee.Reducer.median() and the band = "NDVI" one may choose "NDVI_MEDIAN_BERLIN"
+    :param ts_significance:     (Bool) If score = "TS_slope". Adds offset, Kendall's tau and p-value per band from the
+                                same reduce call as the slope. All bands are then exported as float. Default to False.
+    :param fuse_maps:           (Bool) Compose the per-image steps of each collection into a single mapped function
+                                (see generals.fuse). Default to True.
+    :param graph_report:        (Bool) Print the serialized graph size of every composite before export, e.g. to compare
+                                fuse_maps=True and fuse_maps=False. Default to False.
+    :param doy_std_method:      (Str) If score = "PBC". One of "client" (scene DOYs are fetched with getInfo() and the
+                                standard deviation computed with numpy) or "server" (aggregate_total_sd, no synchronous
+                                request per composite). Default to "client".
+    :param percentiles:         (List) If score = "STM". Percentiles added to reducer as a single ee.Reducer.percentile,
+                                e.g. [10, 50, 90]. Default to None.
+    :param scheduler:           (generals.ExportScheduler) queues the exports instead of starting them right away; run
+                                them with scheduler.run(). Default to None.
+    :param max_shard_bytes:     (Float) Split the export region into a grid of pixel aligned shards of at most
+                                max_shard_bytes (uncompressed output size) each, exported as out_file + '_rXXcYY'.
+                                Stitch them with local.stitch_shards. Default to None (one export of the whole roi).
+    :param manifest:            (generals.ExportManifest) records the exports by out_file and a hash of the parameters
+                                the output depends on (all but fuse_maps, graph_report, workers and, unless score =
+                                "PBC", collection_roi); exports completed or running since an earlier run with the same
+                                parameters are skipped, i.e. a rerun only submits missing or failed composites. Default
+                                to None.
+    :param workers:             (Int) Build and submit the composites of all target years and DOYs on a thread pool of
+                                workers threads, i.e. with at most workers Earth Engine API calls in flight. Submits the
+                                same tasks as the default (None), one composite after the other.
+    :param collection_roi:      (List) of rectangle corner coordinates the collections are filtered by, e.g. the bounds
+                                of several ROIs sharing the same collections (see composite.img_composite_batch).
+                                Default to None (roi).
+    :param report:              (Dict) filled with 'composites', a list of Dict with 'out_file', 'tasks' (number of
+                                submitted or queued exports, 0 if skipped by manifest) and 'graph_bytes' (serialized
+                                graph size). Default to None.
     :return:                    If successful, returns "Submitted to Server."
     """
 
+    # parameters the exported pixels depend on, for the manifest keys (not the diagnostics and graph options)
+    params = {k: v for k, v in locals().items() if k not in ['scheduler', 'manifest', 'workers', 'report',
+                                                             'fuse_maps', 'graph_report', 'collection_roi']}
+    if score == 'PBC':
+        params['collection_roi'] = collection_roi  # DOY standard deviation of the whole collection
+
     # defaults
     if roi is None:
         roi = [13.08, 52.32, 13.76, 52.67]  # Berlin
@@ -73,8 +113,10 @@ def img_composite(sensor='LS', bands=None, pixel_resolution=30, cloud_cover=70,
     if bands is None:
         bands = ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']
         print("No bands specified. B-G-R-NIR-SWIR1-SWIR2 it is.")
-    if reducer is None:
+    if (reducer is None) and not percentiles:
         reducer = ee.Reducer.median()
+    if isinstance(reducer, list) or percentiles:
+        reducer = composite.combine_reducers(reducer, percentiles)
     if target_years is None:
         target_years = [2019]
         print("No target years specified. 2019 it is.")
@@ -89,263 +131,286 @@ def img_composite(sensor='LS', bands=None, pixel_resolution=30, cloud_cover=70,
 
     # roi client to server
     roi_geom = ee.Geometry.Rectangle(roi)
+    collection_geom = roi_geom if collection_roi is None else ee.Geometry.Rectangle(collection_roi)
 
     # find epsg
     if epsg is None:
         epsg = generals.find_utm(roi_geom)
 
+    # bands to select right after masking, to add and to keep for compositing
+    band_plan = prepro.plan_bands(bands, score=score, mask_percentiles=mask_percentiles, buffer_clouds=buffer_clouds)
 
-    for year in target_years:
-        for i in range(len(target_doys)):
-
-            # time definition
-            iter_target_doy = target_doys[i]
-            year_min = year - surr_years
-            year_max = year + surr_years
-            time_filter = generals.time_filter(l_years=[year_min, year_max], l_doys=iter_target_doy,
-                                               doy_offset=doy_range)
-            # server side cloud distance
-            REQ_DISTANCE = ee.Number(max_clouddistance)
-            MIN_DISTANCE = ee.Number(min_clouddistance)
-
-            # import collections
-            imgCol_L5_SR = ee.ImageCollection('LANDSAT/LT05/C01/T1_SR') \
-                .filterBounds(roi_geom) \
-                .filter(time_filter) \
-                .filter(ee.Filter.lt('CLOUD_COVER_LAND', cloud_cover)) \
-                .map(prepro.rename_bands_l5) \
-                .map(prepro.mask_landsat_sr(masks, T_threshold=T_threshold, omission=T_omission)) \
-                .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2'], ['TIR'])) \
-                .map(prepro.scale_img(0.1, ['TIR'], ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']))
-
-            imgCol_L7_SR = ee.ImageCollection('LANDSAT/LE07/C01/T1_SR') \
-                .filterBounds(roi_geom) \
-                .filter(time_filter) \
-                .filter(ee.Filter.lt('CLOUD_COVER_LAND', cloud_cover)) \
-                .map(prepro.rename_bands_l7) \
-                .map(prepro.mask_landsat_sr(masks, T_threshold=T_threshold, omission=T_omission)) \
-                .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2'], ['TIR'])) \
-                .map(prepro.scale_img(0.1, ['TIR'], ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']))
-
-            # check SLC_OFF statement
-            if exclude_slc_off:
-                imgCol_L7_SR = imgCol_L7_SR.filter(ee.Filter.date("1999-04-18", "2003-05-31"))
-
-            imgCol_L8_SR = ee.ImageCollection('LANDSAT/LC08/C01/T1_SR') \
-                .filterBounds(roi_geom) \
-                .filter(time_filter) \
-                .filter(ee.Filter.lt('CLOUD_COVER_LAND', cloud_cover)) \
-                .map(prepro.rename_bands_l8) \
-                .map(prepro.mask_landsat_sr(masks, T_threshold=T_threshold, omission=T_omission)) \
-                .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2'], ['TIR'])) \
-                .map(prepro.scale_img(0.1, ['TIR'], ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']))
-
-            imgCol_S2_L1C = ee.ImageCollection('COPERNICUS/S2') \
-                .filterBounds(roi_geom) \
-                .filter(time_filter) \
-                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_cover)) \
-                .map(prepro.mask_s2_cdi(-0.5)) \
-                .map(prepro.rename_bands_s2) \
-                .map(prepro.mask_s2) \
-                .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'RE1', 'RE2', 'RE3', 'NIR', 'RE4', 'SWIR1', 'SWIR2']))
-
-            imgCol_S2_L2A = ee.ImageCollection('COPERNICUS/S2_SR') \
-                .filterBounds(roi_geom) \
-                .filter(time_filter) \
-                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_cover)) \
-                .map(prepro.mask_s2_cdi(-0.5)) \
-                .map(prepro.rename_bands_s2) \
-                .map(prepro.mask_s2_scl) \
-                .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'RE1', 'RE2', 'RE3', 'NIR', 'RE4', 'SWIR1', 'SWIR2']))
+    # time window covering all target years and DOYs
+    time_filter_all = generals.time_filter(l_years=[min(target_years) - surr_years, max(target_years) + surr_years],
+                                           l_doys=target_doys, doy_offset=doy_range)
 
-            if 'LST' in bands:
-                if imgCol_L5_SR.size().getInfo() > 0:
-                    imgCol_L5_SR = lst.apply_lst_prepro(imgCol_L5_SR, sensor="L5", time_filter=time_filter,
-                                                        roi=roi_geom, cloud_cover=cloud_cover, wv_method=wv_method)
-                if imgCol_L7_SR.size().getInfo() > 0:
-                    imgCol_L7_SR = lst.apply_lst_prepro(imgCol_L7_SR, sensor="L7", time_filter=time_filter,
-                                                        roi=roi_geom, cloud_cover=cloud_cover, wv_method=wv_method)
-                if imgCol_L8_SR.size().getInfo() > 0:
-                    imgCol_L8_SR = lst.apply_lst_prepro(imgCol_L8_SR, sensor="L8", time_filter=time_filter,
-                                                        roi=roi_geom, cloud_cover=cloud_cover, wv_method=wv_method)
+    # collections of the needed sensors, preprocessed once for all target years and DOYs
+    imgCols_all = prepro.sensor_collections(sensor, collection_geom, time_filter_all, cloud_cover=cloud_cover,
+                                            masks=masks, T_threshold=T_threshold, T_omission=T_omission,
+                                            exclude_slc_off=exclude_slc_off, fuse_maps=fuse_maps,
+                                            bands=band_plan['inputs'])
 
+    # time windows of all composites
+    time_filters = {}
+    for year in target_years:
+        for iter_target_doy in target_doys:
+            time_filters[(year, iter_target_doy)] = generals.time_filter(l_years=[year - surr_years,
+                                                                                  year + surr_years],
+                                                                         l_doys=iter_target_doy, doy_offset=doy_range)
+
+    # client side information of all composites (collection sizes, scene DOYs), fetched in one request
+    prefetch = generals.Prefetch()
+    for (year, iter_target_doy), time_filter in time_filters.items():
+        key = str(year) + '_' + str(iter_target_doy)
+        if 'LST' in bands:
+            for s in [x for x in ['L5', 'L7', 'L8'] if x in imgCols_all]:
+                prefetch.add(s + '_size_' + key, imgCols_all[s].filter(time_filter).size())
+        elif (score == 'PBC') and (doy_std_method != "server"):
+            imgCol_SR = prepro.merge_collections({s: imgCol.filter(time_filter) for s, imgCol in imgCols_all.items()},
+                                                 sensor)
+            prefetch.add('doys_' + key, imgCol_SR.map(composite.fun_doys).aggregate_array('doy'))
+    if max_shard_bytes is not None:
+        prefetch.add('roi_bounds', generals.roi_bounds(roi_geom, epsg))
+        if score == 'STM':
+            prefetch.add('reducer_outputs', reducer.getOutputs().size())
+    prefetch.fetch()
+
+    # export shards, one grid for all composites (same bands and data type)
+    shards = None
+    if max_shard_bytes is not None:
+        n_bands, bytes_per_band = len(bands), 2
+        if score == 'STM':
+            n_bands = n_bands * prefetch.get('reducer_outputs')
+        elif (score == 'TS_slope') and ts_significance:
+            n_bands, bytes_per_band = n_bands * 4, 4
+        elif score == 'NOBS':
+            n_bands = 1
+        shards = generals.shard_grid(prefetch.get('roi_bounds'), pixel_resolution, n_bands, max_shard_bytes,
+                                     bytes_per_band)
+        size = generals.export_size(generals.grid_bounds(prefetch.get('roi_bounds'), pixel_resolution),
+                                    pixel_resolution, n_bands, bytes_per_band)
+        print("Export size per composite: " + str(round(size['bytes'] / 1e9, 2)) + " GB, " + str(len(shards)) +
+              " shards.")
+
+    def composite_iteration(year, iter_target_doy):
+        # time definition
+        time_filter = time_filters[(year, iter_target_doy)]
+        key = str(year) + '_' + str(iter_target_doy)
+
+        # server side cloud distance
+        REQ_DISTANCE = ee.Number(max_clouddistance)
+        MIN_DISTANCE = ee.Number(min_clouddistance)
+
+        # collections narrowed to the iteration's time window
+        imgCols_SR = {s: imgCol.filter(time_filter) for s, imgCol in imgCols_all.items()}
+
+        for s in [x for x in ['L5', 'L7', 'L8'] if x in imgCols_SR]:
+            if 'LST' in bands:
+                if prefetch.get(s + '_size_' + key, imgCols_SR[s].size()) > 0:
+                    imgCols_SR[s] = lst.apply_lst_prepro(imgCols_SR[s], sensor=s, time_filter=time_filter,
+                                                         roi=collection_geom, cloud_cover=cloud_cover,
+                                                         wv_method=wv_method)
             if 'ALBEDO' in bands:
-                imgCol_L5_SR = imgCol_L5_SR.map(prepro.surface_albedo(sensor="L5"))
-                imgCol_L7_SR = imgCol_L7_SR.map(prepro.surface_albedo(sensor="L7"))
-                imgCol_L8_SR = imgCol_L8_SR.map(prepro.surface_albedo(sensor="L8"))
-
+                imgCols_SR[s] = imgCols_SR[s].map(prepro.surface_albedo(sensor=s))
+
+        # --------------------------------------------------
+        # MERGE imgCols
+        # --------------------------------------------------
+        imgCol_SR = prepro.merge_collections(imgCols_SR, sensor)
+
+        # --------------------------------------------------
+        # Calculate Indices
+        # --------------------------------------------------
+        indices = [x for x in ['NDVI', 'EVI', 'NDWI1', 'NDWI2', 'NDBI', 'TCG', 'TCB', 'TCW']
+                   if x in band_plan['needed']]
+
+        # per-image steps of the merged collection, fused into one mapped function
+        steps = []
+        if indices:
+            steps.append(prepro.spectral_indices(indices))
+
+        if 'LST' in bands:
+            steps.append(prepro.fvc(ndvi_soil=0.15, ndvi_vegetation=0.9))
+            steps.append(lst.emissivity())
+            steps.append(lst.land_surface_temperature(scale=0.01))
+            if lst_threshold:
+                steps.append(lst.mask_lst(threshold=lst_threshold, scale=0.01))
+
+        # --------------------------------------------------
+        # Add DOY, YEAR & CLOUD Bands to ImgCol
+        # --------------------------------------------------
+        if 'DOY' in band_plan['needed']:
+            steps.append(composite.fun_add_doy_band)
+        if 'YEAR' in band_plan['needed']:
+            steps.append(composite.fun_addyearband)
+        if 'CLOUD_DISTANCE' in band_plan['needed']:
+            steps.append(composite.fun_addcloudband(req_distance=max_clouddistance))
+
+        if buffer_clouds:
+            steps.append(prepro.mask_cloudbuffer(min_distance=min_clouddistance))
+
+        # apply percentile masking (optional)
+        if mask_percentiles:
+            imgCol_SR = generals.map_steps(imgCol_SR, steps, fuse_maps)
+            steps = []
+            blwr = imgCol_SR.select('R').reduce(ee.Reducer.percentile([5]))
+            bupr = imgCol_SR.select('B').reduce(ee.Reducer.percentile([95]))
+            steps.append(prepro.mask_percentiles(band_lwr='R', band_upr='B', lwr=blwr, upr=bupr))
+
+        if score == 'PBC':
             # --------------------------------------------------
-            # MERGE imgCols
+            # SCORING 1: DOY
             # --------------------------------------------------
-            if sensor == 'S2_L1C':
-                imgCol_SR = imgCol_S2_L1C
-            elif sensor == 'S2_L2A':
-                imgCol_SR = imgCol_S2_L2A
-            elif sensor == 'LS':
-                imgCol_SR = imgCol_L5_SR.merge(imgCol_L7_SR).merge(imgCol_L8_SR)
-                imgCol_SR = imgCol_SR.sort("system:time_start")
-            elif sensor == 'L8':
-                imgCol_SR = imgCol_L8_SR
-            elif sensor == 'L7':
-                imgCol_SR = imgCol_L7_SR
-            elif sensor == 'L5':
-                imgCol_SR = imgCol_L5_SR
-            elif sensor == 'SL8':
-                imgCol_SR = imgCol_L8_SR.merge(imgCol_S2_L2A)
-            elif sensor == 'SL':
-                imgCol_SR = imgCol_L5_SR.merge(imgCol_L7_SR).merge(imgCol_L8_SR).merge(imgCol_S2_L2A)
+            target_doy = ee.Number(iter_target_doy)
+
+            # retrieve DOY-std, client side (blocking getInfo) or server side
+            if doy_std_method == "server":
+                doy_std = composite.doy_std(imgCol_SR)
             else:
-                imgCol_SR = None
-                print('No sensor specified!')
+                # scene DOYs only depend on the acquisition dates
+                doys = prefetch.get('doys_' + key, imgCol_SR.map(composite.fun_doys).aggregate_array('doy'))
+                doy_std = np.std(doys)
+
+            # add Band with final DOY score to every image in imgCol
+            steps.append(composite.doyscore(ee.Number(doy_std), target_doy))
 
             # --------------------------------------------------
-            # Calculate Indices
+            # SCORING 2: YEAR
             # --------------------------------------------------
-            if ('NDVI' in bands) or (score == 'MAXNDVI') or ('LST' in bands):
-                imgCol_SR = imgCol_SR.map(prepro.ndvi)
-            if 'EVI' in bands:
-                imgCol_SR = imgCol_SR.map(prepro.evi())
-            if 'NDWI1' in bands:
-                imgCol_SR = imgCol_SR.map(prepro.ndwi1)
-            if ('NDWI2' in bands) or ('LST' in bands):
-                imgCol_SR = imgCol_SR.map(prepro.ndwi2)
-            if 'NDBI' in bands:
-                imgCol_SR = imgCol_SR.map(prepro.ndbi)
-            if 'TCG' in bands:
-                imgCol_SR = imgCol_SR.map(prepro.tcg)
-            if 'TCB' in bands:
-                imgCol_SR = imgCol_SR.map(prepro.tcb)
-            if 'TCW' in bands:
-                imgCol_SR = imgCol_SR.map(prepro.tcw)
+            # calculate DOY-score at maximum DOY vs Year threshold
+            doyscore_offset = composite.doyscore_offset(iter_target_doy - doy_vs_year,
+                                                        iter_target_doy, doy_std)
+            doyscore_offset_obj = ee.Number(doyscore_offset)
+            target_years_obj = ee.Number(year)
 
-            if 'LST' in bands:
-                imgCol_SR = imgCol_SR.map(prepro.fvc(ndvi_soil=0.15, ndvi_vegetation=0.9))
-                imgCol_SR = imgCol_SR.map(lst.emissivity())
-                imgCol_SR = imgCol_SR.map(lst.land_surface_temperature(scale=0.01))
-                if lst_threshold:
-                    imgCol_SR = imgCol_SR.map(lst.mask_lst(threshold=lst_threshold, scale=0.01))
+            # add Band with final YEAR score to every image in imgCol
+            steps.append(composite.yearscore(target_years_obj, doyscore_offset_obj))
 
+            # --------------------------------------------------
+            # SCORING 3: CLOUD DISTANCE
+            # --------------------------------------------------
+            steps.append(composite.cloudscore(REQ_DISTANCE, MIN_DISTANCE))
 
             # --------------------------------------------------
-            # Add DOY, YEAR & CLOUD Bands to ImgCol
+            # FINAL SCORING
             # --------------------------------------------------
-            imgCol_SR = imgCol_SR.map(composite.fun_add_doy_band)
-            imgCol_SR = imgCol_SR.map(composite.fun_addyearband)
-            imgCol_SR = imgCol_SR.map(composite.fun_addcloudband(req_distance=max_clouddistance))
-
-            if buffer_clouds:
-                imgCol_SR = imgCol_SR.map(prepro.mask_cloudbuffer(min_distance=min_clouddistance))
-
-            # apply percentile masking (optional)
-            if mask_percentiles:
-                blwr = imgCol_SR.select('R').reduce(ee.Reducer.percentile([5]))
-                bupr = imgCol_SR.select('B').reduce(ee.Reducer.percentile([95]))
-                imgCol_SR = imgCol_SR.map(prepro.mask_percentiles(band_lwr='R', band_upr='B', lwr=blwr, upr=bupr))
-
-            if score == 'PBC':
-                # --------------------------------------------------
-                # SCORING 1: DOY
-                # --------------------------------------------------
-                # add DOY-band to images in imgCol
-                doys = imgCol_SR.map(composite.fun_doys).aggregate_array('doy').getInfo()
-
-                # retrieve target-DOY and DOY-std (client and server side)
-                target_doy = ee.Number(iter_target_doy)
-
-                doy_std_client = np.std(doys)
-
-                doy_std = ee.Number(doy_std_client)
-
-                # add Band with final DOY score to every image in imgCol
-                imgCol_SR = imgCol_SR.map(composite.doyscore(doy_std, target_doy))
-
-                # --------------------------------------------------
-                # SCORING 2: YEAR
-                # --------------------------------------------------
-                # calculate DOY-score at maximum DOY vs Year threshold
-                doyscore_offset = composite.doyscore_offset(iter_target_doy - doy_vs_year,
-                                                            iter_target_doy, doy_std_client)
-                doyscore_offset_obj = ee.Number(doyscore_offset)
-                target_years_obj = ee.Number(year)
-
-                # add Band with final YEAR score to every image in imgCol
-                imgCol_SR = imgCol_SR.map(composite.yearscore(target_years_obj, doyscore_offset_obj))
-
-                # --------------------------------------------------
-                # SCORING 3: CLOUD DISTANCE
-                # --------------------------------------------------
-                imgCol_SR = imgCol_SR.map(composite.cloudscore(REQ_DISTANCE, MIN_DISTANCE))
-
-                # --------------------------------------------------
-                # FINAL SCORING
-                # --------------------------------------------------
-                w_doyscore = ee.Number(weight_doy)
-                w_yearscore = ee.Number(weight_year)
-                w_cloudscore = ee.Number(weight_cloud)
-
-                imgCol_SR = imgCol_SR.map(composite.score(w_doyscore, w_yearscore, w_cloudscore))
-
-                img_composite = imgCol_SR.qualityMosaic(score)
-                img_composite = img_composite.select(bands)
-                img_composite = img_composite.multiply(10000)
-                img_composite = img_composite.int16()
-
-            elif score == 'MAXNDVI':
-                img_composite = imgCol_SR.qualityMosaic('NDVI')
-                img_composite = img_composite.select(bands)
-                img_composite = img_composite.multiply(10000)
-                img_composite = img_composite.int16()
-
-            elif score == 'STM':
-                img_composite = ee.Image(imgCol_SR.select(bands).reduce(reducer))
-                img_composite = img_composite.multiply(10000)
-                img_composite = img_composite.int16()
-
-            elif score == 'TS_slope':
-                imgCol_SR = imgCol_SR.map(generals.add_timeband())
-                for i in range(len(bands)):
+            w_doyscore = ee.Number(weight_doy)
+            w_yearscore = ee.Number(weight_year)
+            w_cloudscore = ee.Number(weight_cloud)
+
+            steps.append(composite.score(w_doyscore, w_yearscore, w_cloudscore))
+            imgCol_SR = generals.map_steps(imgCol_SR, steps, fuse_maps).select(band_plan['keep'])
+
+            img_composite = imgCol_SR.qualityMosaic(score)
+            img_composite = img_composite.select(bands)
+            img_composite = img_composite.multiply(10000)
+            img_composite = img_composite.int16()
+
+        elif score == 'MAXNDVI':
+            imgCol_SR = generals.map_steps(imgCol_SR, steps, fuse_maps).select(band_plan['keep'])
+            img_composite = imgCol_SR.qualityMosaic('NDVI')
+            img_composite = img_composite.select(bands)
+            img_composite = img_composite.multiply(10000)
+            img_composite = img_composite.int16()
+
+        elif score == 'STM':
+            imgCol_SR = generals.map_steps(imgCol_SR, steps, fuse_maps)
+            img_composite = ee.Image(imgCol_SR.select(bands).reduce(reducer))
+            img_composite = img_composite.multiply(10000)
+            img_composite = img_composite.int16()
+
+        elif score == 'TS_slope':
+            imgCol_SR = generals.map_steps(imgCol_SR, steps + [generals.add_timeband()], fuse_maps)
+            for i in range(len(bands)):
+                if ts_significance:
+                    trend = imgCol_SR.select(['TIME', bands[i]]).reduce(composite.trend_reducer())
+                    slope = trend.select('slope').multiply(365.25).multiply(10000)
+                    slope = slope.addBands(trend.select('offset').multiply(10000))
+                    slope = slope.addBands(trend.select(['tau', 'p_value']))
+                    slope = slope.rename([bands[i]+'_slope', bands[i]+'_offset', bands[i]+'_tau',
+                                          bands[i]+'_p_value'])
+                    slope = slope.float()
+                else:
                     slope = imgCol_SR.select(['TIME', bands[i]]).reduce(ee.Reducer.sensSlope())
                     slope = slope.select('slope')
                     slope = slope.multiply(365.25)  # yearly increase
                     slope = slope.multiply(10000).rename(bands[i]+'_slope')
                     slope = slope.int16()
-                    if i == 0:
-                        img_composite = ee.Image(slope)
-                    else:
-                        img_composite = img_composite.addBands(slope)
+                if i == 0:
+                    img_composite = ee.Image(slope)
+                else:
+                    img_composite = img_composite.addBands(slope)
 
-            elif score == 'NOBS':
-                img_composite = imgCol_SR.select(bands[0]).count().rename('NOBS')
-                img_composite = img_composite.int16()
+        elif score == 'NOBS':
+            imgCol_SR = generals.map_steps(imgCol_SR, steps, fuse_maps)
+            img_composite = imgCol_SR.select(bands[0]).count().rename('NOBS')
+            img_composite = img_composite.int16()
 
-            else:
-                print("Invalid score specified. Must be one of 'PBC', 'MAXNDVI', 'STM' or 'NOBS'")
+        else:
+            print("Invalid score specified. Must be one of 'PBC', 'MAXNDVI', 'STM' or 'NOBS'")
 
 
-            # output filename
-            out_file = sensor + '_' + score + '_' + export_name + '_' + \
-                       str(pixel_resolution) + 'm_' + str(iter_target_doy) + '-' + str(doy_range) + \
-                        '_' + str(year) + '-' + str(surr_years)
+        # output filename
+        out_file = sensor + '_' + score + '_' + export_name + '_' + \
+                   str(pixel_resolution) + 'm_' + str(iter_target_doy) + '-' + str(doy_range) + \
+                    '_' + str(year) + '-' + str(surr_years)
 
-            # export image
+        if graph_report:
+            print(out_file + ": " + str(generals.graph_size(img_composite)) +
+                  " bytes serialized graph (fuse_maps=" + str(fuse_maps) + ")")
+
+        # export image
+        out = None
+        if shards is not None:
             if export_option == "Drive":
-                out = ee.batch.Export.image.toDrive(image=img_composite, description=out_file,
-                                                    scale=pixel_resolution,
-                                                    maxPixels=1e13,
-                                                    region=roi_geom['coordinates'][0],
-                                                    crs=epsg)
+                out = generals.submit_shards(scheduler, ee.batch.Export.image.toDrive, shards, epsg, out_file,
+                                             image=img_composite, maxPixels=1e13,
+                                             manifest=manifest, params=params)
             elif export_option == "Asset":
-                out = ee.batch.Export.image.toAsset(image=img_composite, description=out_file,
-                                                    assetId=asset_path+out_file,
-                                                    scale=pixel_resolution,
-                                                    maxPixels=1e13,
-                                                    region=roi_geom['coordinates'][0],
-                                                    crs=epsg)
+                out = generals.submit_shards(scheduler, ee.batch.Export.image.toAsset, shards, epsg, out_file,
+                                             assetId=asset_path+out_file, image=img_composite, maxPixels=1e13,
+                                             manifest=manifest, params=params)
             else:
                 print("Invalid export option specified. Must be one of 'Drive' or 'Asset'")
-
-            process = ee.batch.Task.start(out)
-
+        elif export_option == "Drive":
+            out = generals.submit(scheduler, ee.batch.Export.image.toDrive,
+                                  image=img_composite, description=out_file,
+                                  scale=pixel_resolution,
+                                  maxPixels=1e13,
+                                  region=roi_geom['coordinates'][0],
+                                  crs=epsg,
+                                  manifest=manifest, params=params)
+        elif export_option == "Asset":
+            out = generals.submit(scheduler, ee.batch.Export.image.toAsset,
+                                  image=img_composite, description=out_file,
+                                  assetId=asset_path+out_file,
+                                  scale=pixel_resolution,
+                                  maxPixels=1e13,
+                                  region=roi_geom['coordinates'][0],
+                                  crs=epsg,
+                                  manifest=manifest, params=params)
+        else:
+            print("Invalid export option specified. Must be one of 'Drive' or 'Asset'")
+
+        if report is not None:
+            if isinstance(out, list):
+                tasks = len([x for x in out if x is not None])
+            else:
+                tasks = int(out is not None)
+            report.setdefault('composites', []).append({'out_file': out_file, 'tasks': tasks,
+                                                        'graph_bytes': generals.graph_size(img_composite)})
+        return out_file
+
+    # composites of all target years and DOYs, built and submitted one after the other or on a thread pool
+    iterations = [(year, iter_target_doy) for year in target_years for iter_target_doy in target_doys]
+    if workers:
+        generals.run_parallel(composite_iteration, iterations, workers=workers)
+    else:
+        for year, iter_target_doy in iterations:
+            composite_iteration(year, iter_target_doy)
+
+    if scheduler is not None:
+        return print("Queued " + str(len(scheduler.jobs)) + " exports.")
     return print("Submitted to Server.")
 
 
@@ -56,7 +56,20 @@ def mosaic(imgCol, date):
 
 def img_layerstack(sensor='LS', bands=None, years=None, months=None, pixel_resolution=None, cloud_cover=70,
                   masks=None, roi=None, epsg=None, exclude_slc_off=False, export_option="Drive", asset_path=None,
-                  export_name=None, lst_threshold=None, wv_method="NCEP"):
+                  export_name=None, lst_threshold=None, wv_method="NCEP", stack_method="toBands", export_mode="bands",
+                  scheduler=None, max_shard_bytes=None, manifest=None):
+    # stack_method: "toBands" mosaics scenes per day with a join and stacks them with toBands() (parallel on the
+    # server), "iterate" uses the previous iterate-based mosaic() and layerstack() (serial, also keeps the duplicate
+    # first band of layerstack()).
+    # export_mode: "bands" exports one layerstack per band, "stack" a single stack of all bands (band names prefixed
+    # with the band, e.g. NDVI_L8_2019-07-01). With export_option="Asset" the per-band layerstacks are then derived
+    # from the stack asset with generals.split_stack(ee.Image(asset_id), bands) without masking and mosaicking again.
+    # scheduler: generals.ExportScheduler to queue the exports in instead of starting them right away.
+    # max_shard_bytes: split every export into pixel aligned shards of at most max_shard_bytes (uncompressed),
+    # exported as out_file + '_rXXcYY' and stitched locally with local.stitch_shards.
+    # manifest: generals.ExportManifest, skips exports completed or running since an earlier run with the same
+    # parameters, i.e. a rerun only submits missing or failed layerstacks.
+    params = {k: v for k, v in locals().items() if k not in ['scheduler', 'manifest']}
 
     if roi is None:
         roi = [13.08, 52.32, 13.76, 52.67]  # Berlin
@@ -89,130 +102,78 @@ def img_layerstack(sensor='LS', bands=None, years=None, months=None, pixel_resol
     months = [months] if isinstance(months, int) else months
     time_filter = generals.time_filter(l_years=years, l_months=months)
 
-    # image collections
-    imgCol_L5_SR = ee.ImageCollection('LANDSAT/LT05/C01/T1_SR') \
-        .filterBounds(roi_geom) \
-        .filter(time_filter) \
-        .filter(ee.Filter.lt('CLOUD_COVER_LAND', cloud_cover)) \
-        .map(prepro.rename_bands_l5) \
-        .map(prepro.mask_landsat_sr(masks)) \
-        .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2'], ['TIR'])) \
-        .map(prepro.scale_img(0.1, ['TIR'], ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']))
-
-    imgCol_L7_SR = ee.ImageCollection('LANDSAT/LE07/C01/T1_SR') \
-        .filterBounds(roi_geom) \
-        .filter(time_filter) \
-        .filter(ee.Filter.lt('CLOUD_COVER_LAND', cloud_cover)) \
-        .map(prepro.rename_bands_l7) \
-        .map(prepro.mask_landsat_sr(masks)) \
-        .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2'], ['TIR'])) \
-        .map(prepro.scale_img(0.1, ['TIR'], ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']))
-
-    # check SLC_OFF statement
-    if exclude_slc_off:
-        imgCol_L7_SR = imgCol_L7_SR.filter(ee.Filter.date("1999-04-18", "2003-05-31"))
-
-    imgCol_L8_SR = ee.ImageCollection('LANDSAT/LC08/C01/T1_SR') \
-        .filterBounds(roi_geom) \
-        .filter(time_filter) \
-        .filter(ee.Filter.lt('CLOUD_COVER_LAND', cloud_cover)) \
-        .map(prepro.rename_bands_l8) \
-        .map(prepro.mask_landsat_sr(masks)) \
-        .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2'], ['TIR'])) \
-        .map(prepro.scale_img(0.1, ['TIR'], ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']))
-
-    imgCol_S2_L1C = ee.ImageCollection('COPERNICUS/S2') \
-        .filterBounds(roi_geom) \
-        .filter(time_filter) \
-        .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_cover)) \
-        .map(prepro.mask_s2_cdi(-0.5)) \
-        .map(prepro.rename_bands_s2) \
-        .map(prepro.mask_s2) \
-        .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']))
-
-    imgCol_S2_L2A = ee.ImageCollection('COPERNICUS/S2_SR') \
-        .filterBounds(roi_geom) \
-        .filter(time_filter) \
-        .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', cloud_cover)) \
-        .map(prepro.mask_s2_cdi(-0.5)) \
-        .map(prepro.rename_bands_s2) \
-        .map(prepro.mask_s2_scl) \
-        .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']))
+    # image collections of the needed sensors, reduced to the bands needed for the requested bands
+    band_plan = prepro.plan_bands(bands)
+    imgCols_SR = prepro.sensor_collections(sensor, roi_geom, time_filter, cloud_cover=cloud_cover, masks=masks,
+                                           exclude_slc_off=exclude_slc_off, bands=band_plan['inputs'])
 
+    # collection sizes of all Landsat sensors in one request
+    prefetch = generals.Prefetch()
     if 'LST' in bands:
-        if imgCol_L5_SR.size().getInfo() > 0:
-            imgCol_L5_SR = lst.apply_lst_prepro(imgCol_L5_SR, sensor="L5", time_filter=time_filter,
-                                                roi=roi_geom, cloud_cover=cloud_cover, wv_method=wv_method)
-        if imgCol_L7_SR.size().getInfo() > 0:
-            imgCol_L7_SR = lst.apply_lst_prepro(imgCol_L7_SR, sensor="L7", time_filter=time_filter,
-                                                roi=roi_geom, cloud_cover=cloud_cover, wv_method=wv_method)
-        if imgCol_L8_SR.size().getInfo() > 0:
-            imgCol_L8_SR = lst.apply_lst_prepro(imgCol_L8_SR, sensor="L8", time_filter=time_filter,
-                                                roi=roi_geom, cloud_cover=cloud_cover, wv_method=wv_method)
-
-    if 'ALBEDO' in bands:
-        imgCol_L5_SR = imgCol_L5_SR.map(prepro.surface_albedo(sensor="L5"))
-        imgCol_L7_SR = imgCol_L7_SR.map(prepro.surface_albedo(sensor="L7"))
-        imgCol_L8_SR = imgCol_L8_SR.map(prepro.surface_albedo(sensor="L8"))
+        for s in [x for x in ['L5', 'L7', 'L8'] if x in imgCols_SR]:
+            prefetch.add(s + '_size', imgCols_SR[s].size())
+
+    for s in [x for x in ['L5', 'L7', 'L8'] if x in imgCols_SR]:
+        if 'LST' in bands:
+            if prefetch.get(s + '_size') > 0:
+                imgCols_SR[s] = lst.apply_lst_prepro(imgCols_SR[s], sensor=s, time_filter=time_filter,
+                                                     roi=roi_geom, cloud_cover=cloud_cover, wv_method=wv_method)
+        if 'ALBEDO' in bands:
+            imgCols_SR[s] = imgCols_SR[s].map(prepro.surface_albedo(sensor=s))
 
     # --------------------------------------------------
     # MERGE imgCols
     # --------------------------------------------------
-    if sensor == 'S2_L1C':
-        imgCol_SR = imgCol_S2_L1C
-    elif sensor == 'S2_L2A':
-        imgCol_SR = imgCol_S2_L2A
-    elif sensor == 'LS':
-        imgCol_SR = imgCol_L5_SR.merge(imgCol_L7_SR).merge(imgCol_L8_SR)
-    elif sensor == 'L8':
-        imgCol_SR = imgCol_L8_SR
-    elif sensor == 'L7':
-        imgCol_SR = imgCol_L7_SR
-    elif sensor == 'L5':
-        imgCol_SR = imgCol_L5_SR
-    elif sensor == 'SL8':
-        imgCol_SR = imgCol_L8_SR.merge(imgCol_S2_L2A)
-    elif sensor == 'SL':
-        imgCol_SR = imgCol_L5_SR.merge(imgCol_L7_SR).merge(imgCol_L8_SR).merge(imgCol_S2_L2A)
-    else:
-        imgCol_SR = None
-        print('No sensor specified!')
+    imgCol_SR = prepro.merge_collections(imgCols_SR, sensor)
 
     imgCol_SR = imgCol_SR.sort("system:time_start")
 
     # --------------------------------------------------
     # Calculate Indices
     # --------------------------------------------------
-    if ('NDVI' in bands) or ('LST' in bands):
-        imgCol_SR = imgCol_SR.map(prepro.ndvi)
-    if 'EVI' in bands:
-        imgCol_SR = imgCol_SR.map(prepro.evi())
-    if 'NDWI1' in bands:
-        imgCol_SR = imgCol_SR.map(prepro.ndwi1)
-    if ('NDWI2' in bands) or ('LST' in bands):
-        imgCol_SR = imgCol_SR.map(prepro.ndwi2)
-    if 'NDBI' in bands:
-        imgCol_SR = imgCol_SR.map(prepro.ndbi)
-    if 'TCG' in bands:
-        imgCol_SR = imgCol_SR.map(prepro.tcg)
-    if 'TCB' in bands:
-        imgCol_SR = imgCol_SR.map(prepro.tcb)
-    if 'TCW' in bands:
-        imgCol_SR = imgCol_SR.map(prepro.tcw)
+    indices = [x for x in ['NDVI', 'EVI', 'NDWI1', 'NDWI2', 'NDBI', 'TCG', 'TCB', 'TCW'] if x in band_plan['needed']]
+    steps = []
+    if indices:
+        steps.append(prepro.spectral_indices(indices))
 
     if 'LST' in bands:
-        imgCol_SR = imgCol_SR.map(prepro.fvc(ndvi_soil=0.15, ndvi_vegetation=0.9))
-        imgCol_SR = imgCol_SR.map(lst.emissivity())
-        imgCol_SR = imgCol_SR.map(lst.land_surface_temperature(scale=0.01))
+        steps.append(prepro.fvc(ndvi_soil=0.15, ndvi_vegetation=0.9))
+        steps.append(lst.emissivity())
+        steps.append(lst.land_surface_temperature(scale=0.01))
         if lst_threshold:
-            imgCol_SR = imgCol_SR.map(lst.mask_lst(threshold=lst_threshold, scale=0.01))
+            steps.append(lst.mask_lst(threshold=lst_threshold, scale=0.01))
+    imgCol_SR = generals.map_steps(imgCol_SR, steps)
 
-    dates = get_dates(imgCol_SR)
-    date_range = dates.distinct()
-    newcol = mosaic(imgCol_SR.select(bands), date_range)
+    if stack_method == "iterate":
+        dates = get_dates(imgCol_SR)
+        date_range = dates.distinct()
+        newcol = mosaic(imgCol_SR.select(bands), date_range)
+    else:
+        newcol = generals.mosaic_by_date(imgCol_SR.select(bands))
 
-    for band in bands:
-        lyr = layerstack(newcol.select(band))
+    # one layerstack per band (masking and mosaicking are evaluated by every export) or one stack of all bands
+    if export_mode == "stack":
+        layers = {'STACK': generals.stack_bands(newcol, prefix_band=True)}
+    else:
+        layers = {}
+        for band in bands:
+            if stack_method == "iterate":
+                layers[band] = layerstack(newcol.select(band))
+            else:
+                layers[band] = generals.stack_bands(newcol.select(band))
+
+    # shard grids, from the roi bounds and the number of dates of all layers (one request)
+    shards = {}
+    if max_shard_bytes is not None:
+        prefetch.add('roi_bounds', generals.roi_bounds(roi_geom, epsg))
+        for band, lyr in layers.items():
+            prefetch.add(band + '_nbands', lyr.bandNames().size())
+        prefetch.fetch()
+        for band in layers:
+            shards[band] = generals.shard_grid(prefetch.get('roi_bounds'), pixel_resolution,
+                                               prefetch.get(band + '_nbands'), max_shard_bytes)
+
+    for band, lyr in layers.items():
         lyr = lyr.multiply(10000)
         lyr = lyr.toInt16()
 
@@ -220,22 +181,36 @@ def img_layerstack(sensor='LS', bands=None, years=None, months=None, pixel_resol
                    '_' + str(min(months)) + '-' + str(max(months))
 
         # export image
-        if export_option == "Drive":
-            out = ee.batch.Export.image.toDrive(image=lyr, description=out_file,
-                                                scale=pixel_resolution,
-                                                maxPixels=1e13,
-                                                region=roi_geom['coordinates'][0],
-                                                crs=epsg)
+        if band in shards:
+            if export_option == "Drive":
+                out = generals.submit_shards(scheduler, ee.batch.Export.image.toDrive, shards[band], epsg, out_file,
+                                             image=lyr, maxPixels=1e13, manifest=manifest, params=params)
+            elif export_option == "Asset":
+                out = generals.submit_shards(scheduler, ee.batch.Export.image.toAsset, shards[band], epsg, out_file,
+                                             assetId=asset_path + out_file, image=lyr, maxPixels=1e13,
+                                             manifest=manifest, params=params)
+            else:
+                print("Invalid export option specified. Must be one of 'Drive' or 'Asset'")
+        elif export_option == "Drive":
+            out = generals.submit(scheduler, ee.batch.Export.image.toDrive,
+                                  image=lyr, description=out_file,
+                                  scale=pixel_resolution,
+                                  maxPixels=1e13,
+                                  region=roi_geom['coordinates'][0],
+                                  crs=epsg,
+                                  manifest=manifest, params=params)
         elif export_option == "Asset":
-            out = ee.batch.Export.image.toAsset(image=lyr, description=out_file,
-                                                assetId=asset_path + out_file,
-                                                scale=pixel_resolution,
-                                                maxPixels=1e13,
-                                                region=roi_geom['coordinates'][0],
-                                                crs=epsg)
+            out = generals.submit(scheduler, ee.batch.Export.image.toAsset,
+                                  image=lyr, description=out_file,
+                                  assetId=asset_path + out_file,
+                                  scale=pixel_resolution,
+                                  maxPixels=1e13,
+                                  region=roi_geom['coordinates'][0],
+                                  crs=epsg,
+                                  manifest=manifest, params=params)
         else:
             print("Invalid export option specified. Must be one of 'Drive' or 'Asset'")
 
-        process = ee.batch.Task.start(out)
-
-        return print("Submitted to Server.")
+    if scheduler is not None:
+        return print("Queued " + str(len(scheduler.jobs)) + " exports.")
+    return print("Submitted to Server.")
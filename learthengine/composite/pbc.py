@@ -74,6 +74,7 @@ NOBS = False                          # add layer of number of observations per
 SCORE = 'P90'                         # switch to either process a PBC based on Griffiths et al. (2013) ('SCORE') or
                                         # maximum NDVI composite ('MAX_NDVI') or any string used as name for STMs
 STMs = [ee.Reducer.percentile([90])]                      # None or list of metrics to calculate, e.g. [ee.Reducer.mean()]
+                                                          # (computed in one combined reduce call)
 
 TARGET_YEARS = [1985, 1990, 1995, 2000, 2010, 2015, 2020]  # 1985, 1990, 1995, 2000, 2005, 2010, 2015, 2020
 SURR_YEARS = 1
@@ -92,6 +93,7 @@ BANDNAME = 'NDVI'
 
 export_option = "Asset"
 asset_path = "users/leonxnill/Addis/"
+SCHEDULER = None  # e.g. generals.ExportScheduler(max_running=10) to queue the exports and wait for them
 
 RESAMPLE = None                         # leave to None
 REDUCE_RESOLUTION = None                # leave to None ee.Reducer.mean().unweighted()
@@ -151,6 +153,9 @@ for m in sel_masks:
 if EPSG == 'UTM':
     EPSG = generals.find_utm(ROI)
 
+# time window covering all target years and DOYs, collections are preprocessed once for it
+time_filter_all = generals.time_filter(l_years=[min(TARGET_YEARS) - SURR_YEARS, max(TARGET_YEARS) + SURR_YEARS],
+                                       l_doys=TARGET_DOYS, doy_offset=DOY_RANGE)
 
 for year in TARGET_YEARS:
     for i in range(len(TARGET_DOYS)):
@@ -178,98 +183,19 @@ for year in TARGET_YEARS:
         # .filter(ee.Filter.calendarRange(iter_target_doy_min, iter_target_doy_max, 'day_of_year')) \
 
         # --------------------------------------------------
-        # IMPORT ImageCollections
+        # IMPORT ImageCollections & MERGE imgCols
         # --------------------------------------------------
-        imgCol_L5_SR = ee.ImageCollection('LANDSAT/LT05/C01/T1_SR') \
-            .filterBounds(ROI) \
-            .filter(time_filter) \
-            .filter(ee.Filter.lt('CLOUD_COVER_LAND', CLOUD_COVER)) \
-            .map(prepro.rename_bands_l5) \
-            .map(prepro.mask_landsat_sr(MASKS)) \
-            .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2'], ['TIR'])) \
-            .map(prepro.scale_img(0.1, ['TIR'], ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']))
-
-        imgCol_L7_SR = ee.ImageCollection('LANDSAT/LE07/C01/T1_SR') \
-            .filterBounds(ROI) \
-            .filter(time_filter) \
-            .filter(ee.Filter.lt('CLOUD_COVER_LAND', CLOUD_COVER)) \
-            .map(prepro.rename_bands_l7) \
-            .map(prepro.mask_landsat_sr(MASKS)) \
-            .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2'], ['TIR'])) \
-            .map(prepro.scale_img(0.1, ['TIR'], ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']))
-
-        # check SLC_OFF statement
-        if EXCLUDE_SLC_OFF:
-            imgCol_L7_SR = imgCol_L7_SR.filter(ee.Filter.date("1999-04-18", "2003-05-31"))
-
-        imgCol_L8_SR = ee.ImageCollection('LANDSAT/LC08/C01/T1_SR') \
-            .filterBounds(ROI) \
-            .filter(time_filter) \
-            .filter(ee.Filter.lt('CLOUD_COVER_LAND', CLOUD_COVER)) \
-            .map(prepro.rename_bands_l8) \
-            .map(prepro.mask_landsat_sr(MASKS)) \
-            .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2'], ['TIR'])) \
-            .map(prepro.scale_img(0.1, ['TIR'], ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']))
-
-        imgCol_S2_L1C = ee.ImageCollection('COPERNICUS/S2') \
-            .filterBounds(ROI) \
-            .filter(time_filter) \
-            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', CLOUD_COVER)) \
-            .map(prepro.mask_s2_cdi(-0.5)) \
-            .map(prepro.rename_bands_s2) \
-            .map(prepro.mask_s2) \
-            .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']))
-
-        imgCol_S2_L2A = ee.ImageCollection('COPERNICUS/S2_SR') \
-            .filterBounds(ROI) \
-            .filter(time_filter) \
-            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', CLOUD_COVER)) \
-            .map(prepro.mask_s2_cdi(-0.5)) \
-            .map(prepro.rename_bands_s2) \
-            .map(prepro.mask_s2_scl) \
-            .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']))
+        imgCols_SR = {s: imgCol.filter(time_filter) for s, imgCol in
+                      prepro.sensor_collections(SENSOR, ROI, time_filter_all, cloud_cover=CLOUD_COVER,
+                                                masks=MASKS, exclude_slc_off=EXCLUDE_SLC_OFF).items()}
+        imgCol_SR = prepro.merge_collections(imgCols_SR, SENSOR)
 
         # --------------------------------------------------
-        # MERGE imgCols
+        # Calculate Indices, add DOY, YEAR & CLOUD Bands to ImgCol
         # --------------------------------------------------
-        if SENSOR == 'S2_L1C':
-            imgCol_SR = imgCol_S2_L1C
-        elif SENSOR == 'S2_L2A':
-            imgCol_SR = imgCol_S2_L2A
-        elif SENSOR == 'LS':
-            imgCol_SR = imgCol_L5_SR.merge(imgCol_L7_SR).merge(imgCol_L8_SR)
-            imgCol_SR = imgCol_SR.sort("system:time_start")
-        elif SENSOR == 'L8':
-            imgCol_SR = imgCol_L8_SR
-        elif SENSOR == 'L7':
-            imgCol_SR = imgCol_L7_SR
-        elif SENSOR == 'L5':
-            imgCol_SR = imgCol_L5_SR
-        elif SENSOR == 'SL8':
-            imgCol_SR = imgCol_L8_SR.merge(imgCol_S2_L2A)
-        elif SENSOR == 'SL':
-            imgCol_SR = imgCol_L5_SR.merge(imgCol_L7_SR).merge(imgCol_L8_SR).merge(imgCol_S2_L2A)
-        else:
-            imgCol_SR = None
-            print('No sensor specified!')
-
-        # --------------------------------------------------
-        # Calculate Indices
-        # --------------------------------------------------
-        imgCol_SR = imgCol_SR.map(prepro.ndvi)
-        imgCol_SR = imgCol_SR.map(prepro.ndwi1)
-        imgCol_SR = imgCol_SR.map(prepro.ndwi2)
-        imgCol_SR = imgCol_SR.map(prepro.ndbi)
-        imgCol_SR = imgCol_SR.map(prepro.tcg)
-        imgCol_SR = imgCol_SR.map(prepro.tcb)
-        imgCol_SR = imgCol_SR.map(prepro.tcw)
-
-        # --------------------------------------------------
-        # Add DOY, YEAR & CLOUD Bands to ImgCol
-        # --------------------------------------------------
-        imgCol_SR = imgCol_SR.map(fun_add_doy_band)
-        imgCol_SR = imgCol_SR.map(fun_addyearband)
-        imgCol_SR = imgCol_SR.map(fun_addcloudband)
+        imgCol_SR = imgCol_SR.map(generals.fuse(
+            prepro.spectral_indices(['NDVI', 'NDWI1', 'NDWI2', 'NDBI', 'TCG', 'TCB', 'TCW']),
+            fun_add_doy_band, fun_addyearband, fun_addcloudband))
 
         if SCORE == 'SCORE':
             # --------------------------------------------------
@@ -320,9 +246,8 @@ for year in TARGET_YEARS:
             img_composite = img_composite.int16()
 
             if STMs is not None:
-                for i in range(len(STMs)):
-                    img_composite = img_composite.addBands(ee.Image(imgCol_SR.select(BANDS) \
-                                                                    .reduce(STMs[i])).int16())
+                img_composite = img_composite.addBands(ee.Image(imgCol_SR.select(BANDS) \
+                                                                .reduce(composite.combine_reducers(STMs))).int16())
 
         elif SCORE == 'MAXNDVI':
             img_composite = imgCol_SR.qualityMosaic('NDVI')
@@ -331,18 +256,12 @@ for year in TARGET_YEARS:
             img_composite = img_composite.int16()
 
             if STMs is not None:
-                for i in range(len(STMs)):
-                    img_composite = img_composite.addBands(ee.Image(imgCol_SR.select(BANDS) \
-                                                                    .reduce(STMs[i])).int16())
+                img_composite = img_composite.addBands(ee.Image(imgCol_SR.select(BANDS) \
+                                                                .reduce(composite.combine_reducers(STMs))).int16())
 
         else:
             if STMs is not None:
-                for i in range(len(STMs)):
-                    if i == 0:
-                        img_composite = ee.Image(imgCol_SR.select(BANDS).reduce(STMs[i]))
-                    else:
-                        img_composite = img_composite.addBands(ee.Image(imgCol_SR.select(BANDS) \
-                                                                        .reduce(STMs[i])))
+                img_composite = ee.Image(imgCol_SR.select(BANDS).reduce(composite.combine_reducers(STMs)))
 
                 img_composite = img_composite.multiply(10000)
 
@@ -364,20 +283,23 @@ for year in TARGET_YEARS:
                     '_' + str(year) + '-' + str(SURR_YEARS)
 
         if export_option == "Drive":
-            out = ee.batch.Export.image.toDrive(image=img_composite.toInt16(), description=out_file,
-                                                scale=PIXEL_RESOLUTION,
-                                                maxPixels=1e13,
-                                                region=ROI['coordinates'][0],
-                                                crs=EPSG)
+            out = generals.submit(SCHEDULER, ee.batch.Export.image.toDrive,
+                                  image=img_composite.toInt16(), description=out_file,
+                                  scale=PIXEL_RESOLUTION,
+                                  maxPixels=1e13,
+                                  region=ROI['coordinates'][0],
+                                  crs=EPSG)
         elif export_option == "Asset":
-            out = ee.batch.Export.image.toAsset(image=img_composite.toInt16(), description=out_file,
-                                                assetId=asset_path+out_file,
-                                                scale=PIXEL_RESOLUTION,
-                                                maxPixels=1e13,
-                                                region=ROI['coordinates'][0],
-                                                crs=EPSG)
-
-        process = ee.batch.Task.start(out)
+            out = generals.submit(SCHEDULER, ee.batch.Export.image.toAsset,
+                                  image=img_composite.toInt16(), description=out_file,
+                                  assetId=asset_path+out_file,
+                                  scale=PIXEL_RESOLUTION,
+                                  maxPixels=1e13,
+                                  region=ROI['coordinates'][0],
+                                  crs=EPSG)
+
+if SCHEDULER is not None:
+    print(SCHEDULER.run())
 
 # =====================================================================================================================#
 # END
@@ -18,9 +18,20 @@ def doyscore(doy_std, target_doy):
 
 
 def doyscore_offset(DOY, TARGET_DOY, DOY_STD):
+    """ DOY score at DOY. Computed server side (ee.Number) if DOY_STD is an ee.Number, e.g. from doy_std. """
+    if isinstance(DOY_STD, ee.ComputedObject):
+        return ee.Number(DOY).subtract(TARGET_DOY).divide(DOY_STD).pow(2).multiply(-0.5).exp()
     return np.exp(-0.5 * pow((DOY - TARGET_DOY) / DOY_STD, 2))
 
 
+def doy_std(imgcol):
+    """
+    Server side (population) standard deviation of the scene DOYs of imgcol, as np.std on the client, without a
+    getInfo() round trip.
+    """
+    return ee.Number(ee.FeatureCollection(imgcol.map(fun_doys)).aggregate_total_sd('doy'))
+
+
 def yearscore(target_years_obj, doyscore_offset_obj):
     def wrap(img):
         YEAR = ee.Number.parse(img.date().format("YYYY"))
@@ -72,6 +83,60 @@ def score(w_doyscore, w_yearscore, w_cloudscore):
     return wrap
 
 
+def _percentiles(reducer):
+    """ Percentiles of a plain ee.Reducer.percentile(percentiles), else None. """
+    try:
+        if reducer.func.getSignature()['name'] == 'Reducer.percentile' and list(reducer.args) == ['percentiles']:
+            return list(reducer.args['percentiles'])
+    except (AttributeError, KeyError, TypeError):
+        pass
+    return None
+
+
+def combine_reducers(reducers=None, percentiles=None):
+    """
+    Combines reducers (e.g. [ee.Reducer.mean(), ee.Reducer.stdDev()]) and percentiles (e.g. [10, 50, 90]) into one
+    reducer with shared inputs, so all metrics of all bands are computed in one reduce() call. All percentiles,
+    including those of ee.Reducer.percentile objects in reducers, go into a single ee.Reducer.percentile.
+    Output bands are named as with separate reduce() calls (e.g. NDVI_mean, NDVI_p90), ordered by band.
+
+    :param reducers:    (List) of ee.Reducer objects or a single ee.Reducer.
+    :param percentiles: (List) of percentiles (Int).
+    :return:            ee.Reducer
+    :raises ValueError: if neither reducers nor percentiles are given.
+    """
+    if reducers is None:
+        reducers = []
+    elif isinstance(reducers, ee.Reducer):
+        reducers = [reducers]
+    percentiles = list(percentiles) if percentiles else []
+
+    others = []
+    for reducer in reducers:
+        p = _percentiles(reducer)
+        if p is None:
+            others.append(reducer)
+        else:
+            percentiles += p
+    if percentiles:
+        others.append(ee.Reducer.percentile(sorted(set(percentiles))))
+
+    if not others:
+        raise ValueError("No metrics selected: combine_reducers needs at least one reducer or percentile.")
+    combined = others[0]
+    for reducer in others[1:]:
+        combined = combined.combine(reducer, sharedInputs=True)
+    return combined
+
+
+def trend_reducer():
+    """
+    Sen's slope (slope, offset) and Kendall's correlation (tau, p_value) combined into one reducer over the shared
+    inputs ['TIME', band].
+    """
+    return ee.Reducer.sensSlope().combine(ee.Reducer.kendallsCorrelation(numInputs=2), sharedInputs=True)
+
+
 def fun_add_doy_band(img):
     DOY_value = img.date().getRelative('day', 'year')
     DOY = ee.Image.constant(DOY_value).int().rename('DOY')
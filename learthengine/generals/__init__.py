@@ -1,3 +1,10 @@
 from .find_utm import find_utm
 from .add_timeband import add_timeband
-from .time_filter import time_filter
\ No newline at end of file
+from .time_filter import time_filter
+from .pipeline import fuse, map_steps, graph_size
+from .prefetch import Prefetch, collection_times
+from .layerstack import mosaic_by_date, stack_bands, split_stack
+from .scheduler import ExportScheduler, submit
+from .tiling import roi_bounds, grid_bounds, export_size, shard_grid, submit_shards
+from .manifest import ExportManifest
+from .parallel import run_parallel
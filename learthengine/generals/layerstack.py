@@ -0,0 +1,56 @@
+import ee
+
+
+def mosaic_by_date(imgCol):
+    """
+    Mosaics all scenes of the same acquisition day. Scenes are grouped with a join on the date string instead of
+    iterating over the distinct dates, so the mosaics are computed in parallel. Properties (e.g. satellite_id) and
+    'system:time_start' are taken from the first scene of each day.
+
+    :param imgCol:  (ee.ImageCollection)
+    :return:        (ee.ImageCollection) of daily mosaics, in order of the first scene of each day.
+    """
+    imgCol = imgCol.map(lambda img: img.set('DATE', img.date().format("YYYY-MM-dd")))
+    days = imgCol.distinct('DATE')
+    joined = ee.Join.saveAll(matchesKey='SCENES', ordering='system:time_start') \
+        .apply(days, imgCol, ee.Filter.equals(leftField='DATE', rightField='DATE'))
+
+    def wrap(img):
+        scenes = ee.ImageCollection.fromImages(img.get('SCENES'))
+        return ee.Image(scenes.mosaic()) \
+            .copyProperties(source=img, exclude=['SCENES']).set('system:time_start', img.get('system:time_start'))
+    return ee.ImageCollection(joined.map(wrap))
+
+
+def stack_bands(imgCol, prefix_band=False):
+    """
+    Stacks a collection of images into one image with toBands() and a single rename. Bands are named
+    satellite_id + date, e.g. 'L8_2019-07-01', or with prefix_band band + '_' + satellite_id + date,
+    e.g. 'NDVI_L8_2019-07-01'.
+
+    :param imgCol:      (ee.ImageCollection) of images with property 'satellite_id'. Single-band images unless
+                        prefix_band is True.
+    :param prefix_band: (Bool) Prefix the band names with the image band, needed for multi-band images.
+    :return:            (ee.Image)
+    """
+    def name(img):
+        namestring = ee.String(img.get('satellite_id')).cat(img.date().format("YYYY-MM-dd"))
+        if prefix_band:
+            names = img.bandNames().map(lambda band: ee.String(band).cat('_').cat(namestring))
+        else:
+            names = ee.List([namestring])
+        return ee.Feature(None, {'names': names})
+    names = ee.FeatureCollection(imgCol.map(name)).aggregate_array('names').flatten()
+    return imgCol.toBands().rename(names)
+
+
+def split_stack(img, bands):
+    """
+    Per-band layerstacks of a stack from stack_bands(..., prefix_band=True), e.g. an exported asset. Selecting from
+    the materialized stack does not repeat the masking and mosaicking.
+
+    :param img:     (ee.Image) stack with bands named band + '_' + satellite_id + date.
+    :param bands:   (List) of band names.
+    :return:        (Dict) band: ee.Image
+    """
+    return {band: img.select(band + '_.*') for band in bands}
@@ -0,0 +1,117 @@
+import ee
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+# task states of ee.batch -> manifest states
+task_states = {'UNSUBMITTED': 'SUBMITTED', 'READY': 'SUBMITTED', 'RUNNING': 'RUNNING', 'COMPLETED': 'COMPLETED',
+               'FAILED': 'FAILED', 'CANCEL_REQUESTED': 'FAILED', 'CANCELLED': 'FAILED'}
+
+
+def _normalize(value):
+    """
+    JSON value of a parameter: ee objects by their serialized graph, numpy values as lists/scalars, sets sorted and
+    tuples as lists. Other types raise a TypeError instead of being hashed by an unstable str().
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(_normalize(v) for v in value)
+    if isinstance(value, ee.ComputedObject):
+        return {'ee': value.serialize()}
+    if hasattr(value, 'dtype') and hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError("Parameter of type " + type(value).__name__ + " can not be hashed into a manifest key.")
+
+
+def params_hash(params):
+    """ Short hash of a parameter dict (see _normalize), stable across runs and processes. """
+    text = json.dumps(_normalize(params), sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+
+
+class ExportManifest(object):
+    """
+    Persistent record (JSON lines, one line per state change) of the exports of batch runs, keyed by export name and
+    a hash of all parameters. Reruns skip exports that completed or are still running on the server and only submit
+    missing or failed ones, e.g.:
+
+    manifest = ExportManifest('composites.jsonl')
+    img_composite(..., manifest=manifest)  # rerun after a crash submits only what is left
+
+    States: QUEUED (in an ExportScheduler), SUBMITTED, RUNNING, COMPLETED, FAILED.
+
+    :param path:        (Str) manifest file, created if it does not exist.
+    :param refresh:     (Bool) Update SUBMITTED and RUNNING exports of earlier runs from the server task list on
+                        load. Default to True.
+    """
+
+    def __init__(self, path, refresh=True):
+        self.path = path
+        self.records = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.records[record['key']] = record
+        if refresh:
+            self.refresh()
+
+    @staticmethod
+    def key(name, params=None):
+        """ Manifest key of export name (Str) with params (Dict). """
+        if params is None:
+            return name
+        return name + '@' + params_hash(params)
+
+    def record(self, key, state, task_id=None, error=None):
+        """ Appends a state change of key, keeping the task id of earlier records. """
+        with self._lock:
+            previous = self.records.get(key, {})
+            record = {'key': key, 'state': state, 'task_id': task_id or previous.get('task_id'),
+                      'error': None if error is None else str(error), 'time': time.time()}
+            self.records[key] = record
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        return record
+
+    def state(self, key):
+        return self.records.get(key, {}).get('state')
+
+    def pending(self, key):
+        """ True if key has to be submitted, i.e. it is unknown, failed or was queued but never started. """
+        return self.state(key) in [None, 'QUEUED', 'FAILED']
+
+    def refresh(self, task_list=None):
+        """
+        Updates SUBMITTED and RUNNING exports with the server state of their tasks. Tasks missing from the task list
+        are marked FAILED, i.e. they are submitted again.
+
+        :param task_list:   (List) of Dict with 'id' and 'state'. Default to ee.data.getTaskList().
+        """
+        open_keys = [key for key, record in self.records.items() if record['state'] in ['SUBMITTED', 'RUNNING']]
+        if not open_keys:
+            return
+        if task_list is None:
+            task_list = ee.data.getTaskList()
+        states = {task['id']: task['state'] for task in task_list}
+        for key in open_keys:
+            task_id = self.records[key].get('task_id')
+            state = task_states.get(states.get(task_id), 'FAILED')
+            if state != self.records[key]['state']:
+                self.record(key, state, error=None if state != 'FAILED' else 'task not found or failed')
+
+    def summary(self):
+        states = {}
+        for key, record in self.records.items():
+            states.setdefault(record['state'], []).append(key)
+        return states
@@ -0,0 +1,17 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_parallel(fun, iterations, workers=4):
+    """
+    Calls fun(*args) for all args in iterations on a thread pool, e.g. to build and submit composites while other
+    threads wait for Earth Engine API calls (getInfo, task starts). Each thread makes one call at a time, i.e. at most
+    workers calls are in flight.
+
+    :param fun:         function, called with the items of each iteration as arguments.
+    :param iterations:  (List) of Tuple of arguments, e.g. [(2019, 182), (2019, 213)].
+    :param workers:     (Int) number of threads. Default to 4.
+    :return:            (List) of results in order of iterations. Exceptions of fun are raised.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fun, *args) for args in iterations]
+        return [future.result() for future in futures]
@@ -0,0 +1,94 @@
+import ee
+
+
+def _strip_properties(img):
+    """
+    Splits a trailing .copyProperties(source=...).set('system:time_start', ...) off the result of an image function.
+    Returns (image without the copy, source) or (img, None) if there is no such copy.
+    """
+    try:
+        if img.func.getSignature()['name'] != 'Element.set' or img.args.get('key') != 'system:time_start':
+            return img, None
+        inner = img.args['object']
+        if inner.func.getSignature()['name'] != 'Element.copyProperties':
+            return img, None
+        return ee.Image(inner.args['destination']), inner.args['source']
+    except (AttributeError, KeyError, TypeError):
+        return img, None
+
+
+# functions reading image properties; a step using one of them on its input still needs the copied properties
+property_reads = ('Element.get', 'Element.getNumber', 'Element.getString', 'Element.getArray', 'Element.propertyNames',
+                  'Element.toDictionary', 'Image.date')
+
+
+def _reads_properties(obj, img, seen=None):
+    """ True if the graph of obj reads a property of img. """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return False
+    seen.add(id(obj))
+    if isinstance(obj, (list, tuple)):
+        return any(_reads_properties(x, img, seen) for x in obj)
+    if isinstance(obj, dict):
+        return any(_reads_properties(x, img, seen) for x in obj.values())
+    if not isinstance(obj, ee.ComputedObject) or obj.func is None:
+        return False
+    args = obj.args or {}
+    try:
+        name = obj.func.getSignature()['name']
+    except (AttributeError, KeyError, TypeError):
+        name = None
+    if name in property_reads and any(arg is img for arg in args.values()):
+        return True
+    return any(_reads_properties(x, img, seen) for x in args.values())
+
+
+def fuse(*steps):
+    """
+    Composes per-image functions (e.g. prepro.rename_bands_l8, prepro.mask_landsat_sr(masks), prepro.scale_img(...))
+    into one function, so that a collection needs a single .map() instead of one per step. The copyProperties/
+    set('system:time_start') every step appends to its result is dropped and applied once at the end, from the last
+    image that carried the properties (e.g. with the 'satellite_id' of prepro.rename_bands_*). Steps that read
+    properties of their input (e.g. composite.fun_add_doy_band) or do not copy them themselves (e.g. set a property)
+    get them restored beforehand, so the result has the same properties as one .map() per step.
+    """
+    def restore(out, props):
+        return ee.Image(out.copyProperties(source=props).set('system:time_start', props.get('system:time_start')))
+
+    def wrap(img):
+        out = img
+        props = img  # image carrying the properties of out
+        has_properties = True
+        for step in steps:
+            result, source = _strip_properties(step(out))
+            if not has_properties and (source is None or _reads_properties(result, out)):
+                out = restore(out, props)
+                has_properties = True
+                result, source = _strip_properties(step(out))
+            if source is not None:
+                if has_properties:
+                    props = out
+                has_properties = False
+            out = result
+        if has_properties:
+            return out
+        return restore(out, props)
+    return wrap
+
+
+def map_steps(imgcol, steps, fused=True):
+    """ Maps steps over imgcol, as one fused function or (fused=False) one .map() per step. """
+    if not steps:
+        return imgcol
+    if fused:
+        return imgcol.map(fuse(*steps))
+    for step in steps:
+        imgcol = imgcol.map(step)
+    return imgcol
+
+
+def graph_size(obj):
+    """ Size in bytes of the serialized request graph of an ee object. """
+    return len(obj.serialize())
@@ -0,0 +1,94 @@
+import ee
+import threading
+
+
+class _Request(object):
+    """ One ee.Dictionary(...).getInfo() round trip in flight, waited for by getters of its keys. """
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.done = threading.Event()
+        self.error = None
+
+
+class Prefetch(object):
+    """
+    Collects client side questions (collection sizes, DOY lists, time stamps, ...) as server side objects and answers
+    all pending ones with a single ee.Dictionary(...).getInfo() request.
+
+    prefetch = Prefetch()
+    prefetch.add('L5_size', imgCol_L5.size())
+    prefetch.add('L8_size', imgCol_L8.size())
+    prefetch.get('L5_size')  # one request for both
+
+    Can be shared between threads. The lock is only held to move questions and answers, not during requests, i.e.
+    threads fetch different questions concurrently and getters of a question in flight wait for its request.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.results = {}
+        self.requests = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def add(self, key, obj):
+        """ Registers obj (ee object) under key (Str) for the next fetch. """
+        with self._lock:
+            self._add(key, obj)
+        return key
+
+    def _add(self, key, obj):
+        if key not in self.results and key not in self._inflight:
+            self.pending[key] = obj
+
+    def fetch(self):
+        """ Answers all pending questions in one request. """
+        with self._lock:
+            pending, self.pending = self.pending, {}
+            if not pending:
+                return self.results
+            request = _Request(list(pending))
+            for key in request.keys:
+                self._inflight[key] = request
+        try:
+            values = ee.Dictionary(pending).getInfo()
+        except Exception as e:
+            with self._lock:
+                for key in request.keys:
+                    del self._inflight[key]
+                    self.pending.setdefault(key, pending[key])  # asked again by the next fetch
+                request.error = e
+                request.done.set()
+            raise
+        with self._lock:
+            self.results.update(values)
+            self.requests += 1
+            for key in request.keys:
+                del self._inflight[key]
+            request.done.set()
+        return self.results
+
+    def get(self, key, obj=None):
+        """ Client side value of key. Fetches all pending questions (and obj, if key is unknown) if necessary. """
+        while True:
+            with self._lock:
+                if key in self.results:
+                    return self.results[key]
+                request = self._inflight.get(key)
+                if request is None:
+                    if obj is not None:
+                        self._add(key, obj)
+                    elif key not in self.pending:
+                        raise KeyError(key)
+            if request is None:
+                self.fetch()
+            else:
+                request.done.wait()
+                if request.error is not None:
+                    raise request.error
+
+
+def collection_times(imgcol):
+    """ Sorted 'system:time_start' of all images in imgcol (server side list). """
+    return imgcol.sort("system:time_start").aggregate_array("system:time_start")
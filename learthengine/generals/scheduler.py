@@ -0,0 +1,183 @@
+import time
+
+
+class ExportJob(object):
+    """ One export definition of an ExportScheduler, see ExportScheduler.add. """
+
+    def __init__(self, name, export, kwargs, manifest=None, manifest_key=None):
+        self.name = name
+        self.export = export
+        self.kwargs = kwargs
+        self.manifest = manifest
+        self.manifest_key = manifest_key
+        self.task = None
+        self.state = 'QUEUED'
+        self.attempts = 0
+        self.next_start = 0
+        self.error = None
+
+    def make_task(self):
+        return self.export(**self.kwargs)
+
+    def record(self, state):
+        """ Records state in the manifest (generals.ExportManifest), if any. """
+        if self.manifest is not None:
+            task_id = getattr(self.task, 'id', None) if self.task is not None else None
+            self.manifest.record(self.manifest_key, state, task_id=task_id, error=self.error)
+
+
+class ExportScheduler(object):
+    """
+    Queues export definitions and keeps at most max_running of them running on the server. Failed exports (task state
+    FAILED or an error on start, e.g. a full task queue) are retried up to max_retries times with exponential backoff.
+
+    Exports are added as the export function and its arguments, so a failed export can be submitted again as a new
+    task, e.g.:
+
+    scheduler = ExportScheduler(max_running=10)
+    scheduler.add(out_file, ee.batch.Export.image.toDrive, image=img, description=out_file, scale=30, ...)
+    scheduler.run()
+
+    Anything returning objects with start() and status() (dict with 'state' and 'error_message') can act as export
+    function, e.g. an in-process fake of ee.batch; sleep and clock can be replaced as well.
+
+    :param max_running:     (Int) maximum number of tasks submitted and not finished at a time. Default to 10.
+    :param max_retries:     (Int) retries per export after the first attempt. Default to 3.
+    :param backoff:         (Float) seconds to wait before the first retry, doubled (backoff_factor) every retry.
+    :param max_backoff:     (Float) maximum seconds to wait before a retry.
+    :param poll_interval:   (Float) seconds between status polls of running tasks. Default to 30.
+    """
+
+    def __init__(self, max_running=10, max_retries=3, backoff=30, backoff_factor=2, max_backoff=3600,
+                 poll_interval=30, sleep=time.sleep, clock=time.time, verbose=True):
+        self.max_running = max_running
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.sleep = sleep
+        self.clock = clock
+        self.verbose = verbose
+        self.jobs = []
+
+    def add(self, name, export, manifest=None, manifest_key=None, **kwargs):
+        """
+        Queues an export.
+
+        :param name:            (Str) name of the export, e.g. the task description.
+        :param export:          export function returning an unstarted task, e.g. ee.batch.Export.image.toDrive.
+        :param manifest:        (generals.ExportManifest) records the state changes of the export. Default to None.
+        :param manifest_key:    (Str) key of the export in manifest. Default to name.
+        :param kwargs:          arguments of export.
+        :return:                ExportJob
+        """
+        job = ExportJob(name, export, kwargs, manifest, manifest_key or name)
+        self.jobs.append(job)
+        job.record('QUEUED')
+        return job
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    def _failed(self, job, error):
+        job.error = error
+        if job.attempts > self.max_retries:
+            job.state = 'FAILED'
+            job.record('FAILED')
+            self._log(job.name + ": failed after " + str(job.attempts) + " attempts (" + str(error) + ")")
+        else:
+            wait = min(self.backoff * self.backoff_factor ** (job.attempts - 1), self.max_backoff)
+            job.state = 'RETRY'
+            job.next_start = self.clock() + wait
+            self._log(job.name + ": attempt " + str(job.attempts) + " failed (" + str(error) + "), retry in " +
+                      str(round(wait)) + " s")
+
+    def _start(self, job):
+        job.attempts += 1
+        try:
+            job.task = job.make_task()
+            job.task.start()
+        except Exception as e:
+            self._failed(job, e)
+            return
+        job.state = 'RUNNING'
+        job.record('SUBMITTED')
+        self._log(job.name + ": submitted (attempt " + str(job.attempts) + ")")
+
+    def _poll(self, job):
+        try:
+            status = job.task.status()
+        except Exception as e:
+            self._log(job.name + ": status request failed (" + str(e) + ")")
+            return
+        state = status.get('state')
+        if state == 'COMPLETED':
+            job.state = 'COMPLETED'
+            job.record('COMPLETED')
+            self._log(job.name + ": completed")
+        elif state in ['FAILED', 'CANCELLED']:
+            self._failed(job, status.get('error_message', state))
+        elif (state == 'RUNNING') and (job.manifest is not None) and \
+                (job.manifest.state(job.manifest_key) != 'RUNNING'):
+            job.record('RUNNING')
+
+    def step(self):
+        """ One scheduling round: polls running tasks and starts queued or due exports up to max_running. """
+        for job in self.jobs:
+            if job.state == 'RUNNING':
+                self._poll(job)
+        running = len([job for job in self.jobs if job.state == 'RUNNING'])
+        now = self.clock()
+        for job in self.jobs:
+            if running >= self.max_running:
+                break
+            if (job.state == 'QUEUED') or (job.state == 'RETRY' and job.next_start <= now):
+                self._start(job)
+                if job.state == 'RUNNING':
+                    running += 1
+
+    def done(self):
+        return all(job.state in ['COMPLETED', 'FAILED'] for job in self.jobs)
+
+    def run(self):
+        """
+        Runs until all exports completed or failed for good.
+
+        :return:    (Dict) state: list of export names.
+        """
+        self.step()
+        while not self.done():
+            self.sleep(self.poll_interval)
+            self.step()
+        return self.summary()
+
+    def summary(self):
+        states = {}
+        for job in self.jobs:
+            states.setdefault(job.state, []).append(job.name)
+        return states
+
+
+def submit(scheduler, export, manifest=None, params=None, **kwargs):
+    """
+    Starts export(**kwargs) right away or, if scheduler (ExportScheduler) is given, queues it there under its
+    description. With a manifest (generals.ExportManifest), exports that completed or are running since an earlier run
+    (same description and params) are skipped and all state changes are recorded.
+
+    :param params:  (Dict) parameters the export depends on, hashed into the manifest key.
+    :return:        the started task, the queued ExportJob or None if skipped.
+    """
+    key = None
+    if manifest is not None:
+        key = manifest.key(kwargs.get('description'), params)
+        if not manifest.pending(key):
+            return None
+    if scheduler is not None:
+        return scheduler.add(kwargs.get('description'), export, manifest=manifest, manifest_key=key, **kwargs)
+    task = export(**kwargs)
+    task.start()
+    if manifest is not None:
+        manifest.record(key, 'SUBMITTED', task_id=getattr(task, 'id', None))
+    return task
@@ -0,0 +1,111 @@
+import ee
+import math
+
+from .scheduler import submit
+
+
+def roi_bounds(roi_geom, epsg):
+    """ Bounding box coordinates of roi_geom in epsg (server side list, e.g. for a Prefetch). """
+    return ee.Geometry(roi_geom).transform(epsg, 1).bounds(1, epsg).coordinates()
+
+
+def grid_bounds(coords, pixel_resolution):
+    """
+    Extent of coords snapped outwards to the pixel grid of pixel_resolution (origin 0, 0), so that shards and exports
+    of different runs share the same pixel edges.
+
+    :param coords:              (List) of rings of [x, y] in CRS units, e.g. roi_bounds(...).getInfo().
+    :param pixel_resolution:    (Int) pixel size in CRS units.
+    :return:                    (List) [x0, y0, x1, y1]
+    """
+    xs = [p[0] for ring in coords for p in ring]
+    ys = [p[1] for ring in coords for p in ring]
+    return [math.floor(min(xs) / pixel_resolution) * pixel_resolution,
+            math.floor(min(ys) / pixel_resolution) * pixel_resolution,
+            math.ceil(max(xs) / pixel_resolution) * pixel_resolution,
+            math.ceil(max(ys) / pixel_resolution) * pixel_resolution]
+
+
+def export_size(bounds, pixel_resolution, n_bands, bytes_per_band=2):
+    """
+    Uncompressed size of an export of bounds.
+
+    :param bounds:              (List) [x0, y0, x1, y1] on the pixel grid, see grid_bounds.
+    :param pixel_resolution:    (Int) pixel size in CRS units.
+    :param n_bands:             (Int) number of output bands.
+    :param bytes_per_band:      (Int) bytes per pixel and band, e.g. 2 for int16. Default to 2.
+    :return:                    (Dict) 'cols', 'rows', 'pixels' and 'bytes'.
+    """
+    cols = int(round((bounds[2] - bounds[0]) / pixel_resolution))
+    rows = int(round((bounds[3] - bounds[1]) / pixel_resolution))
+    return {'cols': cols, 'rows': rows, 'pixels': cols * rows, 'bytes': cols * rows * n_bands * bytes_per_band}
+
+
+def _splits(n, parts):
+    """ parts + 1 offsets splitting n pixels into parts of (almost) equal size. """
+    return [n * i // parts for i in range(parts + 1)]
+
+
+def shard_grid(coords, pixel_resolution, n_bands, max_bytes, bytes_per_band=2):
+    """
+    Splits the extent of coords into a grid of pixel aligned shards of at most max_bytes (uncompressed) each. An export
+    within the budget stays a single shard, otherwise the extent is cut into full-width row strips, and only if a single
+    row exceeds the budget into columns as well. Shards are named by row (north to south) and column (west to east),
+    e.g. '_r00c01'.
+
+    :param coords:              (List) of rings of [x, y] in CRS units, e.g. roi_bounds(...).getInfo().
+    :param pixel_resolution:    (Int) pixel size in CRS units.
+    :param n_bands:             (Int) number of output bands.
+    :param max_bytes:           (Float) maximum uncompressed size of a shard, e.g. 2e9.
+    :param bytes_per_band:      (Int) bytes per pixel and band, e.g. 2 for int16. Default to 2.
+    :return:                    (List) of Dict with 'suffix', 'bounds' ([x0, y0, x1, y1]) and 'transform'
+                                (crsTransform of the shard).
+    """
+    bounds = grid_bounds(coords, pixel_resolution)
+    size = export_size(bounds, pixel_resolution, n_bands, bytes_per_band)
+    max_pixels = int(max_bytes // (n_bands * bytes_per_band))
+    if max_pixels < 1:
+        raise ValueError("max_bytes is smaller than one pixel of all bands.")
+    if size['bytes'] <= max_bytes:
+        n_cols = n_rows = 1
+    else:
+        n_cols = int(math.ceil(size['cols'] / float(max_pixels)))
+        strip_rows = max_pixels // int(math.ceil(size['cols'] / float(n_cols)))
+        n_rows = int(math.ceil(size['rows'] / float(strip_rows)))
+    col_splits = _splits(size['cols'], n_cols)
+    row_splits = _splits(size['rows'], n_rows)
+
+    shards = []
+    for r in range(n_rows):
+        y1 = bounds[3] - row_splits[r] * pixel_resolution
+        y0 = bounds[3] - row_splits[r + 1] * pixel_resolution
+        for c in range(n_cols):
+            x0 = bounds[0] + col_splits[c] * pixel_resolution
+            x1 = bounds[0] + col_splits[c + 1] * pixel_resolution
+            shards.append({'suffix': '_r' + str(r).zfill(2) + 'c' + str(c).zfill(2),
+                           'bounds': [x0, y0, x1, y1],
+                           'transform': [pixel_resolution, 0, x0, 0, -pixel_resolution, y1]})
+    return shards
+
+
+def submit_shards(scheduler, export, shards, crs, description, assetId=None, **kwargs):
+    """
+    Submits (see submit) one export per shard of shard_grid. Descriptions and asset ids get the shard suffix, the
+    shards are exported on their crsTransform instead of scale, i.e. on one common pixel grid.
+
+    :param export:      export function, e.g. ee.batch.Export.image.toDrive.
+    :param shards:      (List) of shards, see shard_grid.
+    :param crs:         (Str) EPSG code of the shards.
+    :param description: (Str) name of the unsharded export.
+    :param assetId:     (Str) asset id of the unsharded export, if export is ee.batch.Export.image.toAsset.
+    :param kwargs:      further arguments of export, e.g. image and maxPixels.
+    :return:            (List) of started tasks or queued ExportJobs.
+    """
+    out = []
+    for shard in shards:
+        if assetId is not None:
+            kwargs['assetId'] = assetId + shard['suffix']
+        out.append(submit(scheduler, export, description=description + shard['suffix'],
+                          region=ee.Geometry.Rectangle(shard['bounds'], crs, False),
+                          crs=crs, crsTransform=shard['transform'], **kwargs))
+    return out
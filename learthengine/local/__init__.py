@@ -0,0 +1,13 @@
+from .scoring import doyscore, doyscore_offset, yearscore, cloudscore, score, quality_mosaic, to_int16, \
+    scene_doys, scene_years
+from .cloud_distance import cloud_distance, cloud_distance_tiled, mask_cloudbuffer
+from .img_composite import pbc_composite
+from .streaming import PBCAccumulator, pbc_composite_stream
+from .incremental import CompositeState, init_composite_state, update_composite_state
+from .lst import land_surface_temperature
+from .indices import spectral_indices, linear_transform, linear_coefficients
+from .masking import mask_landsat_sr, mask_s2, mask_s2_scl, pack_mask, unpack_mask, PackedMasks
+from .hollstein import hollstein_code, hollstein_mask
+from .stm import STMAccumulator, stm_chunked
+from .trend import sens_slope, ts_slope, trend_statistics
+from .stitch import shard_files, stitch_shards
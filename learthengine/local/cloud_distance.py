@@ -0,0 +1,108 @@
+import os
+import numpy as np
+
+
+def _column_distance(cloud, limit):
+    """ Distance along each column to the nearest cloud pixel, saturated at limit. """
+    rows = cloud.shape[0]
+    g = np.full(cloud.shape, limit, dtype=np.float64)
+    run = np.full(cloud.shape[1:], limit, dtype=np.float64)
+    for y in range(rows):
+        run = np.where(cloud[y], 0, np.minimum(run + 1, limit))
+        g[y] = run
+    run = np.full(cloud.shape[1:], limit, dtype=np.float64)
+    for y in range(rows - 1, -1, -1):
+        run = np.where(cloud[y], 0, np.minimum(run + 1, limit))
+        g[y] = np.minimum(g[y], run)
+    return g
+
+
+def cloud_distance(mask, req_distance):
+    """
+    Local equivalent of composite.fun_addcloudband. Exact euclidean distance (in pixels) of every clear pixel to the
+    nearest masked pixel, searched within a radius of req_distance.
+
+    :param mask:            (np.ndarray) bool of shape (y, x), True where the pixel is clear.
+    :param req_distance:    (Int) search radius in pixels. Pixels without a cloud inside the radius get req_distance.
+    :return:                (np.ndarray) float32 CLOUD_DISTANCE, 0 for masked pixels.
+    """
+    cloud = ~np.asarray(mask, dtype=bool)
+    limit = req_distance + 1
+    g2 = _column_distance(cloud, limit) ** 2
+
+    cols = cloud.shape[1]
+    d2 = g2.copy()
+    for dx in range(1, min(req_distance, cols - 1) + 1):
+        d2[:, dx:] = np.minimum(d2[:, dx:], g2[:, :-dx] + dx ** 2)
+        d2[:, :-dx] = np.minimum(d2[:, :-dx], g2[:, dx:] + dx ** 2)
+
+    distance = np.sqrt(d2)
+    distance[distance > req_distance] = req_distance
+    distance[cloud] = 0
+    return distance.astype(np.float32)
+
+
+def _tile_distance(args):
+    tile, req_distance, crop = args
+    y0, y1, x0, x1 = crop
+    return cloud_distance(tile, req_distance)[y0:y1, x0:x1]
+
+
+def _tiles(rows, cols, tile_size, halo):
+    for r0 in range(0, rows, tile_size):
+        for c0 in range(0, cols, tile_size):
+            r1, c1 = min(r0 + tile_size, rows), min(c0 + tile_size, cols)
+            h = (max(r0 - halo, 0), min(r1 + halo, rows), max(c0 - halo, 0), min(c1 + halo, cols))
+            yield (r0, r1, c0, c1), h
+
+
+def _write(out, crop, future):
+    r0, r1, c0, c1 = crop
+    out[r0:r1, c0:c1] = future.result()
+
+
+def cloud_distance_tiled(mask, req_distance, tile_size=1024, processes=None):
+    """
+    Tiled variant of local.cloud_distance for large scenes. Every tile is read with a halo of req_distance pixels,
+    which is the maximum search radius, hence the mosaic of tiles is identical to the untiled transform. Tiles are
+    processed in parallel on a process pool, with at most two tiles per process in flight, i.e. memory beyond mask and
+    output is a few tiles.
+
+    :param mask:            (Array-like) bool of shape (y, x), True where clear, e.g. a np.memmap.
+    :param req_distance:    (Int) search radius in pixels (max_clouddistance).
+    :param tile_size:       (Int) edge length of the tiles without halo.
+    :param processes:       (Int) number of worker processes. 1 runs serially. Default to os.cpu_count().
+    :return:                (np.ndarray) float32 CLOUD_DISTANCE.
+    """
+    rows, cols = mask.shape
+    out = np.empty((rows, cols), dtype=np.float32)
+    tiles = list(_tiles(rows, cols, tile_size, req_distance))
+
+    def jobs():
+        for (r0, r1, c0, c1), (h0, h1, w0, w1) in tiles:
+            tile = np.asarray(mask[h0:h1, w0:w1], dtype=bool)
+            yield tile, req_distance, (r0 - h0, r1 - h0, c0 - w0, c1 - w0)
+
+    if processes == 1 or len(tiles) == 1:
+        results = map(_tile_distance, jobs())
+        for ((r0, r1, c0, c1), _), d in zip(tiles, results):
+            out[r0:r1, c0:c1] = d
+    else:
+        # at most 2 tiles per worker submitted (sliced and pickled) at a time, results written as they come back
+        from collections import deque
+        from concurrent.futures import ProcessPoolExecutor
+        workers = processes or os.cpu_count() or 1
+        window = deque()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for (crop, _), job in zip(tiles, jobs()):
+                window.append((crop, pool.submit(_tile_distance, job)))
+                if len(window) >= workers * 2:
+                    _write(out, *window.popleft())
+            while window:
+                _write(out, *window.popleft())
+    return out
+
+
+def mask_cloudbuffer(mask, distance, min_distance):
+    """ Local equivalent of prepro.mask_cloudbuffer. """
+    return np.asarray(mask, dtype=bool) & (distance >= min_distance)
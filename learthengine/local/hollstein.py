@@ -0,0 +1,75 @@
+import numpy as np
+
+from learthengine.coefficients import hollstein_classes, hollstein_thresholds
+
+
+# decision tree leafs of prepro.hollsteinMask, the bit of each condition in the per-pixel code
+condition_bits = list(hollstein_thresholds)
+
+
+def _path_bits(path):
+    """ (care, value) bit patterns of a path, i.e. a pixel follows the path if code & care == value. """
+    care = value = 0
+    for key, boolean in path:
+        bit = 1 << condition_bits.index(key)
+        care |= bit
+        if boolean:
+            value |= bit
+    return care, value
+
+
+def hollstein_code(image, aerosol='B1', blue='B2', green='B3', red_edge1='B5', red_edge2='B6', red_edge3='B7',
+                   red_edge4='B8A', water_vapor='B9', cirrus='B10', swir='B11'):
+    """
+    Evaluates all 13 leaf conditions of the Hollstein et al. (2016) decision tree once and packs them into one
+    uint16 code per pixel (bit i set if condition condition_bits[i] is true).
+
+    :param image:   (Dict) of bandname -> np.ndarray of Sentinel-2 L1C digital numbers.
+    """
+    roles = {'aerosol': aerosol, 'blue': blue, 'green': green, 'red_edge1': red_edge1, 'red_edge2': red_edge2,
+             'red_edge3': red_edge3, 'red_edge4': red_edge4, 'water_vapor': water_vapor, 'cirrus': cirrus,
+             'swir': swir}
+    b = {k: np.asarray(image[v], dtype=np.float64) for k, v in roles.items()}
+
+    conditions = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for key, (operation, bands, threshold) in hollstein_thresholds.items():
+            if operation == 'difference':
+                value = b[bands[0]] - b[bands[1]]
+            elif operation == 'ratio':
+                value = b[bands[0]] / b[bands[1]]
+            else:
+                value = b[bands[0]]
+            conditions[key] = value < threshold
+
+    code = np.zeros(b['green'].shape, dtype=np.uint16)
+    for i, key in enumerate(condition_bits):
+        code |= conditions[key].astype(np.uint16) << i
+    return code
+
+
+def hollstein_mask(image, options=('cloud', 'snow', 'shadow', 'water', 'cirrus'), name='hollstein', **bands):
+    """
+    Local equivalent of prepro.hollsteinMask. Class paths are resolved with bitwise operations on the condition code
+    of hollstein_code.
+
+    :param image:   (Dict) of bandname -> np.ndarray of Sentinel-2 L1C digital numbers.
+    :param options: (List) of classes to detect.
+    :param bands:   bandname keywords passed to hollstein_code.
+    :return:        (Dict) of class -> bool array plus name -> bool array (True where no class applies, i.e. clear).
+    """
+    code = hollstein_code(image, **bands)
+
+    out = {}
+    for option in options:
+        for key, path in hollstein_classes[option].items():
+            care, value = _path_bits(path)
+            hit = (code & care) == value
+            baseclass = key.split('-')[0]
+            out[baseclass] = out[baseclass] | hit if baseclass in out else hit
+
+    clear = np.ones(code.shape, dtype=bool)
+    for m in out.values():
+        clear &= ~m
+    out[name] = clear
+    return out
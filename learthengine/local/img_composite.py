@@ -0,0 +1,90 @@
+# ====================================================================================================#
+#
+# Title: Local (NumPy) Pixel-Based Compositing
+#
+# ====================================================================================================#
+import numpy as np
+
+from learthengine.local import scoring
+from learthengine.local.cloud_distance import cloud_distance
+
+
+def _chunks(rows, chunk_size):
+    for r0 in range(0, rows, chunk_size):
+        yield r0, min(r0 + chunk_size, rows)
+
+
+def pbc_composite(stack, band_names, dates, target_year, target_doy, bands=None, mask=None, doy_vs_year=20,
+                  min_clouddistance=10, max_clouddistance=50, weight_doy=0.4, weight_year=0.4, weight_cloud=0.2,
+                  chunk_size=256, nodata=0):
+    """
+    Local counterpart of composite.img_composite(score='PBC') for a single target year and DOY. Reproduces the
+    DOY, YEAR and CLOUD scores of Griffiths et al. (2013) and the qualityMosaic('PBC') selection on a scene stack that
+    lives on the client, processing the stack in chunks of rows.
+
+    :param stack:               (Array-like) of shape (time, band, y, x) holding scaled values (i.e. after
+                                prepro.scale_img), e.g. a np.memmap. Masked observations may be NaN.
+    :param band_names:          (List) of bandnames along the band axis of the stack, e.g. ['B', 'G', 'R', ...].
+    :param dates:               (List) of datetime.date objects, one per scene.
+    :param target_year:         (Int) target year.
+    :param target_doy:          (Int) target DOY.
+    :param bands:               (List) of bandnames to composite. Default to band_names.
+    :param mask:                (Array-like) bool of shape (time, y, x), True where clear, or local.PackedMasks (only
+                                the rows of a chunk are unpacked). Default to finite 'R'.
+    :param doy_vs_year:         (Int) DOY at which an image with an one year offset from target_year has the same
+                                score as an image in the target_year with that DOY offset.
+    :param min_clouddistance:   (Int) Minimum required distance from clouds.
+    :param max_clouddistance:   (Int) Distance at which the maximum cloud score is allocated.
+    :param weight_doy:          (Float) Weight for the DOY score. Default to 0.4.
+    :param weight_year:         (Float) Weight for the YEAR score. Default to 0.4.
+    :param weight_cloud:        (Float) Weight for the CLOUD score. Default to 0.2.
+    :param chunk_size:          (Int) number of rows processed at once.
+    :param nodata:              (Int) value for pixels without any clear observation.
+    :return:                    (np.ndarray) int16 composite (x10000) of shape (band, y, x).
+    """
+    if bands is None:
+        bands = list(band_names)
+    band_idx = [band_names.index(b) for b in bands]
+    r_idx = band_names.index('R')
+
+    n_time, _, rows, cols = stack.shape
+
+    # scene based scores (client side in img_composite as well)
+    doys = scoring.scene_doys(dates)
+    years = scoring.scene_years(dates)
+    doy_std = np.std(doys)
+    doy_score = scoring.doyscore(doys, doy_std, target_doy)
+    offset = scoring.doyscore_offset(target_doy - doy_vs_year, target_doy, doy_std)
+    year_score = scoring.yearscore(years, target_year, offset)
+    doy_score = doy_score[:, np.newaxis, np.newaxis]
+    year_score = year_score[:, np.newaxis, np.newaxis]
+
+    out = np.empty((len(bands), rows, cols), dtype=np.int16)
+    halo = max_clouddistance
+
+    for r0, r1 in _chunks(rows, chunk_size):
+        h0, h1 = max(r0 - halo, 0), min(r1 + halo, rows)
+
+        if mask is None:
+            chunk_mask = np.isfinite(np.asarray(stack[:, r_idx, h0:h1]))
+        else:
+            chunk_mask = np.asarray(mask[:, h0:h1], dtype=bool)
+
+        cloud = np.empty((n_time, r1 - r0, cols), dtype=np.float32)
+        for t in range(n_time):
+            cloud[t] = cloud_distance(chunk_mask[t], max_clouddistance)[r0 - h0:r1 - h0]
+        chunk_mask = chunk_mask[:, r0 - h0:r1 - h0]
+
+        cloud_score = scoring.cloudscore(cloud, max_clouddistance, min_clouddistance)
+        pbc = scoring.score(doy_score, year_score, cloud_score, weight_doy, weight_year, weight_cloud)
+
+        values = np.asarray(stack[:, :, r0:r1])[:, band_idx]
+        values, valid, _ = scoring.quality_mosaic(values, pbc, chunk_mask)
+        out[:, r0:r1] = scoring.to_int16(values, valid, nodata=nodata)
+
+    return out
+
+
+# =====================================================================================================================#
+# END
+# =====================================================================================================================#
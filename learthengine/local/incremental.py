@@ -0,0 +1,125 @@
+import datetime
+import json
+
+import numpy as np
+
+from learthengine.local import scoring
+from learthengine.local.streaming import PBCAccumulator, absorb_scenes
+
+
+class CompositeState(PBCAccumulator):
+    """
+    Persistable PBC composite for one target year and DOY. Besides the running best score, scene index and int16
+    values it keeps the scoring parameters, the acquisition dates absorbed so far and per-year DOY sums
+    (count, sum, sum of squares) from which the DOY standard deviation of the whole window is derived.
+    doy_std is the standard deviation the stored scores were computed with.
+    """
+    def __init__(self, band_names, bands, rows, cols, target_year, target_doy, doy_std, doy_vs_year=20,
+                 min_clouddistance=10, max_clouddistance=50, weight_doy=0.4, weight_year=0.4, weight_cloud=0.2,
+                 nodata=0):
+        PBCAccumulator.__init__(self, len(bands), rows, cols, nodata=nodata)
+        self.band_names = list(band_names)
+        self.bands = list(bands)
+        self.target_year = target_year
+        self.target_doy = target_doy
+        self.doy_std = float(doy_std)
+        self.params = {'doy_vs_year': doy_vs_year, 'min_clouddistance': min_clouddistance,
+                       'max_clouddistance': max_clouddistance, 'weight_doy': weight_doy,
+                       'weight_year': weight_year, 'weight_cloud': weight_cloud}
+        self.dates = []
+        self.doy_stats = {}
+
+    def add_dates(self, dates):
+        for d in dates:
+            doy = d.timetuple().tm_yday - 1
+            stats = self.doy_stats.setdefault(d.year, [0, 0., 0.])
+            stats[0] += 1
+            stats[1] += doy
+            stats[2] += doy ** 2
+        self.dates.extend(dates)
+
+    def doy_std_with(self, dates=()):
+        """ DOY standard deviation (as np.std) of all absorbed scenes plus dates. """
+        n, s, ss = np.sum([v for v in self.doy_stats.values()], axis=0) if self.doy_stats else (0, 0., 0.)
+        doys = scoring.scene_doys(dates).astype(np.float64)
+        n, s, ss = n + doys.size, s + doys.sum(), ss + (doys ** 2).sum()
+        if n == 0:
+            return 0.
+        return float(np.sqrt(max(ss / n - (s / n) ** 2, 0.)))
+
+    def save(self, path):
+        meta = {'band_names': self.band_names, 'bands': self.bands, 'target_year': self.target_year,
+                'target_doy': self.target_doy, 'doy_std': self.doy_std, 'params': self.params,
+                'nodata': self.nodata, 'dates': [d.toordinal() for d in self.dates],
+                'doy_stats': {str(k): v for k, v in self.doy_stats.items()}}
+        np.savez_compressed(path, best=self.best, index=self.index, values=self.values, meta=json.dumps(meta))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as f:
+            meta = json.loads(str(f['meta']))
+            values = f['values']
+            state = cls(meta['band_names'], meta['bands'], values.shape[1], values.shape[2], meta['target_year'],
+                        meta['target_doy'], meta['doy_std'], nodata=meta['nodata'], **meta['params'])
+            state.best = f['best']
+            state.index = f['index']
+            state.values = values
+        state.dates = [datetime.date.fromordinal(d) for d in meta['dates']]
+        state.doy_stats = {int(k): v for k, v in meta['doy_stats'].items()}
+        return state
+
+
+def _absorb(state, scenes, dates):
+    band_idx = [state.band_names.index(b) for b in state.bands]
+    r_idx = state.band_names.index('R')
+    absorb_scenes(state, scenes, dates, state.doy_std, state.target_year, state.target_doy, band_idx, r_idx,
+                  start=len(state.dates), **state.params)
+    state.add_dates(dates)
+    return state
+
+
+def init_composite_state(scenes, dates, target_year, target_doy, band_names, rows, cols, bands=None, doy_vs_year=20,
+                         min_clouddistance=10, max_clouddistance=50, weight_doy=0.4, weight_year=0.4,
+                         weight_cloud=0.2, nodata=0):
+    """
+    Full (streaming) PBC composite of all scenes of a year/DOY window, returned as a CompositeState that can be saved
+    and later updated with update_composite_state. Parameters as in local.pbc_composite_stream.
+    """
+    if bands is None:
+        bands = list(band_names)
+    doy_std = np.std(scoring.scene_doys(dates))
+    state = CompositeState(band_names, bands, rows, cols, target_year, target_doy, doy_std,
+                           doy_vs_year=doy_vs_year, min_clouddistance=min_clouddistance,
+                           max_clouddistance=max_clouddistance, weight_doy=weight_doy, weight_year=weight_year,
+                           weight_cloud=weight_cloud, nodata=nodata)
+    return _absorb(state, scenes, dates)
+
+
+def update_composite_state(state, scenes, dates, tolerance=1.0, rebuild=None):
+    """
+    Absorb newly acquired scenes into an existing CompositeState.
+
+    New scenes are scored with the DOY standard deviation stored in the state, so the composite stays consistent
+    with the scores of the scenes absorbed earlier. Once the DOY standard deviation including the new dates drifts
+    more than tolerance days from the stored one, all scores are outdated and the window is recomputed from scratch.
+
+    :param state:       (CompositeState) e.g. from CompositeState.load(path).
+    :param scenes:      (Iterable) of (values, mask) tuples of the new scenes, see local.pbc_composite_stream.
+    :param dates:       (List) of datetime.date objects of the new scenes.
+    :param tolerance:   (Float) maximum allowed drift of the DOY standard deviation in days. Default to 1.
+    :param rebuild:     (Callable) without arguments returning (scenes, dates) of the whole window including the
+                        new scenes. Required if the drift exceeds tolerance.
+    :return:            (CompositeState) the updated state (a new object after a full recompute).
+    """
+    dates = list(dates)
+    drift = abs(state.doy_std_with(dates) - state.doy_std)
+    if drift <= tolerance:
+        return _absorb(state, scenes, dates)
+
+    if rebuild is None:
+        raise ValueError("DOY std drifted by {0:.2f} days (tolerance {1}), full recompute required but no rebuild "
+                         "function specified.".format(drift, tolerance))
+    all_scenes, all_dates = rebuild()
+    rows, cols = state.best.shape
+    return init_composite_state(all_scenes, list(all_dates), state.target_year, state.target_doy, state.band_names,
+                                rows, cols, bands=state.bands, nodata=state.nodata, **state.params)
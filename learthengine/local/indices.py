@@ -0,0 +1,99 @@
+import numpy as np
+
+from learthengine.coefficients import tc_coef, albedo_coef, linear_bands
+
+
+def linear_coefficients(components, sensor=None):
+    """ Local equivalent of prepro.linear_coefficients. Returns (matrix, offset) as np.ndarrays. """
+    matrix = [albedo_coef[sensor][:6] if c == 'ALBEDO' else tc_coef[c] for c in components]
+    offset = [albedo_coef[sensor][6] if c == 'ALBEDO' else 0 for c in components]
+    return np.array(matrix, dtype=np.float64), np.array(offset, dtype=np.float64)
+
+
+def linear_transform(bands, components=None, sensor=None, matrix=None, offset=None, band_names=None, out=None,
+                     chunk_size=512):
+    """
+    Local equivalent of prepro.linear_transform. All components are derived in one BLAS call (np.tensordot) per
+    chunk.
+
+    :param bands:       (Dict) of bandname -> array-like, all of the same shape.
+    :param components:  (List) of 'TCB', 'TCG', 'TCW', 'ALBEDO'. Ignored if matrix is given.
+    :param sensor:      (Str) One of L5, L7, L8. Required for 'ALBEDO'.
+    :param matrix:      (Array-like) of shape (components, len(band_names)).
+    :param offset:      (Array-like) of constants added to each component. Default to 0.
+    :param band_names:  (List) of input bandnames, i.e. columns of matrix. Default to B, G, R, NIR, SWIR1, SWIR2.
+    :param out:         (np.ndarray) preallocated float32 array of shape (components, ...). Allocated if None.
+    :return:            (np.ndarray) components stacked along the first axis.
+    """
+    if matrix is None:
+        matrix, offset = linear_coefficients(components, sensor)
+    matrix = np.asarray(matrix, dtype=np.float64)
+    offset = np.zeros(matrix.shape[0]) if offset is None else np.asarray(offset, dtype=np.float64)
+    if band_names is None:
+        band_names = linear_bands
+
+    shape = np.shape(bands[band_names[0]])
+    if out is None:
+        out = np.empty((matrix.shape[0],) + shape, dtype=np.float32)
+    expand = (slice(None),) + (np.newaxis,) * len(shape)
+
+    for r0 in range(0, shape[0], chunk_size):
+        r1 = min(r0 + chunk_size, shape[0])
+        x = np.stack([np.asarray(bands[b][r0:r1], dtype=np.float64) for b in band_names])
+        out[:, r0:r1] = np.tensordot(matrix, x, axes=1) + offset[expand]
+    return out
+
+
+def spectral_indices(bands, indices, out=None, sensor=None, gain=2.5, l=1, c1=6, c2=7.5, chunk_size=512):
+    """
+    Local equivalent of prepro.spectral_indices. Computes all requested indices in one pass over the reflectance
+    bands, sharing sums and differences between indices (e.g. NDBI = -NDWI1, EVI reuses the NDVI numerator).
+    Tasseled Cap components and albedo are derived with local.linear_transform.
+
+    :param bands:       (Dict) of bandname -> array-like of scaled reflectance, all of the same shape.
+    :param indices:     (List) of indices, one of 'NDVI', 'EVI', 'NDWI1', 'NDWI2', 'NDBI', 'TCG', 'TCB', 'TCW', 'ALBEDO'.
+    :param out:         (np.ndarray) preallocated float32 array of shape (len(indices), ...). Allocated if None.
+    :param sensor:      (Str) One of L5, L7, L8. Required for 'ALBEDO'.
+    :param chunk_size:  (Int) number of elements along the first axis processed at once.
+    :return:            (np.ndarray) indices stacked along the first axis in the order of indices.
+    """
+    shape = np.shape(next(iter(bands.values())))
+    if out is None:
+        out = np.empty((len(indices),) + shape, dtype=np.float32)
+    pos = {name: i for i, name in enumerate(indices)}
+
+    linear = [x for x in ['TCB', 'TCG', 'TCW', 'ALBEDO'] if x in pos]
+    if linear:
+        matrix, offset = linear_coefficients(linear, sensor)
+
+    for r0 in range(0, shape[0], chunk_size):
+        r1 = min(r0 + chunk_size, shape[0])
+        cache = {}
+
+        def band(name):
+            if name not in cache:
+                cache[name] = np.asarray(bands[name][r0:r1], dtype=np.float64)
+            return cache[name]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if 'NDVI' in pos or 'EVI' in pos:
+                diff_nir_r = band('NIR') - band('R')
+                if 'NDVI' in pos:
+                    out[pos['NDVI'], r0:r1] = diff_nir_r / (band('NIR') + band('R'))
+                if 'EVI' in pos:
+                    out[pos['EVI'], r0:r1] = gain * diff_nir_r / (band('NIR') + c1 * band('R') - c2 * band('B') + l)
+            if 'NDWI1' in pos or 'NDBI' in pos:
+                ndwi1 = (band('NIR') - band('SWIR1')) / (band('NIR') + band('SWIR1'))
+                if 'NDWI1' in pos:
+                    out[pos['NDWI1'], r0:r1] = ndwi1
+                if 'NDBI' in pos:
+                    out[pos['NDBI'], r0:r1] = -ndwi1
+            if 'NDWI2' in pos:
+                out[pos['NDWI2'], r0:r1] = (band('G') - band('NIR')) / (band('G') + band('NIR'))
+
+        if linear:
+            chunk = {b: band(b) for b in linear_bands}
+            out[[pos[x] for x in linear], r0:r1] = linear_transform(chunk, matrix=matrix, offset=offset,
+                                                                   chunk_size=r1 - r0)
+
+    return out
@@ -0,0 +1,104 @@
+import numpy as np
+
+from learthengine.local.scoring import to_int16
+
+
+# Jiménez‐Muñoz et al. (2009) (TM & ETM+) TIGR1761 and Jiménez‐Muñoz et al. (2014) OLI-TIRS GAPRI4838,
+# identical to lst.atmospheric_functions
+cs_sensor = {
+    'L5': [0.07518, -0.00492, 1.03189,
+           -0.59600, -1.22554, 0.08104,
+           -0.02767, 1.43740, -0.25844],
+    'L7': [0.06518, 0.00683, 1.02717,
+           -0.53003, -1.25866, 0.10490,
+           -0.01965, 1.36947, -0.24310],
+    'L8': [0.04019, 0.02916, 1.01523,
+           -0.38333, -1.50294, 0.20324,
+           0.00918, 1.36072, -0.27514]
+}
+
+# gamma/delta coefficients as in lst.apply_lst_prepro
+coef_sensor = {'L5': 1256, 'L7': 1277, 'L8': 1324}
+
+
+def land_surface_temperature(tir, radiance, red, nir, green, wv, mask=None, sensor='L5', out=None, cs=None,
+                             coef=None, wv_scale=0.1, ndvi_soil=0.15, ndvi_vegetation=0.9, epsilon_soil=0.97,
+                             epsilon_vegetation=0.985, epsilon_water=0.99, scale=0.01, threshold=None, factor=10000,
+                             nodata=0, chunk_size=512):
+    """
+    Fused local evaluation of the single-channel LST chain of img_composite, i.e. lst.scale_wv,
+    lst.atmospheric_functions, lst.gamma/delta, prepro.ndvi/ndwi2/fvc, lst.emissivity,
+    lst.land_surface_temperature and lst.mask_lst, for one scene. The chain is evaluated chunk-wise in a single pass
+    without materialising AF1/AF2/AF3/GAMMA/DELTA/EPSILON and written straight into an int16 raster.
+
+    :param tir:                 (Array-like) brightness temperature in K (TIR after prepro.scale_img) of shape (y, x).
+    :param radiance:            (Array-like) at-sensor radiance L of shape (y, x).
+    :param red, nir, green:     (Array-like) scaled surface reflectance of shape (y, x).
+    :param wv:                  (Float or array-like) water vapor as provided by NCEP (scaled by wv_scale).
+    :param mask:                (Array-like) bool of shape (y, x), True where clear. Default to all clear.
+    :param sensor:              (Str) One of L5, L7, L8. Selects cs and coef if not given.
+    :param out:                 (np.ndarray) preallocated int16 output of shape (y, x). Allocated if None.
+    :param scale:               (Float) as in lst.land_surface_temperature. Default to 0.01.
+    :param threshold:           (Float) as in lst.mask_lst, LST (°C) below which pixels are masked. Default to None.
+    :param factor:              (Int) multiplier applied before the int16 cast, as in img_composite. Default to 10000.
+    :param nodata:              (Int) value of masked pixels.
+    :param chunk_size:          (Int) number of rows processed at once.
+    :return:                    (np.ndarray) int16 LST (°C x scale x factor).
+    """
+    if cs is None:
+        cs = cs_sensor[sensor]
+    if coef is None:
+        coef = coef_sensor[sensor]
+
+    rows, cols = tir.shape
+    if out is None:
+        out = np.empty((rows, cols), dtype=np.int16)
+    scalar_wv = np.ndim(wv) == 0
+
+    for r0 in range(0, rows, chunk_size):
+        r1 = min(r0 + chunk_size, rows)
+
+        w = wv * wv_scale if scalar_wv else np.asarray(wv[r0:r1], dtype=np.float64) * wv_scale
+        af1 = cs[0] * w ** 2 + cs[1] * w + cs[2]
+        af2 = cs[3] * w ** 2 + cs[4] * w + cs[5]
+        af3 = cs[6] * w ** 2 + cs[7] * w + cs[8]
+
+        l = np.asarray(radiance[r0:r1], dtype=np.float64)
+        nir_c = np.asarray(nir[r0:r1], dtype=np.float64)
+
+        # emissivity from FVC, water from NDWI2
+        red_c = np.asarray(red[r0:r1], dtype=np.float64)
+        eps = np.subtract(nir_c, red_c)
+        eps /= nir_c + red_c
+        eps -= ndvi_soil
+        eps /= ndvi_vegetation - ndvi_soil
+        np.square(eps, out=eps)
+        np.minimum(eps, 1, out=eps)
+        eps *= epsilon_vegetation - epsilon_soil
+        eps += epsilon_soil
+        green_c = np.asarray(green[r0:r1], dtype=np.float64)
+        water = (green_c - nir_c) / (green_c + nir_c) > 0.1
+        eps[water] = epsilon_water
+
+        # LST = GAMMA*((AF1*L+AF2)/EPSILON+AF3)+DELTA-273.15
+        bt = np.asarray(tir[r0:r1], dtype=np.float64)
+        bt2c = np.square(bt) / coef
+        lst = np.multiply(af1, l)
+        lst += af2
+        lst /= eps
+        lst += af3
+        lst *= bt2c
+        lst /= l
+        lst += bt
+        lst -= bt2c
+        lst -= 273.15
+        lst *= scale
+
+        valid = np.isfinite(lst)
+        if mask is not None:
+            valid &= np.asarray(mask[r0:r1], dtype=bool)
+        if threshold is not None:
+            valid &= lst > threshold * scale
+        out[r0:r1] = to_int16(lst, valid, factor=factor, nodata=nodata)
+
+    return out
@@ -0,0 +1,112 @@
+import numpy as np
+
+
+# pixel_qa bits as in prepro.mask_landsat_sr, bit 0 (fill) is always masked
+dict_mask = {'cloud': 1 << 5,
+             'cshadow': 1 << 3,
+             'snow': 1 << 4}
+
+# SCL classes masked by prepro.mask_s2_scl: cloud shadow, unclassified, cloud medium/high probability, cirrus, snow
+scl_masked = [3, 7, 8, 9, 10, 11]
+scl_lut = np.ones(256, dtype=bool)
+scl_lut[scl_masked] = False
+
+
+def _bits(masks):
+    bits = 1
+    for m in masks:
+        bits |= dict_mask[m]
+    return bits
+
+
+def mask_landsat_sr(qa, masks, tir=None, T_threshold=None, omission=True):
+    """
+    Local equivalent of prepro.mask_landsat_sr on uint16 pixel_qa arrays of any shape.
+
+    :param qa:          (np.ndarray) pixel_qa.
+    :param masks:       (List) of objects to mask. Any of 'cloud', 'cshadow', 'snow'.
+    :param tir:         (np.ndarray) unscaled TIR (K x 10) of the same shape as qa. Required with T_threshold.
+    :param T_threshold: (Float) brightness temperature in °C. If omission, clouds warmer than T_threshold are kept,
+                        otherwise (commission) all pixels colder than T_threshold are masked in addition.
+    :return:            (np.ndarray) bool mask, True where clear.
+    """
+    qa = np.asarray(qa)
+    if T_threshold is None:
+        return (qa & _bits(masks)) == 0
+
+    temp_th = (T_threshold + 273.15) * 10
+    if omission:
+        mask = (qa & _bits([m for m in masks if m != 'cloud'])) == 0
+        cold_cloud = ((qa & dict_mask['cloud']) != 0) & (tir < temp_th)
+        mask &= ~cold_cloud
+    else:
+        mask = (qa & _bits(masks)) == 0
+        mask &= tir > temp_th
+    return mask
+
+
+def mask_s2(qa60):
+    """ Local equivalent of prepro.mask_s2. Masks opaque clouds (bit 10) and cirrus (bit 11). """
+    return (np.asarray(qa60) & ((1 << 10) | (1 << 11))) == 0
+
+
+def mask_s2_scl(scl):
+    """ Local equivalent of prepro.mask_s2_scl as a single 256-entry lookup. """
+    return scl_lut[np.asarray(scl, dtype=np.uint8)]
+
+
+def pack_mask(mask):
+    """ Bit-packs a bool mask along the last axis (8 pixels per byte). Returns (packed, n) for unpack_mask. """
+    mask = np.asarray(mask, dtype=bool)
+    return np.packbits(mask, axis=-1), mask.shape[-1]
+
+
+def unpack_mask(packed, n):
+    return np.unpackbits(packed, axis=-1, count=n).astype(bool)
+
+
+class PackedMasks(object):
+    """
+    Mask stack of shape (time, y, x) stored bit-packed along x (8 pixels per byte), i.e. with 1/8 of the memory of a
+    bool stack. Indexing over time and y (e.g. masks[:, r0:r1], as local.pbc_composite reads its chunks) unpacks only
+    the selection. Build it scene by scene, so the bool stack never exists as a whole, e.g.:
+
+    masks = PackedMasks.from_masks(mask_landsat_sr(qa, ['cloud', 'cshadow']) for qa in qa_stack)
+    """
+    def __init__(self, packed, cols):
+        self.packed = packed
+        self.cols = cols
+
+    @classmethod
+    def from_masks(cls, masks):
+        """ PackedMasks of an iterable of bool scene masks of shape (y, x), True where clear. """
+        packed = []
+        cols = None
+        for mask in masks:
+            p, cols = pack_mask(mask)
+            packed.append(p)
+        if not packed:
+            raise ValueError("No masks to pack.")
+        return cls(np.stack(packed), cols)
+
+    @property
+    def shape(self):
+        return self.packed.shape[:-1] + (self.cols,)
+
+    @property
+    def nbytes(self):
+        return self.packed.nbytes
+
+    def __len__(self):
+        return self.packed.shape[0]
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) > 2:
+            return unpack_mask(self.packed[key[:2]], self.cols)[(Ellipsis,) + key[2:]]
+        return unpack_mask(self.packed[key], self.cols)
+
+    def __array__(self, dtype=None, copy=None):
+        mask = unpack_mask(self.packed, self.cols)
+        return mask if dtype is None else mask.astype(dtype)
@@ -0,0 +1,80 @@
+import numpy as np
+
+
+def scene_doys(dates):
+    """ Zero-based day of year per scene, i.e. ee.Date.getRelative('day', 'year') """
+    return np.array([d.timetuple().tm_yday - 1 for d in dates], dtype=np.int16)
+
+
+def scene_years(dates):
+    return np.array([d.year for d in dates], dtype=np.int16)
+
+
+def doyscore(doy, doy_std, target_doy):
+    """
+    Local equivalent of composite.doyscore. Returns the DOY score (x10000) for every scene.
+
+    :param doy:         (np.ndarray) of scene DOYs (time,).
+    :param doy_std:     (Float) standard deviation of all scene DOYs.
+    :param target_doy:  (Int) target DOY.
+    """
+    doy = np.asarray(doy, dtype=np.float64)
+    return np.exp(-0.5 * ((doy - target_doy) / doy_std) ** 2) * 10000
+
+
+def doyscore_offset(DOY, TARGET_DOY, DOY_STD):
+    return np.exp(-0.5 * pow((DOY - TARGET_DOY) / DOY_STD, 2))
+
+
+def yearscore(year, target_year, doyscore_offset_value):
+    """
+    Local equivalent of composite.yearscore. Scenes of the target year score 10000, all others the (truncated)
+    DOY score at the DOY vs. year offset.
+    """
+    year = np.asarray(year)
+    offset = np.trunc(doyscore_offset_value * 10000)
+    return np.where(year == target_year, 10000., offset)
+
+
+def cloudscore(cloud_distance, req_distance, min_distance):
+    """
+    Local equivalent of composite.cloudscore. Sigmoid of the distance to the next cloud (x10000).
+
+    :param cloud_distance:  (np.ndarray) CLOUD_DISTANCE in pixels as returned by local.cloud_distance.
+    :param req_distance:    (Int) distance at which the maximum cloud score is allocated.
+    :param min_distance:    (Int) minimum required distance from clouds.
+    """
+    c = (req_distance - min_distance) / 2.
+    b = np.minimum(cloud_distance, req_distance)
+    return 10000. / (1. + np.exp((b - c) * -0.2))
+
+
+def score(doy_score, year_score, cloud_score, w_doyscore, w_yearscore, w_cloudscore):
+    """ Local equivalent of composite.score (PBC). Inputs must be broadcastable against each other. """
+    return (doy_score * w_doyscore + year_score * w_yearscore + cloud_score * w_cloudscore) / 10000
+
+
+def quality_mosaic(stack, quality, mask):
+    """
+    Local equivalent of ee.ImageCollection.qualityMosaic. Selects per pixel the values of the valid scene with the
+    highest quality. Ties resolve to the first scene.
+
+    :param stack:   (np.ndarray) of shape (time, band, y, x).
+    :param quality: (np.ndarray) of shape (time, y, x).
+    :param mask:    (np.ndarray) bool of shape (time, y, x), True where valid.
+    :return:        (values (band, y, x), valid (y, x), index (y, x))
+    """
+    quality = np.where(mask, quality, -np.inf)
+    index = np.argmax(quality, axis=0)
+    valid = np.take_along_axis(mask, index[np.newaxis], axis=0)[0]
+    values = np.take_along_axis(stack, index[np.newaxis, np.newaxis], axis=0)[0]
+    return values, valid, index
+
+
+def to_int16(values, valid=None, factor=10000, nodata=0):
+    """ Mirrors img.multiply(factor).int16(): truncates towards zero and saturates at the int16 range. """
+    out = np.clip(np.trunc(np.nan_to_num(np.asarray(values, dtype=np.float64) * factor)), -32768, 32767)
+    out = out.astype(np.int16)
+    if valid is not None:
+        out[..., ~valid] = nodata
+    return out
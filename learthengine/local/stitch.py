@@ -0,0 +1,48 @@
+import glob
+import os
+
+
+def shard_files(directory, out_file):
+    """
+    Local files of the shards of out_file (see generals.shard_grid), including files Drive splits large shards into,
+    e.g. out_file_r00c01.tif or out_file_r00c01-0000000000-0000000000.tif.
+
+    :param directory:   (Str) download directory of the exports.
+    :param out_file:    (Str) name of the unsharded export.
+    :return:            (List) of sorted file paths.
+    """
+    return sorted(glob.glob(os.path.join(directory, out_file + '_r[0-9]*c[0-9]*.tif')))
+
+
+def stitch_shards(files, out_file, cog=True, creation_options=None):
+    """
+    Stitches exported shards into one VRT (out_file + '.vrt') and, if cog, a Cloud Optimized GeoTIFF
+    (out_file + '.tif'). Shards from shard_grid share one pixel grid, so they are mosaicked without resampling.
+    Requires GDAL (>= 3.1 for cog).
+
+    :param files:               (List) of shard files, e.g. from shard_files.
+    :param out_file:            (Str) output path without extension.
+    :param cog:                 (Bool) Write a COG in addition to the VRT. Default to True.
+    :param creation_options:    (List) of COG creation options. Default to ['COMPRESS=DEFLATE', 'PREDICTOR=2',
+                                'BIGTIFF=IF_SAFER'].
+    :return:                    (Str) path of the COG or, if cog is False, the VRT.
+    """
+    from osgeo import gdal
+    gdal.UseExceptions()
+
+    if not files:
+        raise ValueError("No shard files to stitch.")
+    if creation_options is None:
+        creation_options = ['COMPRESS=DEFLATE', 'PREDICTOR=2', 'BIGTIFF=IF_SAFER']
+
+    vrt_file = out_file + '.vrt'
+    vrt = gdal.BuildVRT(vrt_file, list(files))
+    vrt.FlushCache()
+    if not cog:
+        vrt = None
+        return vrt_file
+
+    cog_file = out_file + '.tif'
+    gdal.Translate(cog_file, vrt, format='COG', creationOptions=creation_options)
+    vrt = None
+    return cog_file
@@ -0,0 +1,131 @@
+import warnings
+
+import numpy as np
+
+
+class STMAccumulator(object):
+    """
+    Single pass spectral-temporal metrics over the time axis. Scenes (or blocks of scenes) are added one after the
+    other; count, mean, variance (Welford/Chan), min and max are kept as running rasters. Percentiles and the median
+    need all observations of a pixel and are derived with local.stm_chunked instead.
+    """
+    def __init__(self, shape):
+        self.count = np.zeros(shape, dtype=np.int32)
+        self.mean = np.zeros(shape, dtype=np.float64)
+        self.m2 = np.zeros(shape, dtype=np.float64)
+        self.min = np.full(shape, np.inf, dtype=np.float64)
+        self.max = np.full(shape, -np.inf, dtype=np.float64)
+
+    def add(self, values):
+        """ Add scenes of shape (time, ...) or a single scene of shape (...). NaN marks masked observations. """
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == self.count.ndim:
+            values = values[np.newaxis]
+        valid = np.isfinite(values)
+        n = valid.sum(axis=0)
+        if not n.any():
+            return self
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            block_mean = np.where(n > 0, np.where(valid, values, 0).sum(axis=0) / n, 0)
+            block_m2 = np.where(valid, (values - block_mean) ** 2, 0).sum(axis=0)
+            total = self.count + n
+            delta = block_mean - self.mean
+            self.mean = np.where(total > 0, self.mean + delta * n / total, 0)
+            self.m2 = np.where(total > 0, self.m2 + block_m2 + delta ** 2 * self.count * n / total, 0)
+        self.count = total
+        np.fmin(self.min, np.where(valid, values, np.inf).min(axis=0), out=self.min)
+        np.fmax(self.max, np.where(valid, values, -np.inf).max(axis=0), out=self.max)
+        return self
+
+    def merge(self, other):
+        """ Combine with an accumulator over other scenes of the same pixels. """
+        total = self.count + other.count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = other.mean - self.mean
+            self.mean = np.where(total > 0, self.mean + delta * other.count / total, 0)
+            self.m2 = np.where(total > 0, self.m2 + other.m2 + delta ** 2 * self.count * other.count / total, 0)
+        self.count = total
+        np.fmin(self.min, other.min, out=self.min)
+        np.fmax(self.max, other.max, out=self.max)
+        return self
+
+    def result(self, metric, ddof=0):
+        """
+        One of 'mean', 'std', 'variance', 'min', 'max', 'nobs'. With ddof=0 'std' and 'variance' are population
+        statistics as ee.Reducer.stdDev/variance, with ddof=1 sample statistics as ee.Reducer.sampleStdDev/
+        sampleVariance.
+        """
+        empty = self.count == 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if metric == 'mean':
+                out = self.mean.copy()
+            elif metric == 'variance':
+                out = self.m2 / (self.count - ddof)
+            elif metric == 'std':
+                out = np.sqrt(self.m2 / (self.count - ddof))
+            elif metric == 'min':
+                out = self.min.copy()
+            elif metric == 'max':
+                out = self.max.copy()
+            elif metric == 'nobs':
+                return self.count.copy()
+            else:
+                raise ValueError("Invalid metric specified: " + str(metric))
+        out[empty] = np.nan
+        return out
+
+
+def stm_chunked(stack, metrics, percentiles=None, chunk_size=64, time_chunk=None, ddof=0):
+    """
+    Spectral-temporal metrics of a (time, y, x) stack, e.g. one band of a np.memmap, computed for all metrics in one
+    pass over the time axis per spatial chunk of rows. Moments are accumulated with STMAccumulator. 'median' and
+    'percentile' need all observations of a pixel, hence all scenes of a chunk are read at once and partitioned with
+    np.nanpercentile; without them, scenes are read in blocks of time_chunk.
+
+    :param stack:       (Array-like) of shape (time, y, x). NaN marks masked observations.
+    :param metrics:     (List) of 'mean', 'median', 'min', 'max', 'std', 'variance', 'percentile', 'nobs'.
+    :param percentiles: (List) of percentiles if 'percentile' in metrics.
+    :param chunk_size:  (Int) number of rows per spatial chunk.
+    :param time_chunk:  (Int) number of scenes read at once if no percentiles are requested. Default to all.
+    :param ddof:        (Int) delta degrees of freedom of 'std' and 'variance'. Default to 0 (population, as
+                        ee.Reducer.stdDev).
+    :return:            (Dict) of metric name (e.g. 'mean', 'p90') -> float32 array of shape (y, x).
+    """
+    n_time, rows, cols = stack.shape
+    moments = [m for m in metrics if m not in ('median', 'percentile')]
+    q = []
+    q_names = []
+    if 'median' in metrics:
+        q.append(50)
+        q_names.append('median')
+    if 'percentile' in metrics:
+        if not percentiles:
+            raise ValueError("Metric 'percentile' requires percentiles, e.g. [10, 90].")
+        q.extend(percentiles)
+        q_names.extend(['p' + str(p) for p in percentiles])
+    if time_chunk is None or q:
+        time_chunk = n_time
+
+    out = {name: np.empty((rows, cols), dtype=np.float32) for name in moments + q_names}
+
+    for r0 in range(0, rows, chunk_size):
+        r1 = min(r0 + chunk_size, rows)
+        acc = STMAccumulator((r1 - r0, cols))
+
+        for t0 in range(0, n_time, time_chunk):
+            block = np.asarray(stack[t0:t0 + time_chunk, r0:r1], dtype=np.float64)
+            if moments:
+                acc.add(block)
+
+        for m in moments:
+            out[m][r0:r1] = acc.result(m, ddof)
+
+        if q:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                values = np.nanpercentile(block, q, axis=0)
+            for name, v in zip(q_names, values):
+                out[name][r0:r1] = v
+
+    return out
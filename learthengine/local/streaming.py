@@ -0,0 +1,95 @@
+import numpy as np
+
+from learthengine.local import scoring
+from learthengine.local.cloud_distance import cloud_distance
+
+
+class PBCAccumulator(object):
+    """
+    Running qualityMosaic('PBC'). Keeps only the best score, the chosen scene index and the selected int16 values of
+    every pixel, i.e. memory is O(bands x pixels) regardless of the number of scenes.
+    """
+    def __init__(self, n_bands, rows, cols, nodata=0):
+        self.nodata = nodata
+        self.best = np.full((rows, cols), -np.inf, dtype=np.float64)
+        self.index = np.full((rows, cols), -1, dtype=np.int32)
+        self.values = np.full((n_bands, rows, cols), nodata, dtype=np.int16)
+
+    def update(self, values, mask, pbc, index):
+        """
+        Absorb one scene in place.
+
+        :param values:  (np.ndarray) scaled band values of shape (band, y, x).
+        :param mask:    (np.ndarray) bool of shape (y, x), True where clear.
+        :param pbc:     (np.ndarray) PBC score of shape (y, x).
+        :param index:   (Int) scene index stored for the selected pixels.
+        """
+        better = mask & (pbc > self.best)
+        self.best[better] = pbc[better]
+        self.index[better] = index
+        self.values[:, better] = scoring.to_int16(values[:, better])
+        return better
+
+    @property
+    def composite(self):
+        return self.values
+
+
+def absorb_scenes(acc, scenes, dates, doy_std, target_year, target_doy, band_idx, r_idx, doy_vs_year=20,
+                  min_clouddistance=10, max_clouddistance=50, weight_doy=0.4, weight_year=0.4, weight_cloud=0.2,
+                  start=0, nodata=0):
+    """
+    Score scenes with a fixed DOY standard deviation and fold them into acc. Scene indices are counted from start.
+    If acc is None, an accumulator is created from the first scene. Returns the accumulator.
+    """
+    doys = scoring.scene_doys(dates)
+    years = scoring.scene_years(dates)
+    doy_score = scoring.doyscore(doys, doy_std, target_doy)
+    offset = scoring.doyscore_offset(target_doy - doy_vs_year, target_doy, doy_std)
+    year_score = scoring.yearscore(years, target_year, offset)
+
+    for t, (values, mask) in enumerate(scenes):
+        values = np.asarray(values)
+        if mask is None:
+            mask = np.isfinite(values[r_idx])
+        mask = np.asarray(mask, dtype=bool)
+        if acc is None:
+            acc = PBCAccumulator(len(band_idx), mask.shape[0], mask.shape[1], nodata=nodata)
+
+        cloud_score = scoring.cloudscore(cloud_distance(mask, max_clouddistance), max_clouddistance,
+                                         min_clouddistance)
+        pbc = scoring.score(doy_score[t], year_score[t], cloud_score, weight_doy, weight_year, weight_cloud)
+        acc.update(values[band_idx], mask, pbc, start + t)
+
+    return acc
+
+
+def pbc_composite_stream(scenes, dates, target_year, target_doy, band_names, bands=None, doy_vs_year=20,
+                         min_clouddistance=10, max_clouddistance=50, weight_doy=0.4, weight_year=0.4,
+                         weight_cloud=0.2, nodata=0):
+    """
+    Scene-by-scene variant of local.pbc_composite. Scenes are read one at a time and folded into a PBCAccumulator,
+    so stacks of several years and sensors (e.g. sensor='SL' with surr_years) never have to fit into memory.
+    The DOY standard deviation only depends on the acquisition dates and is derived from dates upfront.
+
+    :param scenes:              (Iterable) yielding one (values, mask) tuple per scene in the order of dates. values is
+                                an array of shape (band, y, x) holding scaled values, mask a bool array of shape (y, x)
+                                (None derives the mask from finite 'R').
+    :param dates:               (List) of datetime.date objects, one per scene.
+    :param target_year:         (Int) target year.
+    :param target_doy:          (Int) target DOY.
+    :param band_names:          (List) of bandnames along the band axis of each scene.
+    :param bands:               (List) of bandnames to composite. Default to band_names.
+    :return:                    (PBCAccumulator) holding the int16 composite (x10000), best score and scene index.
+    """
+    if bands is None:
+        bands = list(band_names)
+    band_idx = [band_names.index(b) for b in bands]
+    r_idx = band_names.index('R')
+
+    doy_std = np.std(scoring.scene_doys(dates))
+
+    return absorb_scenes(None, scenes, dates, doy_std, target_year, target_doy, band_idx, r_idx,
+                         doy_vs_year=doy_vs_year, min_clouddistance=min_clouddistance,
+                         max_clouddistance=max_clouddistance, weight_doy=weight_doy, weight_year=weight_year,
+                         weight_cloud=weight_cloud, nodata=nodata)
@@ -0,0 +1,150 @@
+import warnings
+
+import numpy as np
+
+from learthengine.local.scoring import to_int16
+
+
+def _pairs(n_time, max_pairs=None, seed=0):
+    """ Indices (i, j), i < j, of all scene pairs or a random sample of max_pairs of them. """
+    i, j = np.triu_indices(n_time, k=1)
+    if max_pairs is not None and i.size > max_pairs:
+        sel = np.sort(np.random.default_rng(seed).choice(i.size, max_pairs, replace=False))
+        i, j = i[sel], j[sel]
+    return i, j
+
+
+def _erfc(x):
+    """ Complementary error function, Abramowitz & Stegun 7.1.26 (|error| < 1.5e-7), for x >= 0. """
+    t = 1. / (1. + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return poly * np.exp(-x ** 2)
+
+
+def _tie_terms(values, time):
+    """
+    Tie terms of the Mann-Kendall variance over the valid observations of values (time, band, pixel), once for ties in
+    time (e.g. scenes of the same day) and once for ties in value. Each term is an array (3, band, pixel) of
+    sum t(t-1)/2 (tied pairs), sum t(t-1)(t-2) and sum t(t-1)(2t+5) over the tie groups of size t.
+    """
+    valid = np.isfinite(values)
+    terms = np.zeros((2, 3) + values.shape[1:], dtype=np.float64)
+    for k in range(values.shape[0]):
+        # size t of the groups of observation k, each group is visited t times
+        for tie, same in enumerate([valid & (time == time[k])[:, np.newaxis, np.newaxis], values == values[k]]):
+            t = np.where(valid[k], same.sum(axis=0), 1).astype(np.float64)
+            terms[tie, 0] += (t - 1) / 2.
+            terms[tie, 1] += (t - 1) * (t - 2)
+            terms[tie, 2] += (t - 1) * (2 * t + 5)
+    return terms[0], terms[1]
+
+
+def trend_statistics(stack, time, statistics=('slope', 'offset', 'tau', 'p_value'), chunk_pixels=None,
+                     memory=2 ** 28, max_pairs=None, seed=0):
+    """
+    Sen's slope and Mann-Kendall test of every band of a stack against time in one batched pass over the pairwise
+    differences. Local equivalent of ee.Reducer.sensSlope() combined with ee.Reducer.kendallsCorrelation(2) on
+    ['TIME', band]. Pixels are processed in chunks so that the pairwise differences of one chunk and their temporaries
+    (slopes, sign and validity arrays, the copy of np.nanmedian) stay within memory.
+
+    slope:      median of all pairwise slopes (v_j - v_i) / (t_j - t_i) of valid observations.
+    offset:     median of v - slope * t (intercept at time 0).
+    tau:        Kendall's tau-b (ties in time and in the values accounted for).
+    p_value:    two-sided p-value of the Mann-Kendall S statistic (normal approximation), with the variance of S
+                corrected for ties in time and in the values as scipy.stats.kendalltau.
+
+    :param stack:           (Array-like) of shape (time, band, y, x) or (time, y, x). NaN marks masked observations.
+    :param time:            (Array-like) of scene times, e.g. days since 1970-01-01 as in generals.add_timeband.
+    :param statistics:      (List) of statistics to return.
+    :param chunk_pixels:    (Int) number of pixels per chunk, chunks run over the flattened y, x axes (not full rows).
+                            Default derived from memory.
+    :param memory:          (Int) approximate memory budget in bytes for the pairwise arrays of one chunk.
+    :param max_pairs:       (Int) if given and the stack has more pairs, all statistics are approximated from a
+                            random sample of max_pairs scene pairs (identical for all pixels).
+    :param seed:            (Int) seed of the pair sample.
+    :return:                (Dict) of statistic -> float64 array of shape (band, y, x) (or (y, x)).
+    """
+    single = np.ndim(stack) == 3
+    n_time = stack.shape[0]
+    spatial = stack.shape[-2:]
+    n_bands = 1 if single else stack.shape[1]
+    n_pix = spatial[0] * spatial[1]
+    mk = 'tau' in statistics or 'p_value' in statistics
+
+    time = np.asarray(time, dtype=np.float64)
+    i, j = _pairs(n_time, max_pairs, seed)
+    dt = time[j] - time[i]
+    keep = dt != 0
+    i, j, dt = i[keep], j[keep], dt[keep]
+    sign_dt = np.sign(dt)[:, np.newaxis, np.newaxis]
+
+    if chunk_pixels is None:
+        # bytes per pair and pixel band: differences, slopes and the np.nanmedian copy (float64), plus the sign,
+        # product and masked sum (float64) and validity and tie masks (bool) of the Mann-Kendall statistics
+        pair_bytes = 3 * 8 + (3 * 8 + 2 if mk else 0)
+        chunk_pixels = max(int(memory // (max(i.size, 1) * n_bands * pair_bytes)), 1)
+
+    cols = spatial[1]
+    out = {s: np.empty((n_bands, n_pix), dtype=np.float64) for s in statistics}
+    for p0 in range(0, n_pix, chunk_pixels):
+        p1 = min(p0 + chunk_pixels, n_pix)
+        # rows covering the chunk's pixels, cut to the chunk after flattening
+        r0, r1 = p0 // cols, -(-p1 // cols)
+        values = np.asarray(stack[..., r0:r1, :], dtype=np.float64).reshape(n_time, n_bands, -1)
+        values = values[..., p0 - r0 * cols:p1 - r0 * cols]
+        diff = values[j] - values[i]
+
+        with warnings.catch_warnings(), np.errstate(divide='ignore', invalid='ignore'):
+            warnings.simplefilter('ignore', RuntimeWarning)
+            slope = np.nanmedian(diff / dt[:, np.newaxis, np.newaxis], axis=0)
+            if 'slope' in out:
+                out['slope'][:, p0:p1] = slope
+            if 'offset' in out:
+                out['offset'][:, p0:p1] = np.nanmedian(values - slope * time[:, np.newaxis, np.newaxis], axis=0)
+
+            if mk:
+                valid = np.isfinite(diff)
+                n_pairs = valid.sum(axis=0)
+                s = np.where(valid, np.sign(diff) * sign_dt, 0).sum(axis=0)
+
+                # tie groups of the valid observations in time (same-day scenes) and in value
+                n = np.isfinite(values).sum(axis=0)
+                time_ties, value_ties = _tie_terms(values, time)
+                total = n * (n - 1) / 2.
+                untied_time = total - time_ties[0]
+                # S of sampled pairs scaled to all pairs of valid observations at different times
+                s = s * untied_time / n_pairs
+                if 'tau' in out:
+                    out['tau'][:, p0:p1] = s / np.sqrt(untied_time * (total - value_ties[0]))
+                if 'p_value' in out:
+                    m = n * (n - 1.)
+                    var = (m * (2 * n + 5) - time_ties[2] - value_ties[2]) / 18. + \
+                        2 * time_ties[0] * value_ties[0] / m + \
+                        np.where(n > 2, time_ties[1] * value_ties[1] / (9 * m * (n - 2)), 0)
+                    p = _erfc(np.abs(s) / np.sqrt(var) / np.sqrt(2))
+                    p[n_pairs == 0] = np.nan
+                    out['p_value'][:, p0:p1] = p
+
+    for s in statistics:
+        out[s] = out[s].reshape((n_bands,) + spatial)
+        if single:
+            out[s] = out[s][0]
+    return out
+
+
+def sens_slope(stack, time, chunk_pixels=None, memory=2 ** 28, max_pairs=None, seed=0):
+    """
+    Local equivalent of ee.Reducer.sensSlope() applied to ['TIME', band] for every band of a stack, see
+    trend_statistics. Returns float64 slopes per time unit of shape (band, y, x) (or (y, x)).
+    """
+    return trend_statistics(stack, time, statistics=('slope',), chunk_pixels=chunk_pixels, memory=memory,
+                            max_pairs=max_pairs, seed=seed)['slope']
+
+
+def ts_slope(stack, time, **kwargs):
+    """
+    Mirrors img_composite(score='TS_slope'): yearly Sen's slope x10000 as int16 for all bands of a (time, band, y, x)
+    stack in one pass. time in days. Pixels without any valid pair are 0. Keywords are passed to sens_slope.
+    """
+    slope = sens_slope(stack, time, **kwargs) * 365.25
+    return to_int16(slope, np.isfinite(slope))
@@ -2,6 +2,7 @@ import ee
 from .atmospheric_functions import atmospheric_functions, radiance_addband, scale_wv, radcal, era5_tcwv
 from .collection_matching import maxDiffFilter, join_wv, join_l
 from .land_surface_temperatue import delta, gamma
+from learthengine.generals.prefetch import Prefetch, collection_times
 
 
 def apply_lst_prepro(imgcol_sr, sensor="L5", time_filter=None, roi=None, cloud_cover=70, wv_method=None):
@@ -48,14 +49,20 @@ def apply_lst_prepro(imgcol_sr, sensor="L5", time_filter=None, roi=None, cloud_c
     elif wv_method == 'ERA5':
         print("Begin client-side ERA5 retrieval")
 
+        # roi coordinates and scene time stamps in one request
+        prefetch = Prefetch()
+        prefetch.add('coords', roi.coordinates())
+        prefetch.add('time', collection_times(imgcol_sr))
+        prefetch.fetch()
+
         # ee.geometry to bounding box for era5
         flatten = lambda l: [item for sublist in l for item in sublist]
-        coords = flatten(roi.coordinates().getInfo())
+        coords = flatten(prefetch.get('coords'))
         lons = [x[0] for x in coords]
         lats = [x[1] for x in coords]
         roi_era5 = [max(lats), min(lons), min(lats), max(lons)]
 
-        imgcol_sr = era5_tcwv(imgcol_sr, roi=roi_era5)
+        imgcol_sr = era5_tcwv(imgcol_sr, roi=roi_era5, unix_time=prefetch.get('time'))
 
     imgcol_sr = imgcol_sr.map(radiance_addband)
 
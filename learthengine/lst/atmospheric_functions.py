@@ -73,16 +73,20 @@ def add_wv(imgcol, wv_list):
 
 
 from datetime import datetime, timedelta
+import os
+import tempfile
 import numpy as np
 import cdsapi
 import gdal
 
 
-def era5_tcwv(imgcol, roi=None):
+def era5_tcwv(imgcol, roi=None, unix_time=None):
+    """ unix_time: (List) sorted 'system:time_start' of imgcol if already known client side, e.g. from a prefetch. """
 
     # prepare imgcol
     imgcol = imgcol.sort("system:time_start")
-    unix_time = imgcol.reduceColumns(ee.Reducer.toList(), ["system:time_start"]).get('list').getInfo()
+    if unix_time is None:
+        unix_time = imgcol.reduceColumns(ee.Reducer.toList(), ["system:time_start"]).get('list').getInfo()
 
 
     def hour_rounder(t):
@@ -95,24 +99,32 @@ def era5_tcwv(imgcol, roi=None):
     hour = [time[0].strftime('%H:%M')]
 
     x, y = np.unique(np.array(dates), return_inverse=True)
-    c = cdsapi.Client()
-    c.retrieve(
-        'reanalysis-era5-single-levels',
-        {
-            'product_type': 'reanalysis',
-            'format': 'grib',
-            'variable': 'total_column_water_vapour',
-            "date": dates,
-            'time': hour,
-            'area': roi,  # N W S E
-        },
-        'era5_tcwv.grib')
 
-    # get wv raster imfo
-    wv = gdal.Open('era5_tcwv.grib')
-
-    # client side arrays
-    wv_array = wv.ReadAsArray()
+    # one file per call, so that concurrent retrievals (e.g. composites of run_parallel) do not overwrite each other
+    fd, grib = tempfile.mkstemp(prefix='era5_tcwv_', suffix='.grib')
+    os.close(fd)
+    try:
+        c = cdsapi.Client()
+        c.retrieve(
+            'reanalysis-era5-single-levels',
+            {
+                'product_type': 'reanalysis',
+                'format': 'grib',
+                'variable': 'total_column_water_vapour',
+                "date": dates,
+                'time': hour,
+                'area': roi,  # N W S E
+            },
+            grib)
+
+        # get wv raster imfo
+        wv = gdal.Open(grib)
+
+        # client side arrays
+        wv_array = wv.ReadAsArray()
+        wv = None  # closes the file
+    finally:
+        os.remove(grib)
     wv_array = wv_array * 0.1  # scale from kg/m2 to
     wv_array = [round(np.mean(wv_array[i]), 5) for i in y]  # needed because of unique dates
 
@@ -19,6 +19,14 @@ Threshold (SNDVI) approach as described by Sobrino et al. (2008).
                             Currently implemented: 'mean', 'median', 'min', 'max', 'std', 'percentile',
                             'ts' (Theil-Sen slope), 'nobs' (Number of Observations).
   percentiles               [INT] List of percentiles to calculate if 'percentile' specified in 'select_metrics'.
+  stack_method              [STRING] 'toBands' mosaics scenes per day with a join (generals.mosaic_by_date) and stacks
+                            them with toBands() (generals.stack_bands), both in parallel on the server. 'iterate' uses
+                            the previous iterate-based mosaicking and layerstack(); its layerstacks (stm = False) also
+                            contain the first date twice (band of the first image without date name), 'toBands'
+                            layerstacks have one band per date only.
+  combine_metrics           [BOOL] Compute all metrics except 'ts' and 'nobs' in one reduce call and one export,
+                            named by the joined metrics (e.g. ..._mean-median-percentile) instead of one export per
+                            metric (..._mean, ..._median, ...).
   year_start, year_end      [INT] Start- and end-year of the temporal integration.
   month_start, month_end    [INT] Start- and end-month of the temporal integration.
   select_roi                [xMin, yMin, xMax, yMax] List of corner coordinates.
@@ -43,7 +51,9 @@ Threshold (SNDVI) approach as described by Sobrino et al. (2008).
 
 import ee
 ee.Initialize()
+from learthengine import generals
 from learthengine import prepro
+from learthengine import composite
 
 
 # ====================================================================================================#
@@ -60,6 +70,10 @@ stm = True  # True = STMs False = single scene
 select_parameters = ['lst']
 select_metrics = ['mean']
 percentiles = []
+stack_method = 'toBands'  # 'iterate' = previous serial mosaicking and layerstacks
+combine_metrics = False  # True = one export of all metrics, filename ending with e.g. '_mean-percentile'
+
+SCHEDULER = None  # e.g. generals.ExportScheduler(max_running=10) to queue the exports and wait for them
 
 # Time
 year_start = 1994
@@ -544,6 +558,8 @@ t_threshold = ee.Number(t_threshold)
 # --------------------------------------------------
 # IMPORT IMAGE COLLECTIONS
 # --------------------------------------------------
+time_filter = ee.Filter.And(ee.Filter.calendarRange(year_start, year_end, 'year'),
+                            ee.Filter.calendarRange(month_start, month_end, 'month'))
 
 # Landsat 5 TM
 imgCol_L5_TOA = ee.ImageCollection('LANDSAT/LT05/C01/T1')\
@@ -553,15 +569,7 @@ imgCol_L5_TOA = ee.ImageCollection('LANDSAT/LT05/C01/T1')\
     .filter(ee.Filter.lt('CLOUD_COVER_LAND', max_cloud_cover))\
     .select(['B6'])
 
-imgCol_L5_SR = ee.ImageCollection('LANDSAT/LT05/C01/T1_SR')\
-    .filterBounds(select_roi)\
-    .filter(ee.Filter.calendarRange(year_start,year_end,'year'))\
-    .filter(ee.Filter.calendarRange(month_start,month_end,'month'))\
-    .filter(ee.Filter.lt('CLOUD_COVER_LAND', max_cloud_cover))\
-    .map(prepro.rename_bands_l5) \
-    .map(prepro.mask_landsat_sr(masks)) \
-    .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2'], ['TIR']))\
-    .map(prepro.scale_img(0.1, ['TIR'], ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']))
+imgCol_L5_SR = prepro.sensor_collection('L5', select_roi, time_filter, cloud_cover=max_cloud_cover, masks=masks)
 
 #imgCol_L5_SR = imgCol_L5_SR.map(fun_bands_l57)
 
@@ -573,15 +581,7 @@ imgCol_L7_TOA = ee.ImageCollection('LANDSAT/LE07/C01/T1')\
     .filter(ee.Filter.lt('CLOUD_COVER_LAND', max_cloud_cover))\
     .select(['B6_VCID_2'])
 
-imgCol_L7_SR = ee.ImageCollection('LANDSAT/LE07/C01/T1_SR')\
-    .filterBounds(select_roi)\
-    .filter(ee.Filter.calendarRange(year_start,year_end,'year'))\
-    .filter(ee.Filter.calendarRange(month_start,month_end,'month'))\
-    .filter(ee.Filter.lt('CLOUD_COVER_LAND', max_cloud_cover))\
-    .map(prepro.rename_bands_l7) \
-    .map(prepro.mask_landsat_sr(masks)) \
-    .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2'], ['TIR'])) \
-    .map(prepro.scale_img(0.1, ['TIR'], ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']))
+imgCol_L7_SR = prepro.sensor_collection('L7', select_roi, time_filter, cloud_cover=max_cloud_cover, masks=masks)
 
 #imgCol_L7_SR = imgCol_L7_SR.map(fun_bands_l57)
 
@@ -593,15 +593,7 @@ imgCol_L8_TOA = ee.ImageCollection('LANDSAT/LC08/C01/T1')\
     .filter(ee.Filter.lt('CLOUD_COVER_LAND', max_cloud_cover))\
     .select(['B10'])
 
-imgCol_L8_SR = ee.ImageCollection('LANDSAT/LC08/C01/T1_SR')\
-    .filterBounds(select_roi)\
-    .filter(ee.Filter.calendarRange(year_start,year_end,'year'))\
-    .filter(ee.Filter.calendarRange(month_start,month_end,'month'))\
-    .filter(ee.Filter.lt('CLOUD_COVER_LAND', max_cloud_cover))\
-    .map(prepro.rename_bands_l8) \
-    .map(prepro.mask_landsat_sr(masks)) \
-    .map(prepro.scale_img(0.0001, ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2'], ['TIR']))\
-    .map(prepro.scale_img(0.1, ['TIR'], ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']))
+imgCol_L8_SR = prepro.sensor_collection('L8', select_roi, time_filter, cloud_cover=max_cloud_cover, masks=masks)
 
 #imgCol_L8_SR = imgCol_L8_SR.map(fun_bands_l8)
 
@@ -702,53 +694,67 @@ if stm:
         # Mosaic imgCollection
         pseudodate = ee.Date('1960-01-01')
         subCol = ee.ImageCollection(imgCol_merge.select(parameter))
-        dates = fun_getdates(subCol)
-        ini_date = ee.Date(dates.get(0))
-        ini_merge = subCol.filterDate(ini_date, ini_date.advance(1, 'day'))
-        ini_merge = ini_merge.select(parameter).mosaic().set('system:time_start', ini_date.millis())
-        ini = ee.List([ini_merge])
-        imgCol_mosaic = ee.ImageCollection(ee.List(dates.iterate(fun_mosaic, ini)))
+        if stack_method == 'iterate':
+            dates = fun_getdates(subCol)
+            ini_date = ee.Date(dates.get(0))
+            ini_merge = subCol.filterDate(ini_date, ini_date.advance(1, 'day'))
+            ini_merge = ini_merge.select(parameter).mosaic().set('system:time_start', ini_date.millis())
+            ini = ee.List([ini_merge])
+            imgCol_mosaic = ee.ImageCollection(ee.List(dates.iterate(fun_mosaic, ini)))
+        else:
+            # time stamped at the start of the day, as the iterate mosaics (same TIME band for 'ts')
+            imgCol_mosaic = generals.mosaic_by_date(subCol).map(
+                lambda img: img.set('system:time_start', fun_date(img).millis()))
         imgCol_mosaic = imgCol_mosaic.map(fun_timeband)
 
-        for metric in select_metrics:
-            if metric == 'ts':
-                temp = imgCol_mosaic.select(['TIME', parameter]).reduce(ee.Reducer.sensSlope())
-                temp = temp.select('slope')
-                temp = temp.multiply(365.25)
-                temp = temp.multiply(100000000).int32()
-            elif metric == 'nobs':
-                temp = imgCol_mosaic.select(parameter).count()
-                temp = temp.int16()
+        # reducer metrics (incl. percentiles) of the parameter, in one reduce call and one export if combine_metrics
+        temps = {}
+        metrics = [m for m in select_metrics if m not in ['ts', 'nobs']]
+        groups = [metrics] if combine_metrics and metrics else [[m] for m in metrics]
+        for group in groups:
+            reducers = [lookup_metrics[m] for m in group if m in lookup_metrics]
+            temp = imgCol_mosaic.select(parameter).reduce(
+                composite.combine_reducers(reducers, percentiles if 'percentile' in group else None))
+            if parameter == 'lst':
+                temp = temp.multiply(100).int16()
             else:
-                if metric == 'percentile':
-                    temp = imgCol_mosaic.select(parameter).reduce(ee.Reducer.percentile(percentiles))
-                else:
-                    reducer = lookup_metrics[metric]
-                    temp = imgCol_mosaic.select(parameter).reduce(reducer)
-                if parameter == 'lst':
-                    temp = temp.multiply(100).int16()
-                else:
-                    temp = temp.multiply(10000).int16()
-
+                temp = temp.multiply(10000).int16()
+            temps['-'.join(group)] = temp
+        if 'ts' in select_metrics:
+            temp = imgCol_mosaic.select(['TIME', parameter]).reduce(ee.Reducer.sensSlope())
+            temp = temp.select('slope')
+            temp = temp.multiply(365.25)
+            temps['ts'] = temp.multiply(100000000).int32()
+        if 'nobs' in select_metrics:
+            temp = imgCol_mosaic.select(parameter).count()
+            temps['nobs'] = temp.int16()
+
+        for metric, temp in temps.items():
             # Export to Drive
             filename = parameter+'_'+roi_filename+'_GEE_'+str(year_start)+'-'+str(year_end)+'_'+\
                        str(month_start)+'-'+str(month_end)+'_'+metric
-            out = ee.batch.Export.image.toDrive(image=temp, description=filename,
-                                                scale=pixel_resolution,
-                                                maxPixels=1e13,
-                                                region=select_roi['coordinates'][0],
-                                                crs=epsg)
-            process = ee.batch.Task.start(out)
+            out = generals.submit(SCHEDULER, ee.batch.Export.image.toDrive,
+                                  image=temp, description=filename,
+                                  scale=pixel_resolution,
+                                  maxPixels=1e13,
+                                  region=select_roi['coordinates'][0],
+                                  crs=epsg)
 
 else:
 
-    dates = get_dates(imgCol_merge)
-    range = dates.distinct()
-    newcol = mosaic(imgCol_merge.select(select_parameters), range)  # select to avoid incompabilities with two imgCols (e.g. Red Edge)
+    # select to avoid incompabilities with two imgCols (e.g. Red Edge)
+    if stack_method == 'iterate':
+        dates = get_dates(imgCol_merge)
+        newcol = mosaic(imgCol_merge.select(select_parameters), dates.distinct())
+    else:
+        newcol = generals.mosaic_by_date(imgCol_merge.select(select_parameters))
     newcol = newcol.sort('system:time_start')
 
     for parameter in select_parameters:
-        lyr = layerstack(newcol.select(parameter))
+        if stack_method == 'iterate':
+            lyr = layerstack(newcol.select(parameter))
+        else:
+            lyr = generals.stack_bands(newcol.select(parameter))
 
         if parameter == 'lst':
             lyr = lyr.multiply(100)
@@ -760,12 +766,15 @@ else:
         out_file = sensor + '_' + parameter + '_layerstack_' + roi_filename + '_' + parameter + '_' + str(year_start) + '-' +\
                    str(year_end) + '_' + str(month_start) + '-' + str(month_end)
 
-        out = ee.batch.Export.image.toDrive(image=lyr, description=out_file,
-                                            scale=pixel_resolution,
-                                            maxPixels=1e13,
-                                            region=select_roi['coordinates'][0],
-                                            crs=epsg)
-        process = ee.batch.Task.start(out)
+        out = generals.submit(SCHEDULER, ee.batch.Export.image.toDrive,
+                              image=lyr, description=out_file,
+                              scale=pixel_resolution,
+                              maxPixels=1e13,
+                              region=select_roi['coordinates'][0],
+                              crs=epsg)
+
+if SCHEDULER is not None:
+    print(SCHEDULER.run())
 
 
 '''
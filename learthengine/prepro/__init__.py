@@ -2,4 +2,7 @@ from .masking import mask_landsat_sr, mask_s2_scl, mask_s2_cdi, mask_s2, applyHo
     mask_cloudbuffer, focal_mask
 from .rename_bands import rename_bands_l5, rename_bands_l7, rename_bands_l8, rename_bands_s2
 from .scale import scale_img
-from .indices import ndvi, ndwi1, ndwi2, ndbi, tcb, tcg, tcw, fvc, surface_albedo, evi
+from .indices import ndvi, ndwi1, ndwi2, ndbi, tcb, tcg, tcw, fvc, surface_albedo, evi, spectral_indices, \
+    linear_transform, linear_coefficients
+from .collection_factory import sensor_collection, sensor_collections, merge_collections, sensor_steps, clear_cache
+from .band_plan import plan_bands, band_dependencies
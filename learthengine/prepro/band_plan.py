@@ -0,0 +1,86 @@
+reflectance_bands = ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']
+
+# bands read by the step adding a band (prepro.spectral_indices, prepro.fvc, lst.*, composite.fun_add*, scores).
+# Bands without entry are inputs, i.e. sensor bands or bands joined in by lst.apply_lst_prepro.
+band_inputs = {
+    'NDVI': ['NIR', 'R'],
+    'EVI': ['NIR', 'R', 'B'],
+    'NDWI1': ['NIR', 'SWIR1'],
+    'NDWI2': ['G', 'NIR'],
+    'NDBI': ['SWIR1', 'NIR'],
+    'TCB': reflectance_bands,
+    'TCG': reflectance_bands,
+    'TCW': reflectance_bands,
+    'ALBEDO': reflectance_bands,
+    'FVC': ['NDVI'],
+    'EPSILON': ['FVC', 'NDWI2'],
+    'GAMMA': ['TIR', 'L'],
+    'DELTA': ['TIR'],
+    'LST': ['GAMMA', 'DELTA', 'EPSILON', 'AF1', 'AF2', 'AF3', 'L'],
+    'DOY': ['R'],
+    'YEAR': ['R'],
+    'CLOUD_DISTANCE': ['R'],
+    'DOYSCORE': ['DOY'],
+    'YEARSCORE': [],
+    'CLOUDSCORE': ['CLOUD_DISTANCE', 'R'],
+    'PBC': ['DOYSCORE', 'YEARSCORE', 'CLOUDSCORE'],
+    'TIME': []
+}
+
+# bands of the collections after renaming, masking and scaling (see prepro.sensor_steps)
+sensor_bands = {'L5': reflectance_bands + ['TIR'],
+                'L7': reflectance_bands + ['TIR'],
+                'L8': reflectance_bands + ['TIR'],
+                'S2_L1C': ['B', 'G', 'R', 'RE1', 'RE2', 'RE3', 'NIR', 'RE4', 'SWIR1', 'SWIR2'],
+                'S2_L2A': ['B', 'G', 'R', 'RE1', 'RE2', 'RE3', 'NIR', 'RE4', 'SWIR1', 'SWIR2']}
+
+
+def band_dependencies(bands):
+    """
+    All bands needed to derive bands, including bands itself.
+
+    :param bands:   (List) of band names, e.g. ['NDVI', 'PBC'].
+    :return:        (Set) of band names.
+    """
+    needed = set()
+    pending = list(bands)
+    while pending:
+        band = pending.pop()
+        if band not in needed:
+            needed.add(band)
+            pending.extend(band_inputs.get(band, []))
+    return needed
+
+
+def plan_bands(bands, score=None, mask_percentiles=False, buffer_clouds=False):
+    """
+    Band plan of a composite: which bands to keep from the sensors and which derived bands to add.
+
+    :param bands:               (List) of output band names.
+    :param score:               (Str) compositing method, see composite.img_composite.
+    :param mask_percentiles:    (Bool) percentile masking on 'R' and 'B' is applied.
+    :param buffer_clouds:       (Bool) cloud buffer masking (requires 'CLOUD_DISTANCE') is applied.
+    :return:                    (Dict) 'inputs': sensor bands to select right after masking,
+                                'needed': all bands the pipeline has to add or keep,
+                                'keep': bands to select before qualityMosaic/reduce.
+    """
+    keep = list(bands)
+    if score == 'PBC':
+        keep.append('PBC')
+    elif score == 'MAXNDVI':
+        keep.append('NDVI')
+    elif score == 'TS_slope':
+        keep.append('TIME')
+    keep = [b for i, b in enumerate(keep) if b not in keep[:i]]
+
+    required = list(keep)
+    if mask_percentiles:
+        required += ['R', 'B']
+    if buffer_clouds:
+        required.append('CLOUD_DISTANCE')
+    needed = band_dependencies(required)
+
+    all_sensor_bands = set(b for x in sensor_bands.values() for b in x)
+    inputs = [b for b in reflectance_bands + ['RE1', 'RE2', 'RE3', 'RE4', 'TIR']
+              if b in needed and b in all_sensor_bands]
+    return {'inputs': inputs, 'needed': needed, 'keep': keep}
@@ -0,0 +1,135 @@
+import ee
+import threading
+from collections import OrderedDict
+
+from learthengine import generals
+from .masking import mask_landsat_sr, mask_s2_cdi, mask_s2, mask_s2_scl
+from .rename_bands import rename_bands_l5, rename_bands_l7, rename_bands_l8, rename_bands_s2
+from .scale import scale_img
+from .band_plan import sensor_bands
+
+
+collection_ids = {'L5': 'LANDSAT/LT05/C01/T1_SR',
+                  'L7': 'LANDSAT/LE07/C01/T1_SR',
+                  'L8': 'LANDSAT/LC08/C01/T1_SR',
+                  'S2_L1C': 'COPERNICUS/S2',
+                  'S2_L2A': 'COPERNICUS/S2_SR'}
+
+# single sensors making up a sensor option, in merge order
+sensor_members = {'L5': ['L5'], 'L7': ['L7'], 'L8': ['L8'], 'S2_L1C': ['S2_L1C'], 'S2_L2A': ['S2_L2A'],
+                  'LS': ['L5', 'L7', 'L8'],
+                  'SL8': ['L8', 'S2_L2A'],
+                  'SL': ['L5', 'L7', 'L8', 'S2_L2A']}
+
+# number of collections kept by sensor_collection, the least recently used ones are dropped first (0 disables)
+cache_size = 64
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _key(obj):
+    return obj.serialize() if isinstance(obj, ee.ComputedObject) else obj
+
+
+def sensor_steps(sensor, masks=None, T_threshold=None, T_omission=True, bands=None):
+    """
+    Per-image preprocessing steps (renaming, masking, scaling) of a single sensor.
+
+    :param sensor:          (Str) One of L5, L7, L8, S2_L1C, S2_L2A.
+    :param masks:           (List) Landsat objects to mask, see prepro.mask_landsat_sr.
+    :param bands:           (List) of bands to keep, e.g. prepro.plan_bands(...)['inputs']. All other bands are dropped
+                            by the scaling right after masking. Default to None keeps all bands.
+    :return:                (List) of image functions.
+    """
+    if sensor not in sensor_bands:
+        raise ValueError("Invalid sensor specified. Must be one of " + ", ".join(collection_ids))
+    refl = [b for b in sensor_bands[sensor] if b != 'TIR' and (bands is None or b in bands)]
+    if not refl:
+        refl = [b for b in sensor_bands[sensor] if b != 'TIR']
+    if sensor in ['L5', 'L7', 'L8']:
+        rename = {'L5': rename_bands_l5, 'L7': rename_bands_l7, 'L8': rename_bands_l8}[sensor]
+        steps = [rename, mask_landsat_sr(masks, T_threshold=T_threshold, omission=T_omission)]
+        if bands is None or 'TIR' in bands:
+            steps += [scale_img(0.0001, refl, ['TIR']), scale_img(0.1, ['TIR'], refl)]
+        else:
+            steps += [scale_img(0.0001, refl)]
+        return steps
+    return [mask_s2_cdi(-0.5),
+            rename_bands_s2,
+            mask_s2 if sensor == 'S2_L1C' else mask_s2_scl,
+            scale_img(0.0001, refl)]
+
+
+def sensor_collection(sensor, roi, time_filter, cloud_cover=70, masks=None, T_threshold=None, T_omission=True,
+                      exclude_slc_off=False, fuse_maps=True, bands=None):
+    """
+    Filtered and preprocessed collection of a single sensor. Collections are memoized on their arguments, so repeated
+    calls (e.g. in a loop over target years and DOYs) return the same object instead of rebuilding the graph. The
+    memo keeps the cache_size most recently used collections (e.g. of the last ROIs of a batch run), see clear_cache.
+
+    :param sensor:          (Str) One of L5, L7, L8, S2_L1C, S2_L2A.
+    :param roi:             (ee.Geometry) region to filter the collection to.
+    :param time_filter:     (ee.Filter) temporal filter, e.g. from generals.time_filter.
+    :param cloud_cover:     (Int) maximum scene cloud cover. Default to 70.
+    :param masks:           (List) Landsat objects to mask. Default to ['cloud', 'cshadow', 'snow'].
+    :param exclude_slc_off: (Bool) If sensor = L7. Exclude scenes after the scan-line corrector failure.
+    :param fuse_maps:       (Bool) Apply the preprocessing steps as one fused map (see generals.fuse).
+    :param bands:           (List) of bands to keep, see sensor_steps. Default to None keeps all bands.
+    :return:                ee.ImageCollection
+    """
+    if masks is None:
+        masks = ['cloud', 'cshadow', 'snow']
+    key = (sensor, _key(roi), _key(time_filter), cloud_cover, tuple(masks), T_threshold, T_omission,
+           exclude_slc_off and sensor == 'L7', fuse_maps, None if bands is None else tuple(bands))
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    cloud_property = 'CLOUDY_PIXEL_PERCENTAGE' if sensor.startswith('S2') else 'CLOUD_COVER_LAND'
+    steps = sensor_steps(sensor, masks=masks, T_threshold=T_threshold, T_omission=T_omission, bands=bands)
+    imgcol = ee.ImageCollection(collection_ids[sensor]) \
+        .filterBounds(roi) \
+        .filter(time_filter) \
+        .filter(ee.Filter.lt(cloud_property, cloud_cover))
+    imgcol = generals.map_steps(imgcol, steps, fuse_maps)
+    if exclude_slc_off and sensor == 'L7':
+        imgcol = imgcol.filter(ee.Filter.date("1999-04-18", "2003-05-31"))
+
+    with _cache_lock:
+        imgcol = _cache.setdefault(key, imgcol)  # built by another thread in the meantime
+        _cache.move_to_end(key)
+        while len(_cache) > cache_size:
+            _cache.popitem(last=False)
+    return imgcol
+
+
+def sensor_collections(sensor, roi, time_filter, **kwargs):
+    """
+    Collections of all single sensors of a sensor option (e.g. LS -> L5, L7, L8). Only these are built.
+
+    :param sensor:          (Str) One of S2_L1C, S2_L2A, L5, L7, L8, LS, SL8, SL.
+    :return:                (Dict) single sensor: ee.ImageCollection, see sensor_collection for kwargs.
+    """
+    if sensor not in sensor_members:
+        raise ValueError("Invalid sensor specified. Must be one of " + ", ".join(sensor_members))
+    return {s: sensor_collection(s, roi, time_filter, **kwargs) for s in sensor_members[sensor]}
+
+
+def merge_collections(collections, sensor):
+    """
+    Merges the collections returned by sensor_collections. Landsat-only (LS) collections are sorted by time.
+    """
+    members = sensor_members[sensor]
+    imgcol = collections[members[0]]
+    for s in members[1:]:
+        imgcol = imgcol.merge(collections[s])
+    if sensor == 'LS':
+        imgcol = imgcol.sort("system:time_start")
+    return imgcol
+
+
+def clear_cache():
+    """ Empties the collection cache of sensor_collection. """
+    with _cache_lock:
+        _cache.clear()
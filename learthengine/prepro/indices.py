@@ -1,5 +1,7 @@
 import ee
 
+from learthengine.coefficients import tc_coef, albedo_coef, linear_bands
+
 
 def ndvi(img):
        ndvi = img.normalizedDifference(['NIR', 'R']).rename('NDVI')
@@ -117,21 +119,9 @@ def tcw(img):
 def surface_albedo(coef=None, sensor="L5"):
 
     if coef is None:
-
-        # Cunha et al. (2020): "Surface albedo as a proxy for land-cover clearing in seasonally dry forests: Evidence
-        # from the Brazilian Caatinga", Remote Sensing of Environment.
-        coef_l5 = [0.3206, 0, 0.1572, 0.3666, 0.1162, 0.0457, -0.0063]
-        coef_l7 = [0.3141, 0, 0.1607, 0.3694, 0.1160, 0.0456, -0.0057]
-        coef_l8 = [0.2453, 0.0508, 0.1804, 0.3081, 0.1332, 0.0521, 0.0011]
-
-        if sensor == 'L5':
-            coef = coef_l5
-        elif sensor == 'L7':
-            coef = coef_l7
-        elif sensor == 'L8':
-            coef = coef_l8
-        else:
+        if sensor not in albedo_coef:
             return
+        coef = albedo_coef[sensor]
 
     coef = [str(x) for x in coef]
 
@@ -148,3 +138,81 @@ def surface_albedo(coef=None, sensor="L5"):
             }).rename('ALBEDO')
         return img.addBands(albedo)
     return wrap
+
+
+def linear_coefficients(components, sensor=None):
+    """
+    Coefficient matrix (components x ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']), offsets and names for any of
+    'TCB', 'TCG', 'TCW' and 'ALBEDO' (requires sensor).
+    """
+    matrix = []
+    offset = []
+    for c in components:
+        if c == 'ALBEDO':
+            matrix.append(albedo_coef[sensor][:6])
+            offset.append(albedo_coef[sensor][6])
+        else:
+            matrix.append(tc_coef[c])
+            offset.append(0)
+    return matrix, offset, list(components)
+
+
+def _linear_bands(img, matrix, offset, names, bands):
+    array = img.select(bands).toArray().toArray(1)
+    out = ee.Image(ee.Array(matrix)).matrixMultiply(array).arrayProject([0]).arrayFlatten([names])
+    if any(offset):
+        out = out.add(ee.Image.constant(offset).rename(names))
+    return out
+
+
+def linear_transform(components=None, sensor=None, matrix=None, offset=None, names=None,
+                     bands=('B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2')):
+    """
+    Linear band transforms (Tasseled Cap, surface albedo or a user-supplied matrix) as one matrixMultiply.
+
+    :param components:  (List) of 'TCB', 'TCG', 'TCW', 'ALBEDO'. Ignored if matrix is given.
+    :param sensor:      (Str) One of L5, L7, L8. Required for 'ALBEDO'.
+    :param matrix:      (List) of lists, one row of coefficients per output band and one column per band in bands.
+    :param offset:      (List) of constants added to each output band. Default to 0.
+    :param names:       (List) of output bandnames, one per row of matrix.
+    :param bands:       (List) of input bandnames.
+    """
+    if matrix is None:
+        matrix, offset, names = linear_coefficients(components, sensor)
+    if offset is None:
+        offset = [0] * len(matrix)
+    bands = list(bands)
+
+    def wrap(img):
+        return img.addBands(_linear_bands(img, matrix, offset, names, bands))
+    return wrap
+
+
+def spectral_indices(indices, sensor=None, gain=2.5, l=1, c1=6, c2=7.5):
+    """
+    Adds all requested indices in a single mapped function instead of one .map() per index.
+    One of 'NDVI', 'EVI', 'NDWI1', 'NDWI2', 'NDBI', 'TCG', 'TCB', 'TCW', 'ALBEDO' (requires sensor).
+    Tasseled Cap components and albedo are derived in one matrixMultiply.
+    """
+    linear = [x for x in ['TCB', 'TCG', 'TCW', 'ALBEDO'] if x in indices]
+    if linear:
+        matrix, offset, names = linear_coefficients(linear, sensor)
+
+    def wrap(img):
+        bands = []
+        if 'NDVI' in indices:
+            bands.append(img.normalizedDifference(['NIR', 'R']).rename('NDVI'))
+        if 'EVI' in indices:
+            bands.append(evi(gain, l, c1, c2)(img).select('EVI'))
+        if 'NDWI1' in indices:
+            bands.append(img.normalizedDifference(['NIR', 'SWIR1']).rename('NDWI1'))
+        if 'NDWI2' in indices:
+            bands.append(img.normalizedDifference(['G', 'NIR']).rename('NDWI2'))
+        if 'NDBI' in indices:
+            bands.append(img.normalizedDifference(['SWIR1', 'NIR']).rename('NDBI'))
+        if linear:
+            bands.append(_linear_bands(img, matrix, offset, names, linear_bands))
+        if not bands:
+            return img
+        return img.addBands(ee.Image.cat(bands))
+    return wrap
@@ -1,5 +1,7 @@
 import ee
 
+from learthengine.coefficients import hollstein_classes, hollstein_thresholds
+
 
 def mask_landsat_sr(masks, T_threshold=None, omission=True):
 
@@ -227,6 +229,24 @@ def binary(conditions, classes, mask_name='dt_mask'):
     return mask_img.addBands(not_mask)
 
 
+def hollstein_conditions(image, aerosol='B1', blue='B2', green='B3', red_edge1='B5', red_edge2='B6', red_edge3='B7',
+                         red_edge4='B8A', water_vapor='B9', cirrus='B10', swir='B11'):
+    """ The 13 leaf conditions of the Hollstein et al. (2016) decision tree as images, keyed as in hollstein_classes. """
+    roles = {'aerosol': aerosol, 'blue': blue, 'green': green, 'red_edge1': red_edge1, 'red_edge2': red_edge2,
+             'red_edge3': red_edge3, 'red_edge4': red_edge4, 'water_vapor': water_vapor, 'cirrus': cirrus,
+             'swir': swir}
+
+    conditions = {}
+    for key, (operation, bands, threshold) in hollstein_thresholds.items():
+        value = image.select(roles[bands[0]])
+        if operation == 'difference':
+            value = value.subtract(image.select(roles[bands[1]]))
+        elif operation == 'ratio':
+            value = value.divide(image.select(roles[bands[1]]))
+        conditions[key] = value.lt(threshold)
+    return conditions
+
+
 def hollsteinMask(image,
                   options=('cloud', 'snow', 'shadow', 'water', 'cirrus'),
                   aerosol='B1', blue='B2', green='B3', red_edge1='B5',
@@ -234,66 +254,32 @@ def hollsteinMask(image,
                   water_vapor='B9', cirrus='B10', swir='B11',
                   name='hollstein'):
     """ Get Hollstein mask """
-    def difference(a, b):
-        def wrap(img):
-            return img.select(a).subtract(img.select(b))
-        return wrap
-
-    def ratio(a, b):
-        def wrap(img):
-            return img.select(a).divide(img.select(b))
-        return wrap
-
-    # 1
-    b3 = image.select(green).lt(3190)
-
-    # 2
-    b8a = image.select(red_edge4).lt(1660)
-    r511 = ratio(red_edge1, swir)(image).lt(4.33)
-
-    # 3
-    s1110 = difference(swir, cirrus)(image).lt(2550)
-    b3_3 = image.select(green).lt(5250)
-    r210 = ratio(blue, cirrus)(image).lt(14.689)
-    s37 = difference(green, red_edge3)(image).lt(270)
-
-    # 4
-    r15 = ratio(aerosol, red_edge1)(image).lt(1.184)
-    s67 = difference(red_edge2, red_edge3)(image).lt(-160)
-    b1 = image.select(aerosol).lt(3000)
-    r29 =  ratio(blue, water_vapor)(image).lt(0.788)
-    s911 = difference(water_vapor, swir)(image).lt(210)
-    s911_2 = difference(water_vapor, swir)(image).lt(-970)
-
-    snow = {'snow':[['1',0], ['22',0], ['34',0]]}
-    cloud = {'cloud-1':[['1',0], ['22',1],['33',1],['44',1]],
-             'cloud-2':[['1',0], ['22',1],['33',0],['45',0]]}
-    cirrus = {'cirrus-1':[['1',0], ['22',1],['33',1],['44',0]],
-              'cirrus-2':[['1',1], ['21',0],['32',1],['43',0]]}
-    shadow = {'shadow-1':[['1',1], ['21',1],['31',1],['41',0]],
-              'shadow-2':[['1',1], ['21',1],['31',0],['42',0]],
-              'shadow-3':[['1',0], ['22',0],['34',1],['46',0]]}
-    water = {'water':[['1',1], ['21',1],['31',0],['42',1]]}
-
-    all = {'cloud':cloud,
-           'snow': snow,
-           'shadow':shadow,
-           'water':water,
-           'cirrus':cirrus}
+    conditions = hollstein_conditions(image, aerosol, blue, green, red_edge1, red_edge2, red_edge3, red_edge4,
+                                      water_vapor, cirrus, swir)
 
     final = {}
 
     for option in options:
-        final.update(all[option])
-
-    dtf = binary(
-        {'1':b3,
-         '21':b8a, '22':r511,
-         '31':s37, '32':r210, '33':s1110, '34':b3_3,
-         '41': s911_2, '42':s911, '43':r29, '44':s67, '45':b1, '46':r15
-         }, final, name)
-
-    return dtf
+        final.update(hollstein_classes[option])
+
+    # flat decision tree: every path is a chain of And, every class an Or of its paths (no server-side iterate)
+    classes = {}
+    for key in sorted(final):
+        path = ee.Image.constant(1)
+        for condition_key, boolean in final[key]:
+            condition = conditions[condition_key]
+            path = path.And(condition if boolean else condition.Not())
+        baseclass = key.split('-')[0]
+        classes[baseclass] = classes[baseclass].Or(path) if baseclass in classes else path
+
+    names = sorted(classes)
+    mask_img = ee.Image.cat([classes[n].rename(n) for n in names])
+
+    result = classes[names[0]]
+    for n in names[1:]:
+        result = result.Or(classes[n])
+
+    return mask_img.addBands(result.Not().rename(name))
 
 
 def applyHollstein(options=('cloud', 'snow', 'shadow', 'water', 'cirrus'),
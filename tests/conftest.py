@@ -0,0 +1,50 @@
+import importlib.util
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+package_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'learthengine')
+
+
+def load_module(path):
+    """
+    Loads a single module of the package by path (e.g. 'generals/pipeline.py'), without the package __init__ files
+    that initialize Earth Engine. Relative imports of sibling modules are loaded the same way. Each module is loaded
+    once, so that its functions can be pickled for process pools.
+    """
+    parts = path[:-3].split('/')
+    package = 'learthengine_test'
+    for i, part in enumerate([None] + parts[:-1]):
+        if part is not None:
+            package += '.' + part
+        if package not in sys.modules:
+            module = types.ModuleType(package)
+            module.__path__ = [os.path.join(package_dir, *parts[:i])]
+            sys.modules[package] = module
+    name = package + '.' + parts[-1]
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(package_dir, path))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def provide(path):
+    """
+    Loads a module with load_module and registers it under its package name (e.g. 'learthengine.local.scoring') for
+    modules importing it absolutely, without running the package __init__ files.
+    """
+    module = load_module(path)
+    parts = ['learthengine'] + path[:-3].split('/')
+    for i in range(1, len(parts)):
+        package = '.'.join(parts[:i])
+        if package not in sys.modules:
+            stub = types.ModuleType(package)
+            stub.__path__ = [os.path.join(package_dir, *parts[1:i])]
+            sys.modules[package] = stub
+    sys.modules['.'.join(parts)] = module
+    return module
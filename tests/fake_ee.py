@@ -0,0 +1,127 @@
+"""
+Minimal in-process stand-in for the parts of the ee client the tests touch. Calls build a graph like the real client
+(func.getSignature()['name'] and args) and evaluate() computes band names and properties with the Earth Engine
+semantics relevant here: select/rename/updateMask/addBands/set keep the image properties, arithmetic drops them and
+copyProperties copies all but the 'system:' properties.
+"""
+import contextlib
+import sys
+import types
+
+
+class Func(object):
+    def __init__(self, name):
+        self.name = name
+
+    def getSignature(self):
+        return {'name': self.name}
+
+
+class ComputedObject(object):
+    def __init__(self, func=None, args=None):
+        self.func = func
+        self.args = args
+
+    def _call(self, cls, name, **args):
+        return cls(Func(name), args)
+
+
+class Element(ComputedObject):
+    def get(self, key):
+        return ComputedObject(Func('Element.get'), {'object': self, 'property': key})
+
+    def set(self, key, value):
+        return self._call(type(self), 'Element.set', object=self, key=key, value=value)
+
+    def copyProperties(self, source=None, exclude=None):
+        return self._call(type(self), 'Element.copyProperties', destination=self, source=source, exclude=exclude)
+
+
+class Image(Element):
+    def __init__(self, func=None, args=None, bands=None, properties=None):
+        if isinstance(func, Image):
+            func, args = func.func, func.args
+        super(Image, self).__init__(func if isinstance(func, Func) else None, args)
+        if self.func is None:
+            self.args = {'bands': list(bands or []), 'properties': dict(properties or {})}
+
+    def select(self, bands):
+        return self._call(Image, 'Image.select', input=self, bandSelectors=list(bands))
+
+    def rename(self, names):
+        return self._call(Image, 'Image.rename', input=self, names=list(names))
+
+    def toFloat(self):
+        return self._call(Image, 'Image.toFloat', value=self)
+
+    def multiply(self, value):
+        return self._call(Image, 'Image.multiply', image1=self, image2=value)
+
+    def updateMask(self, mask):
+        return self._call(Image, 'Image.updateMask', image=self, mask=mask)
+
+    def addBands(self, other):
+        return self._call(Image, 'Image.addBands', dstImg=self, srcImg=other)
+
+    def date(self):
+        return ComputedObject(Func('Image.date'), {'image': self})
+
+
+class Reducer(ComputedObject):
+    pass
+
+
+def evaluate(obj):
+    """ Client side value of obj: (band names, properties) for images, the value otherwise. """
+    if not isinstance(obj, ComputedObject):
+        return obj
+    if obj.func is None:
+        return list(obj.args['bands']), dict(obj.args['properties'])
+    name, args = obj.func.name, obj.args
+    if name == 'Element.get':
+        return evaluate(args['object'])[1].get(args['property'])
+    if name == 'Image.date':
+        return evaluate(args['image'])[1].get('system:time_start')
+    if name == 'Element.set':
+        bands, props = evaluate(args['object'])
+        props[args['key']] = evaluate(args['value'])
+        return bands, props
+    if name == 'Element.copyProperties':
+        bands, props = evaluate(args['destination'])
+        source = evaluate(args['source'])[1]
+        props.update({k: v for k, v in source.items()
+                      if not k.startswith('system:') and k not in (args['exclude'] or [])})
+        return bands, props
+    if name == 'Image.select':
+        bands, props = evaluate(args['input'])
+        return [b for b in args['bandSelectors'] if b in bands], props
+    if name == 'Image.rename':
+        return list(args['names']), evaluate(args['input'])[1]
+    if name == 'Image.updateMask':
+        return evaluate(args['image'])
+    if name == 'Image.addBands':
+        bands, props = evaluate(args['dstImg'])
+        return bands + [b for b in evaluate(args['srcImg'])[0] if b not in bands], props
+    if name in ['Image.toFloat', 'Image.multiply']:
+        key = 'value' if name == 'Image.toFloat' else 'image1'
+        return evaluate(args[key])[0], {}
+    raise NotImplementedError(name)
+
+
+@contextlib.contextmanager
+def installed():
+    """ Registers the fake as module 'ee' while package modules are loaded, e.g. with conftest.load_module. """
+    previous = sys.modules.get('ee')
+    module = types.ModuleType('ee')
+    module.ComputedObject = ComputedObject
+    module.Element = Element
+    module.Image = Image
+    module.Reducer = Reducer
+    sys.modules['ee'] = module
+    try:
+        yield module
+    finally:
+        if previous is None:
+            del sys.modules['ee']
+        else:
+            sys.modules['ee'] = previous
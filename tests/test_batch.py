@@ -0,0 +1,31 @@
+import json
+import sys
+import types
+
+import fake_ee
+from conftest import load_module, provide
+
+with fake_ee.installed():
+    provide('generals/find_utm.py')
+    sys.modules['learthengine.generals'].find_utm = sys.modules['learthengine.generals.find_utm'].find_utm
+    stub = types.ModuleType('learthengine_test.composite.img_composite')
+    stub.img_composite = None
+    sys.modules['learthengine_test.composite.img_composite'] = stub
+    batch = load_module('composite/batch.py')
+
+
+def feature(name, x):
+    return {'type': 'Feature', 'properties': {'NAME': name},
+            'geometry': {'type': 'Polygon', 'coordinates': [[[x, 52.], [x + .1, 52.], [x + .1, 52.1], [x, 52.]]]}}
+
+
+def test_duplicate_names_are_unique(tmp_path):
+    path = str(tmp_path / 'rois.geojson')
+    names = ['Mitte', 'Mitte', 'Nord', 'Nord Ost', 'Nord/Ost', 'Mitte_1']
+    with open(path, 'w') as f:
+        json.dump({'type': 'FeatureCollection', 'features': [feature(n, 13. + i) for i, n in enumerate(names)]}, f)
+    rois = batch.read_rois(path, name_property='NAME')
+    out = [roi['name'] for roi in rois]
+    assert len(set(out)) == len(out)
+    assert out[2] == 'Nord'
+    assert out[0].startswith('Mitte_') and out[3].startswith('Nord_Ost_')
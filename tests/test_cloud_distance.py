@@ -0,0 +1,62 @@
+import numpy as np
+from scipy import ndimage
+
+from conftest import load_module
+
+cloud_distance = load_module('local/cloud_distance.py')
+
+
+def random_mask(shape=(97, 131), seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.random(shape) > 0.03
+
+
+class CountingMask(object):
+    """ Mask counting the tiles read from it, like a np.memmap read tile by tile. """
+    def __init__(self, mask):
+        self.mask = mask
+        self.shape = mask.shape
+        self.reads = 0
+
+    def __getitem__(self, item):
+        self.reads += 1
+        return self.mask[item]
+
+
+def test_matches_distance_transform_edt():
+    mask = random_mask()
+    for req_distance in [3, 10, 200]:
+        expected = np.minimum(ndimage.distance_transform_edt(mask), req_distance)
+        np.testing.assert_allclose(cloud_distance.cloud_distance(mask, req_distance), expected, rtol=1e-6)
+
+
+def test_without_clouds_in_radius():
+    mask = np.ones((30, 30), dtype=bool)
+    mask[0, 0] = False
+    out = cloud_distance.cloud_distance(mask, 5)
+    assert out[0, 0] == 0 and out[29, 29] == 5 and out[0, 3] == 3 and out[3, 4] == 5
+
+
+def test_tiled_equals_untiled():
+    mask = random_mask()
+    expected = cloud_distance.cloud_distance(mask, 10)
+    for processes in [1, 2]:
+        tiled = cloud_distance.cloud_distance_tiled(mask, 10, tile_size=32, processes=processes)
+        assert np.array_equal(tiled, expected)
+
+
+def test_tiles_read_within_window(monkeypatch):
+    mask = CountingMask(random_mask())
+    write = cloud_distance._write
+    written = []
+    in_flight = []
+
+    def counting_write(out, crop, future):
+        in_flight.append(mask.reads - len(written))
+        written.append(crop)
+        write(out, crop, future)
+    monkeypatch.setattr(cloud_distance, '_write', counting_write)
+    tiled = cloud_distance.cloud_distance_tiled(mask, 10, tile_size=16, processes=2)
+    assert len(written) == mask.reads == 7 * 9
+    assert max(in_flight) <= 2 * 2
+    assert np.array_equal(tiled, cloud_distance.cloud_distance(mask.mask, 10))
@@ -0,0 +1,69 @@
+import types
+
+import fake_ee
+from conftest import load_module, provide
+
+with fake_ee.installed():
+    provide('generals/find_utm.py')
+    factory = load_module('prepro/collection_factory.py')
+
+
+class Collection(object):
+    """ Stand-in for ee.ImageCollection recording its filters. """
+    def __init__(self, collection_id, filters=()):
+        self.collection_id = collection_id
+        self.filters = list(filters)
+
+    def filterBounds(self, roi):
+        return Collection(self.collection_id, self.filters + [('bounds', roi)])
+
+    def filter(self, f):
+        return Collection(self.collection_id, self.filters + [f])
+
+
+def install(monkeypatch, cache_size):
+    built = []
+
+    def collection(collection_id):
+        built.append(collection_id)
+        return Collection(collection_id)
+    ee = types.SimpleNamespace(ComputedObject=fake_ee.ComputedObject, ImageCollection=collection,
+                               Filter=types.SimpleNamespace(lt=lambda *args: ('lt',) + args))
+    monkeypatch.setattr(factory, 'ee', ee)
+    monkeypatch.setattr(factory, 'generals', types.SimpleNamespace(map_steps=lambda imgcol, steps, fuse: imgcol))
+    monkeypatch.setattr(factory, 'sensor_steps', lambda *args, **kwargs: [])
+    monkeypatch.setattr(factory, 'cache_size', cache_size)
+    factory.clear_cache()
+    return built
+
+
+def test_memoized_per_arguments(monkeypatch):
+    built = install(monkeypatch, 8)
+    a = factory.sensor_collection('L8', 'roi-1', 'summer')
+    assert factory.sensor_collection('L8', 'roi-1', 'summer') is a
+    assert factory.sensor_collection('L8', 'roi-2', 'summer') is not a
+    assert factory.sensor_collection('L8', 'roi-1', 'summer', cloud_cover=30) is not a
+    assert len(built) == 3
+
+
+def test_least_recently_used_dropped(monkeypatch):
+    built = install(monkeypatch, 3)
+    for roi in ['roi-0', 'roi-1', 'roi-2']:
+        factory.sensor_collection('L8', roi, 'summer')
+    factory.sensor_collection('L8', 'roi-0', 'summer')  # used again, roi-1 is now the oldest
+    factory.sensor_collection('L8', 'roi-3', 'summer')
+    assert len(factory._cache) == 3
+    n = len(built)
+    factory.sensor_collection('L8', 'roi-0', 'summer')
+    assert len(built) == n
+    factory.sensor_collection('L8', 'roi-1', 'summer')
+    assert len(built) == n + 1
+
+
+def test_clear_cache(monkeypatch):
+    built = install(monkeypatch, 8)
+    factory.sensor_collection('L5', 'roi', 'summer')
+    factory.clear_cache()
+    assert len(factory._cache) == 0
+    factory.sensor_collection('L5', 'roi', 'summer')
+    assert len(built) == 2
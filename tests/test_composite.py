@@ -0,0 +1,95 @@
+import datetime
+
+import numpy as np
+import pytest
+from scipy import ndimage
+
+from conftest import provide
+
+scoring = provide('local/scoring.py')
+provide('local/cloud_distance.py')
+img_composite = provide('local/img_composite.py')
+streaming = provide('local/streaming.py')
+incremental = provide('local/incremental.py')
+
+band_names = ['B', 'R', 'NIR']
+dates = [datetime.date(2018, 7, 20), datetime.date(2019, 5, 2), datetime.date(2019, 6, 28), datetime.date(2019, 7, 3),
+         datetime.date(2019, 8, 15), datetime.date(2019, 9, 30), datetime.date(2020, 6, 1)]
+
+
+def scenes(rows=40, cols=45):
+    """ Scaled reflectance stack (time, band, y, x) and clear masks with cloud blobs in every scene. """
+    rng = np.random.default_rng(4)
+    values = rng.uniform(0., 0.6, (len(dates), len(band_names), rows, cols))
+    mask = np.empty((len(dates), rows, cols), dtype=bool)
+    for t in range(len(dates)):
+        seeds = rng.random((rows, cols)) < 0.01
+        seeds[rng.integers(rows), rng.integers(cols)] = True
+        mask[t] = ~ndimage.binary_dilation(seeds, iterations=int(rng.integers(1, 4)))
+    return values, mask
+
+
+def reference(values, mask, target_year, target_doy, doy_vs_year=20, min_clouddistance=10, max_clouddistance=50,
+              weights=(0.4, 0.4, 0.2)):
+    """ Griffiths et al. (2013) scores written out per scene, cloud distance from scipy, first best scene wins. """
+    doys = np.array([d.timetuple().tm_yday - 1 for d in dates], dtype=np.float64)
+    doy_std = np.std(doys)
+    offset = np.trunc(np.exp(-0.5 * ((doy_vs_year - 0.) / doy_std) ** 2) * 10000)
+    best = np.full(mask.shape[1:], -np.inf)
+    out = np.zeros((values.shape[1],) + mask.shape[1:], dtype=np.int16)
+    for t, d in enumerate(dates):
+        doy_score = np.exp(-0.5 * ((doys[t] - target_doy) / doy_std) ** 2) * 10000
+        year_score = 10000. if d.year == target_year else offset
+        distance = np.minimum(ndimage.distance_transform_edt(mask[t]), max_clouddistance).astype(np.float32)
+        cloud_score = 10000. / (1. + np.exp((distance - (max_clouddistance - min_clouddistance) / 2.) * -0.2))
+        pbc = (doy_score * weights[0] + year_score * weights[1] + cloud_score * weights[2]) / 10000
+        better = mask[t] & (pbc > best)
+        best[better] = pbc[better]
+        out[:, better] = np.trunc(values[t][:, better] * 10000).astype(np.int16)
+    return out
+
+
+def test_pbc_composite_matches_reference():
+    values, mask = scenes()
+    expected = reference(values, mask, 2019, 182, max_clouddistance=12, min_clouddistance=2)
+    for chunk_size in [7, 40]:
+        out = img_composite.pbc_composite(values, band_names, dates, 2019, 182, mask=mask, chunk_size=chunk_size,
+                                          max_clouddistance=12, min_clouddistance=2)
+        np.testing.assert_array_equal(out, expected)
+
+
+def test_stream_equals_stack():
+    values, mask = scenes()
+    expected = img_composite.pbc_composite(values, band_names, dates, 2019, 182, bands=['R', 'NIR'], mask=mask)
+    acc = streaming.pbc_composite_stream(zip(values, mask), dates, 2019, 182, band_names, bands=['R', 'NIR'])
+    np.testing.assert_array_equal(acc.composite, expected)
+    assert set(np.unique(acc.index)) <= set(range(len(dates)))
+
+
+def test_incremental_update_and_rebuild(tmp_path):
+    values, mask = scenes()
+    rows, cols = mask.shape[1:]
+    full = streaming.pbc_composite_stream(zip(values, mask), dates, 2019, 182, band_names).composite
+
+    state = incremental.init_composite_state(zip(values, mask), dates, 2019, 182, band_names, rows, cols)
+    np.testing.assert_array_equal(state.composite, full)
+    state.save(str(tmp_path / 'state.npz'))
+    loaded = incremental.CompositeState.load(str(tmp_path / 'state.npz'))
+    np.testing.assert_array_equal(loaded.composite, full)
+    assert loaded.dates == dates
+
+    # new scenes within tolerance are scored with the stored DOY standard deviation
+    state = incremental.init_composite_state(zip(values[:5], mask[:5]), dates[:5], 2019, 182, band_names, rows, cols)
+    doy_std = state.doy_std
+    state = incremental.update_composite_state(state, zip(values[5:], mask[5:]), dates[5:], tolerance=np.inf)
+    fixed = streaming.absorb_scenes(None, zip(values, mask), dates, doy_std, 2019, 182, [0, 1, 2], 1)
+    np.testing.assert_array_equal(state.composite, fixed.composite)
+    np.testing.assert_array_equal(state.index, fixed.index)
+
+    # beyond tolerance the window is recomputed, i.e. identical to the full composite
+    state = incremental.init_composite_state(zip(values[:5], mask[:5]), dates[:5], 2019, 182, band_names, rows, cols)
+    with pytest.raises(ValueError):
+        incremental.update_composite_state(state, zip(values[5:], mask[5:]), dates[5:], tolerance=0)
+    state = incremental.update_composite_state(state, zip(values[5:], mask[5:]), dates[5:], tolerance=0,
+                                               rebuild=lambda: (zip(values, mask), dates))
+    np.testing.assert_array_equal(state.composite, full)
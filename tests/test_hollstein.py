@@ -0,0 +1,50 @@
+import numpy as np
+
+from conftest import provide
+
+coefficients = provide('coefficients.py')
+hollstein = provide('local/hollstein.py')
+
+bands = ['B1', 'B2', 'B3', 'B5', 'B6', 'B7', 'B8A', 'B9', 'B10', 'B11']
+
+
+def tile(rows=60, cols=70):
+    """ Random L1C digital numbers around the thresholds, plus bright (snow/cloud like) and dark (water like) rows. """
+    rng = np.random.default_rng(7)
+    image = {b: rng.integers(1, 7000, (rows, cols)) for b in bands}
+    image['B3'][:10] += 3000
+    image['B8A'][-10:] //= 8
+    return image
+
+
+def test_classes_are_disjoint_and_clear_is_the_rest():
+    out = hollstein.hollstein_mask(tile())
+    classes = [out[c] for c in ['cloud', 'snow', 'shadow', 'water', 'cirrus']]
+    assert all(c.any() for c in classes)
+    assert np.all(np.sum(classes, axis=0) <= 1)
+    np.testing.assert_array_equal(out['hollstein'], np.sum(classes, axis=0) == 0)
+
+
+def test_paths_match_conditions():
+    image = tile()
+    code = hollstein.hollstein_code(image)
+    out = hollstein.hollstein_mask(image, options=['cloud', 'shadow'])
+    # the leaf conditions written out, as in prepro.hollstein_conditions
+    b = {k: image[v].astype(np.float64) for k, v in [('aerosol', 'B1'), ('blue', 'B2'), ('green', 'B3'),
+                                                     ('red_edge1', 'B5'), ('red_edge2', 'B6'), ('red_edge3', 'B7'),
+                                                     ('red_edge4', 'B8A'), ('water_vapor', 'B9'), ('cirrus', 'B10'),
+                                                     ('swir', 'B11')]}
+    conditions = {'1': b['green'] < 3190, '21': b['red_edge4'] < 1660, '22': b['red_edge1'] / b['swir'] < 4.33,
+                  '31': b['green'] - b['red_edge3'] < 270, '32': b['blue'] / b['cirrus'] < 14.689,
+                  '33': b['swir'] - b['cirrus'] < 2550, '34': b['green'] < 5250,
+                  '41': b['water_vapor'] - b['swir'] < -970, '42': b['water_vapor'] - b['swir'] < 210,
+                  '43': b['blue'] / b['water_vapor'] < 0.788, '44': b['red_edge2'] - b['red_edge3'] < -160,
+                  '45': b['aerosol'] < 3000, '46': b['aerosol'] / b['red_edge1'] < 1.184}
+    for i, key in enumerate(hollstein.condition_bits):
+        np.testing.assert_array_equal((code >> i) & 1 == 1, conditions[key], err_msg=key)
+    for option in ['cloud', 'shadow']:
+        expected = np.zeros(code.shape, dtype=bool)
+        for path in coefficients.hollstein_classes[option].values():
+            expected |= np.all([conditions[key] == bool(value) for key, value in path], axis=0)
+        np.testing.assert_array_equal(out[option], expected, err_msg=option)
+    assert set(out) == {'cloud', 'shadow', 'hollstein'}
@@ -0,0 +1,39 @@
+import numpy as np
+
+from conftest import provide
+
+provide('coefficients.py')
+indices = provide('local/indices.py')
+
+
+def reflectance(rows=37, cols=11):
+    rng = np.random.default_rng(6)
+    return {b: rng.uniform(0.01, 0.6, (rows, cols)) for b in ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']}
+
+
+def test_indices_match_band_expressions():
+    bands = reflectance()
+    b, g, r, nir, swir1 = [bands[x] for x in ['B', 'G', 'R', 'NIR', 'SWIR1']]
+    names = ['NDVI', 'EVI', 'NDWI1', 'NDWI2', 'NDBI']
+    out = indices.spectral_indices(bands, names, chunk_size=8)
+    expected = [(nir - r) / (nir + r), 2.5 * (nir - r) / (nir + 6 * r - 7.5 * b + 1), (nir - swir1) / (nir + swir1),
+                (g - nir) / (g + nir), (swir1 - nir) / (swir1 + nir)]
+    for i, name in enumerate(names):
+        np.testing.assert_allclose(out[i], expected[i], rtol=1e-5, atol=1e-6, err_msg=name)
+
+
+def test_tasseled_cap_and_albedo_match_band_expressions():
+    bands = reflectance()
+    b, g, r, nir, swir1, swir2 = [bands[x] for x in ['B', 'G', 'R', 'NIR', 'SWIR1', 'SWIR2']]
+    # prepro.tcb/tcg/tcw and prepro.surface_albedo(sensor='L8') written out
+    expected = {
+        'TCB': b * 0.2043 + g * 0.4158 + r * 0.5524 + nir * 0.5741 + swir1 * 0.3124 + swir2 * 0.2303,
+        'TCG': b * (-0.1603) + g * (-0.2819) + r * (-0.4934) + nir * 0.7940 + swir1 * (-0.0002) + swir2 * (-0.1446),
+        'TCW': b * 0.0315 + g * 0.2021 + r * 0.3102 + nir * 0.1594 + swir1 * (-0.6806) + swir2 * (-0.6109),
+        'ALBEDO': 0.2453 * b + 0.0508 * g + 0.1804 * r + 0.3081 * nir + 0.1332 * swir1 + 0.0521 * swir2 + 0.0011
+    }
+    names = ['TCG', 'ALBEDO', 'TCB', 'TCW']
+    for out in [indices.linear_transform(bands, names, sensor='L8', chunk_size=5),
+                indices.spectral_indices(bands, names, sensor='L8', chunk_size=5)]:
+        for i, name in enumerate(names):
+            np.testing.assert_allclose(out[i], expected[name], rtol=1e-5, atol=1e-6, err_msg=name)
@@ -0,0 +1,50 @@
+import numpy as np
+
+from conftest import provide
+
+provide('local/scoring.py')
+lst = provide('local/lst.py')
+
+
+def scene(rows=30, cols=20):
+    rng = np.random.default_rng(5)
+    red = rng.uniform(0.02, 0.3, (rows, cols))
+    nir = rng.uniform(0.05, 0.5, (rows, cols))
+    green = rng.uniform(0.02, 0.3, (rows, cols))
+    green[:5] = nir[:5] + 0.2  # water
+    tir = rng.uniform(270., 320., (rows, cols))
+    radiance = rng.uniform(7., 11., (rows, cols))
+    return tir, radiance, red, nir, green
+
+
+def closed_form(tir, radiance, red, nir, green, wv, sensor):
+    """ Jiménez-Muñoz et al. single-channel LST (°C) written out per pixel. """
+    cs = lst.cs_sensor[sensor]
+    w = wv * 0.1
+    af1, af2, af3 = [cs[i] * w ** 2 + cs[i + 1] * w + cs[i + 2] for i in [0, 3, 6]]
+    fvc = np.clip((((nir - red) / (nir + red) - 0.15) / (0.9 - 0.15)) ** 2, 0, 1)  # prepro.fvc
+    epsilon = np.where((green - nir) / (green + nir) > 0.1, 0.99, 0.97 + (0.985 - 0.97) * fvc)
+    gamma = tir ** 2 / (lst.coef_sensor[sensor] * radiance)
+    delta = tir - tir ** 2 / lst.coef_sensor[sensor]
+    return gamma * ((af1 * radiance + af2) / epsilon + af3) + delta - 273.15
+
+
+def test_matches_closed_form():
+    bands = scene()
+    for sensor, wv in [('L5', 12.), ('L7', 25.), ('L8', 40.)]:
+        out = lst.land_surface_temperature(*bands, wv=wv, sensor=sensor, chunk_size=7)
+        expected = closed_form(*bands, wv=wv, sensor=sensor) * 0.01 * 10000
+        np.testing.assert_allclose(out, expected, atol=1)
+
+
+def test_mask_threshold_and_wv_raster():
+    bands = scene()
+    mask = np.ones(bands[0].shape, dtype=bool)
+    mask[:, :3] = False
+    wv = np.full(bands[0].shape, 25.)
+    out = lst.land_surface_temperature(*bands, wv=wv, mask=mask, sensor='L8', threshold=20, nodata=-9999)
+    expected = closed_form(*bands, wv=25., sensor='L8')
+    assert np.all(out[~mask] == -9999)
+    assert np.all(out[mask & (expected <= 20)] == -9999)
+    valid = mask & (expected > 20)
+    np.testing.assert_allclose(out[valid], expected[valid] * 100, atol=1)
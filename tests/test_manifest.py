@@ -0,0 +1,76 @@
+import os
+
+import fake_ee
+from conftest import load_module
+
+with fake_ee.installed():
+    manifest = load_module('generals/manifest.py')
+    scheduler = load_module('generals/scheduler.py')
+
+
+class Task(object):
+    def __init__(self, description):
+        self.id = 'task_' + description
+
+    def start(self):
+        pass
+
+
+class Reducer(fake_ee.ComputedObject):
+    def serialize(self):
+        return '{"reducer": "' + self.func.name + '"}'
+
+
+def export_all(m, exports, params):
+    """ Submits all exports (descriptions) with params, returns the descriptions actually started. """
+    started = []
+
+    def export(description):
+        started.append(description)
+        return Task(description)
+    for description in exports:
+        scheduler.submit(None, export, manifest=m, params=params, description=description)
+    return started
+
+
+def test_rerun_skips_completed_and_resubmits_failed(tmp_path):
+    path = str(tmp_path / 'manifest.jsonl')
+    params = {'sensor': 'LS', 'target_years': [2019]}
+    m = manifest.ExportManifest(path, refresh=False)
+    assert export_all(m, ['a', 'b', 'c'], params) == ['a', 'b', 'c']
+    m.refresh([{'id': 'task_a', 'state': 'COMPLETED'}, {'id': 'task_b', 'state': 'FAILED'},
+               {'id': 'task_c', 'state': 'RUNNING'}])
+
+    rerun = manifest.ExportManifest(path, refresh=False)
+    assert export_all(rerun, ['a', 'b', 'c', 'd'], params) == ['b', 'd']
+    # other parameters are other exports
+    assert export_all(rerun, ['a'], dict(params, sensor='L8')) == ['a']
+
+
+def test_refresh_marks_missing_tasks_failed(tmp_path):
+    m = manifest.ExportManifest(str(tmp_path / 'manifest.jsonl'), refresh=False)
+    export_all(m, ['a'], None)
+    m.refresh([])
+    assert m.state('a') == 'FAILED' and m.pending('a')
+
+
+def test_key_stable_across_reruns():
+    params = {'sensor': 'LS', 'roi': (13.08, 52.32, 13.76, 52.67), 'bands': {'NDVI'},
+              'reducer': Reducer(fake_ee.Func('Reducer.median'), {}), 'export_name': None}
+    key = manifest.ExportManifest.key('NDVI_2019', params)
+    same = {'export_name': None, 'bands': {'NDVI'}, 'reducer': Reducer(fake_ee.Func('Reducer.median'), {}),
+            'roi': [13.08, 52.32, 13.76, 52.67], 'sensor': 'LS'}
+    assert manifest.ExportManifest.key('NDVI_2019', same) == key
+    other = dict(same, reducer=Reducer(fake_ee.Func('Reducer.mean'), {}))
+    assert manifest.ExportManifest.key('NDVI_2019', other) != key
+    # same hash in every process, e.g. of an earlier run
+    assert manifest.params_hash({'sensor': 'LS', 'target_years': [2019], 'roi': (13.08, 52.32)}) == 'a31916100730'
+
+
+def test_unknown_types_are_not_hashed():
+    try:
+        manifest.params_hash({'roi': object()})
+    except TypeError:
+        pass
+    else:
+        raise AssertionError('TypeError not raised')
@@ -0,0 +1,40 @@
+import datetime
+
+import numpy as np
+
+from conftest import provide
+
+masking = provide('local/masking.py')
+provide('local/scoring.py')
+provide('local/cloud_distance.py')
+img_composite = provide('local/img_composite.py')
+
+
+def scene_masks(n_time=6, rows=20, cols=21):
+    rng = np.random.default_rng(2)
+    qa = rng.choice([0, 1 << 3, 1 << 5, 1 << 6], size=(n_time, rows, cols), p=[0.6, 0.1, 0.2, 0.1]).astype(np.uint16)
+    return [masking.mask_landsat_sr(q, ['cloud', 'cshadow']) for q in qa]
+
+
+def test_packed_masks_roundtrip():
+    masks = scene_masks()
+    packed = masking.PackedMasks.from_masks(iter(masks))
+    stack = np.stack(masks)
+    assert packed.shape == stack.shape
+    assert packed.nbytes <= stack.nbytes // 8 + stack.shape[0] * stack.shape[1]
+    np.testing.assert_array_equal(np.asarray(packed), stack)
+    np.testing.assert_array_equal(packed[:, 3:9], stack[:, 3:9])
+    np.testing.assert_array_equal(packed[2], stack[2])
+    np.testing.assert_array_equal(packed[1:4, 2:5, 7:12], stack[1:4, 2:5, 7:12])
+
+
+def test_pbc_composite_with_packed_masks():
+    masks = scene_masks()
+    rng = np.random.default_rng(3)
+    stack = rng.random((len(masks), 3, 20, 21))
+    dates = [datetime.date(2019, 1, 1) + datetime.timedelta(days=30 * t) for t in range(len(masks))]
+    kwargs = dict(band_names=['B', 'R', 'NIR'], dates=dates, target_year=2019, target_doy=182, chunk_size=7,
+                  max_clouddistance=5, min_clouddistance=1)
+    expected = img_composite.pbc_composite(stack, mask=np.stack(masks), **kwargs)
+    packed = img_composite.pbc_composite(stack, mask=masking.PackedMasks.from_masks(masks), **kwargs)
+    np.testing.assert_array_equal(packed, expected)
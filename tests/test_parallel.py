@@ -0,0 +1,43 @@
+import threading
+import time
+
+from conftest import load_module
+
+parallel = load_module('generals/parallel.py')
+
+
+def test_results_in_order_of_iterations():
+    def fun(i, delay):
+        time.sleep(delay)
+        return i
+    iterations = [(i, 0.02 * (5 - i)) for i in range(5)]
+    assert parallel.run_parallel(fun, iterations, workers=5) == [0, 1, 2, 3, 4]
+
+
+def test_exceptions_are_raised():
+    def fun(i):
+        if i == 2:
+            raise ValueError('iteration 2')
+        return i
+    try:
+        parallel.run_parallel(fun, [(i,) for i in range(4)], workers=2)
+    except ValueError as e:
+        assert str(e) == 'iteration 2'
+    else:
+        raise AssertionError('ValueError not raised')
+
+
+def test_at_most_workers_calls_in_flight():
+    lock = threading.Lock()
+    state = {'running': 0, 'peak': 0}
+
+    def fun(i):
+        with lock:
+            state['running'] += 1
+            state['peak'] = max(state['peak'], state['running'])
+        time.sleep(0.01)
+        with lock:
+            state['running'] -= 1
+        return i
+    assert parallel.run_parallel(fun, [(i,) for i in range(12)], workers=3) == list(range(12))
+    assert 1 < state['peak'] <= 3
@@ -0,0 +1,65 @@
+import fake_ee
+from conftest import load_module
+
+with fake_ee.installed():
+    pipeline = load_module('generals/pipeline.py')
+
+
+# steps written like prepro.rename_bands_*, prepro.mask_*, prepro.scale_img and composite.fun_add_doy_band
+def rename(img):
+    return img.select(['B4', 'B5', 'B10']).rename(['R', 'NIR', 'TIR']).set('satellite_id', 'L8_')
+
+
+def mask(img):
+    return img.updateMask(img.select(['R'])) \
+        .copyProperties(source=img).set('system:time_start', img.get('system:time_start'))
+
+
+def scale(img):
+    return img.select(['R', 'NIR']).toFloat().multiply(0.0001) \
+        .copyProperties(source=img).set('system:time_start', img.get('system:time_start'))
+
+
+def set_doy(img):
+    return img.set('DOY', img.date())
+
+
+def add_year(img):
+    return img.addBands(img.select(['R']).rename(['YEAR'])).set('YEAR_OF', img.get('satellite_id'))
+
+
+def scene():
+    return fake_ee.Image(bands=['B4', 'B5', 'B10'], properties={'system:time_start': 1561939200000,
+                                                                 'system:index': 'LC08_193023_20190701',
+                                                                 'CLOUD_COVER': 12.5})
+
+
+def unfused(img, steps):
+    for step in steps:
+        img = step(img)
+    return img
+
+
+def test_fuse_keeps_properties_of_intermediate_steps():
+    steps = [rename, mask, scale]
+    fused = fake_ee.evaluate(pipeline.fuse(*steps)(scene()))
+    assert fused == fake_ee.evaluate(unfused(scene(), steps))
+    assert fused[1]['satellite_id'] == 'L8_'
+
+
+def test_fuse_restores_properties_for_reading_and_setting_steps():
+    for steps in [[rename, mask, scale, set_doy], [rename, scale, add_year, mask],
+                  [mask, rename, scale, mask, set_doy, add_year]]:
+        assert fake_ee.evaluate(pipeline.fuse(*steps)(scene())) == fake_ee.evaluate(unfused(scene(), steps))
+
+
+def test_fuse_drops_intermediate_copies():
+    fused = pipeline.fuse(mask, mask, mask)(scene())
+    copies = 0
+    pending = [fused]
+    while pending:
+        obj = pending.pop()
+        if isinstance(obj, fake_ee.ComputedObject) and obj.func is not None:
+            copies += obj.func.name == 'Element.copyProperties'
+            pending.extend(obj.args.values())
+    assert copies == 1
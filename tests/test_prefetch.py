@@ -0,0 +1,109 @@
+import threading
+
+import fake_ee
+from conftest import load_module
+
+with fake_ee.installed():
+    prefetch = load_module('generals/prefetch.py')
+
+
+class FakeServer(object):
+    """
+    ee module whose Dictionary(...).getInfo() returns the questions as answers. Requests with a question in `slow` block
+    until `hold` is set.
+    """
+    def __init__(self, slow=()):
+        self.slow = set(slow)
+        self.hold = threading.Event()
+        self.started = threading.Event()
+        self.calls = []
+        self.fail = False
+        server = self
+
+        class Dictionary(object):
+            def __init__(self, questions):
+                self.questions = dict(questions)
+
+            def getInfo(self):
+                server.calls.append(sorted(self.questions))
+                server.started.set()
+                if self.questions.keys() & server.slow:
+                    server.hold.wait(5)
+                if server.fail:
+                    raise RuntimeError('request failed')
+                return self.questions
+
+        self.Dictionary = Dictionary
+
+
+def install(server):
+    prefetch.ee = server
+    return prefetch.Prefetch()
+
+
+def start(fun, *args):
+    out = {}
+
+    def run():
+        try:
+            out['value'] = fun(*args)
+        except Exception as e:
+            out['error'] = e
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, out
+
+
+def test_pending_questions_in_one_request():
+    server = FakeServer()
+    p = install(server)
+    p.add('L5_size', 3)
+    p.add('L8_size', 5)
+    assert p.get('L5_size') == 3 and p.get('L8_size') == 5
+    assert p.get('L7_size', 0) == 0
+    assert server.calls == [['L5_size', 'L8_size'], ['L7_size']]
+    assert p.requests == 2
+
+
+def test_other_questions_do_not_wait_for_request_in_flight():
+    server = FakeServer(slow=['a'])
+    p = install(server)
+    thread, out = start(p.get, 'a', 1)
+    assert server.started.wait(5)
+    assert p.get('b', 2) == 2
+    assert thread.is_alive()
+    server.hold.set()
+    thread.join(5)
+    assert out == {'value': 1}
+    assert server.calls == [['a'], ['b']]
+
+
+def test_getters_of_question_in_flight_wait_for_it():
+    server = FakeServer(slow=['a'])
+    p = install(server)
+    first, out1 = start(p.get, 'a', 1)
+    assert server.started.wait(5)
+    second, out2 = start(p.get, 'a', 1)
+    second.join(0.05)
+    assert second.is_alive()
+    server.hold.set()
+    first.join(5)
+    second.join(5)
+    assert out1 == out2 == {'value': 1}
+    assert server.calls == [['a']] and p.requests == 1
+
+
+def test_failed_request_raises_for_waiters_and_keeps_questions():
+    server = FakeServer(slow=['a'])
+    p = install(server)
+    server.fail = True
+    first, out1 = start(p.get, 'a', 1)
+    assert server.started.wait(5)
+    second, out2 = start(p.get, 'a')
+    second.join(0.05)
+    server.hold.set()
+    first.join(5)
+    second.join(5)
+    assert isinstance(out1['error'], RuntimeError) and isinstance(out2['error'], RuntimeError)
+    server.fail = False
+    assert p.get('a') == 1
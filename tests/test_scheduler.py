@@ -0,0 +1,142 @@
+from conftest import load_module
+
+scheduler = load_module('generals/scheduler.py')
+
+
+class FakeClock(object):
+    """ Clock advanced by the scheduler's sleep calls. """
+    def __init__(self):
+        self.now = 0.
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeBatch(object):
+    """
+    In-process stand-in for ee.batch: export(**kwargs) returns an unstarted task, tasks complete after `duration`
+    polls. Descriptions in `fail` fail on their first `fail[description]` attempts, those in `reject` fail to start.
+    """
+    def __init__(self, duration=2, fail=None, reject=None):
+        self.duration = duration
+        self.fail = fail or {}
+        self.reject = reject or {}
+        self.attempts = {}
+        self.tasks = []
+
+    def running(self):
+        return len([t for t in self.tasks if t.started and t.state == 'RUNNING'])
+
+    def export(self, description, **kwargs):
+        task = FakeTask(self, description)
+        self.tasks.append(task)
+        return task
+
+
+class FakeTask(object):
+    def __init__(self, batch, description):
+        self.batch = batch
+        self.description = description
+        self.started = False
+        self.polls = 0
+        self.state = 'UNSUBMITTED'
+        self.id = description + '_' + str(len(batch.tasks))
+
+    def start(self):
+        attempt = self.batch.attempts.get(self.description, 0) + 1
+        self.batch.attempts[self.description] = attempt
+        if attempt <= self.batch.reject.get(self.description, 0):
+            raise RuntimeError("Too many tasks already in the queue")
+        self.started = True
+        self.state = 'RUNNING'
+        self.fails = attempt <= self.batch.fail.get(self.description, 0)
+
+    def status(self):
+        self.polls += 1
+        if self.polls >= self.batch.duration:
+            self.state = 'FAILED' if self.fails else 'COMPLETED'
+        return {'state': self.state, 'error_message': 'Computation timed out.' if self.fails else None}
+
+
+def make_scheduler(clock, **kwargs):
+    return scheduler.ExportScheduler(sleep=clock.sleep, clock=clock.time, poll_interval=10, verbose=False, **kwargs)
+
+
+def test_max_running_cap():
+    clock, batch = FakeClock(), FakeBatch(duration=3)
+    s = make_scheduler(clock, max_running=3)
+    for i in range(10):
+        s.add('img' + str(i), batch.export, description='img' + str(i))
+
+    peak = 0
+    s.step()
+    while not s.done():
+        peak = max(peak, batch.running())
+        assert len([j for j in s.jobs if j.state == 'RUNNING']) <= 3
+        clock.sleep(s.poll_interval)
+        s.step()
+    assert peak == 3
+    assert s.summary() == {'COMPLETED': ['img' + str(i) for i in range(10)]}
+
+
+def test_retries_with_exponential_backoff():
+    clock, batch = FakeClock(), FakeBatch(duration=1, fail={'a': 2}, reject={'b': 1})
+    s = make_scheduler(clock, max_retries=3, backoff=30, backoff_factor=2, max_backoff=3600)
+    job_a = s.add('a', batch.export, description='a')
+    job_b = s.add('b', batch.export, description='b')
+
+    starts = []
+    original = s._start
+
+    def start(job):
+        starts.append((job.name, clock.now))
+        original(job)
+    s._start = start
+
+    assert s.run() == {'COMPLETED': ['a', 'b']}
+    assert job_a.attempts == 3 and job_b.attempts == 2
+    a_starts = [t for name, t in starts if name == 'a']
+    # first failure is seen one poll after the start, retries wait 30 s and then 60 s
+    assert a_starts[1] - a_starts[0] >= 10 + 30
+    assert a_starts[2] - a_starts[1] >= 10 + 60
+    b_starts = [t for name, t in starts if name == 'b']
+    assert b_starts[1] - b_starts[0] >= 30
+
+
+def test_backoff_is_capped():
+    clock, batch = FakeClock(), FakeBatch(duration=1, fail={'a': 4})
+    s = make_scheduler(clock, max_retries=4, backoff=30, backoff_factor=10, max_backoff=100)
+    job = s.add('a', batch.export, description='a')
+    waits = []
+    original = s._failed
+
+    def failed(job, error):
+        original(job, error)
+        if job.state == 'RETRY':
+            waits.append(job.next_start - clock.now)
+    s._failed = failed
+    s.run()
+    assert waits == [30, 100, 100, 100]
+    assert job.state == 'COMPLETED'
+
+
+def test_failed_after_max_retries():
+    clock, batch = FakeClock(), FakeBatch(duration=1, fail={'a': 10})
+    s = make_scheduler(clock, max_retries=2, backoff=1)
+    job = s.add('a', batch.export, description='a')
+    assert s.run() == {'FAILED': ['a']}
+    assert job.attempts == 3
+    assert job.error == 'Computation timed out.'
+
+
+def test_submit_without_scheduler_starts_right_away():
+    batch = FakeBatch()
+    task = scheduler.submit(None, batch.export, description='a')
+    assert task.started
+    job = scheduler.submit(make_scheduler(FakeClock()), batch.export, description='b')
+    assert job.state == 'QUEUED' and len(batch.tasks) == 1
@@ -0,0 +1,15 @@
+import fake_ee
+from conftest import load_module
+
+with fake_ee.installed():
+    scoring = load_module('composite/scoring.py')
+
+
+def test_combine_reducers_without_metrics():
+    for reducers, percentiles in [(None, None), ([], []), (None, [])]:
+        try:
+            scoring.combine_reducers(reducers, percentiles)
+        except ValueError as e:
+            assert 'No metrics selected' in str(e)
+        else:
+            raise AssertionError('ValueError not raised')
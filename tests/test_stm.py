@@ -0,0 +1,61 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from conftest import load_module
+
+stm = load_module('local/stm.py')
+
+
+def stack():
+    rng = np.random.default_rng(0)
+    values = rng.normal(0.3, 0.1, (12, 5, 4))
+    values[rng.random(values.shape) < 0.3] = np.nan
+    return values
+
+
+def test_std_and_variance_are_population_statistics():
+    values = stack()
+    out = stm.stm_chunked(values, ['std', 'variance'], chunk_size=2, time_chunk=5)
+    np.testing.assert_allclose(out['std'], np.nanstd(values, axis=0), rtol=1e-5)
+    np.testing.assert_allclose(out['variance'], np.nanvar(values, axis=0), rtol=1e-5)
+
+
+def test_sample_statistics_with_ddof():
+    values = stack()
+    out = stm.stm_chunked(values, ['std'], ddof=1)
+    np.testing.assert_allclose(out['std'], np.nanstd(values, axis=0, ddof=1), rtol=1e-5)
+
+
+def test_percentile_requires_percentiles():
+    with pytest.raises(ValueError):
+        stm.stm_chunked(stack(), ['percentile'])
+
+
+def test_chunked_metrics_match_full_array():
+    values = stack()
+    values[:, 0, 0] = np.nan  # no clear observation
+    out = stm.stm_chunked(values, ['mean', 'median', 'min', 'max', 'nobs', 'percentile'], percentiles=[10, 90],
+                          chunk_size=2)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        expected = {'mean': np.nanmean(values, axis=0), 'median': np.nanmedian(values, axis=0),
+                    'min': np.nanmin(values, axis=0), 'max': np.nanmax(values, axis=0),
+                    'nobs': np.isfinite(values).sum(axis=0),
+                    'p10': np.nanpercentile(values, 10, axis=0), 'p90': np.nanpercentile(values, 90, axis=0)}
+    assert set(out) == set(expected)
+    for name, e in expected.items():
+        np.testing.assert_allclose(out[name], e, rtol=1e-5, err_msg=name)
+
+
+def test_time_blocks_match_single_pass():
+    values = stack()
+    metrics = ['mean', 'std', 'min', 'max', 'nobs']
+    blocked = stm.stm_chunked(values, metrics, chunk_size=3, time_chunk=5)
+    single = stm.stm_chunked(values, metrics, chunk_size=5)
+    merged = stm.STMAccumulator(values.shape[1:]).add(values[:7])
+    merged.merge(stm.STMAccumulator(values.shape[1:]).add(values[7:]))
+    for name in metrics:
+        np.testing.assert_allclose(blocked[name], single[name], rtol=1e-6, err_msg=name)
+        np.testing.assert_allclose(merged.result(name), single[name], rtol=1e-6, err_msg=name)
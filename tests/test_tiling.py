@@ -0,0 +1,51 @@
+import itertools
+
+import fake_ee
+from conftest import load_module
+
+with fake_ee.installed():
+    tiling = load_module('generals/tiling.py')
+
+
+def rectangle(x0, y0, x1, y1):
+    return [[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]]
+
+
+def check_grid(shards, coords, resolution, n_bands, max_bytes):
+    bounds = tiling.grid_bounds(coords, resolution)
+    area = 0
+    for shard in shards:
+        x0, y0, x1, y1 = shard['bounds']
+        assert x0 % resolution == 0 and y1 % resolution == 0
+        assert shard['transform'] == [resolution, 0, x0, 0, -resolution, y1]
+        assert tiling.export_size(shard['bounds'], resolution, n_bands)['bytes'] <= max_bytes
+        area += (x1 - x0) * (y1 - y0)
+    assert area == (bounds[2] - bounds[0]) * (bounds[3] - bounds[1])
+    for a, b in itertools.combinations(shards, 2):
+        overlap_x = min(a['bounds'][2], b['bounds'][2]) - max(a['bounds'][0], b['bounds'][0])
+        overlap_y = min(a['bounds'][3], b['bounds'][3]) - max(a['bounds'][1], b['bounds'][1])
+        assert overlap_x <= 0 or overlap_y <= 0
+
+
+def test_export_within_budget_is_one_shard():
+    # 10000 x 1 pixel strip, 20 kB
+    coords = rectangle(0, 0, 300000, 30)
+    shards = tiling.shard_grid(coords, 30, 1, 2e6)
+    assert [s['suffix'] for s in shards] == ['_r00c00']
+    assert shards[0]['bounds'] == [0, 0, 300000, 30]
+
+
+def test_row_strips():
+    coords = rectangle(380012.3, 5800001., 450033., 5890007.)
+    shards = tiling.shard_grid(coords, 30, 6, 2e7)
+    bounds = tiling.grid_bounds(coords, 30)
+    assert all(s['bounds'][0] == bounds[0] and s['bounds'][2] == bounds[2] for s in shards)
+    assert [s['suffix'] for s in shards] == ['_r0' + str(i) + 'c00' for i in range(len(shards))]
+    check_grid(shards, coords, 30, 6, 2e7)
+
+
+def test_columns_if_a_row_exceeds_the_budget():
+    coords = rectangle(0, 0, 30 * 5000, 30 * 7)
+    shards = tiling.shard_grid(coords, 30, 4, 4 * 2 * 1200)
+    assert len(set(s['suffix'][4:] for s in shards)) > 1
+    check_grid(shards, coords, 30, 4, 4 * 2 * 1200)
@@ -0,0 +1,59 @@
+import numpy as np
+from scipy import stats
+
+from conftest import load_module, provide
+
+provide('local/scoring.py')
+trend = load_module('local/trend.py')
+
+
+def stack():
+    rng = np.random.default_rng(1)
+    time = np.sort(rng.choice(3650, 15, replace=False)).astype(float)
+    values = 0.2 + 0.0001 * time[:, None, None, None] + rng.normal(0, 0.02, (15, 2, 3, 50))
+    values[rng.random(values.shape) < 0.2] = np.nan
+    return values, time
+
+
+def test_chunks_smaller_than_a_row():
+    values, time = stack()
+    full = trend.trend_statistics(values, time, chunk_pixels=150)
+    chunked = trend.trend_statistics(values, time, chunk_pixels=7)
+    for s in full:
+        np.testing.assert_array_equal(chunked[s], full[s])
+
+
+def test_memory_budget_below_one_row():
+    values, time = stack()
+    n_pairs = 15 * 14 // 2
+    # budget of 4 pixels of pairwise arrays for both bands, a row has 50 pixels
+    chunked = trend.trend_statistics(values, time, memory=4 * n_pairs * 2 * 50)
+    full = trend.trend_statistics(values, time, chunk_pixels=150)
+    for s in full:
+        np.testing.assert_array_equal(chunked[s], full[s])
+
+
+def test_sens_slope_matches_theilslopes():
+    values, time = stack()
+    slope = trend.sens_slope(values, time, chunk_pixels=11)
+    for b, y, x in np.ndindex(slope.shape):
+        v = values[:, b, y, x]
+        valid = np.isfinite(v)
+        expected = stats.theilslopes(v[valid], time[valid])[0]
+        np.testing.assert_allclose(slope[b, y, x], expected, rtol=1e-10)
+    ts = trend.ts_slope(values, time)
+    np.testing.assert_array_equal(ts, np.trunc(slope * 365.25 * 10000).astype(np.int16))
+
+
+def test_mann_kendall_matches_kendalltau_with_ties():
+    values, time = stack()
+    time[3] = time[4] = time[5]  # same-day scenes, e.g. L7 and L8
+    time[9] = time[10]
+    values = np.round(values, 2)  # ties in value
+    out = trend.trend_statistics(values, time, statistics=('tau', 'p_value'), chunk_pixels=13)
+    for b, y, x in np.ndindex(out['tau'].shape):
+        v = values[:, b, y, x]
+        valid = np.isfinite(v)
+        expected = stats.kendalltau(time[valid], v[valid], method='asymptotic')
+        np.testing.assert_allclose(out['tau'][b, y, x], expected.statistic, rtol=1e-10)
+        np.testing.assert_allclose(out['p_value'][b, y, x], expected.pvalue, atol=2e-7)  # erfc approximation